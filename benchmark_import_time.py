@@ -0,0 +1,104 @@
+"""Benchmark the import time of knowledge_storm and check that heavy dependencies are not imported eagerly.
+
+Each scenario runs in a fresh interpreter, so the numbers include everything the import pulls in. The script exits
+with a non-zero status if a scenario imports one of the heavy modules it should not import, or (with
+--max-seconds) if a scenario is slower than the budget, so it can be used to catch regressions.
+
+Example:
+    python benchmark_import_time.py --repeat 5 --max-seconds 3
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+HEAVY_MODULES = [
+    "transformers",
+    "sentence_transformers",
+    "torch",
+    "anthropic",
+    "qdrant_client",
+    "langchain_core",
+    "langchain_huggingface",
+    "langchain_qdrant",
+    "pandas",
+    "trafilatura",
+    "sklearn",
+    "networkx",
+    "matplotlib",
+    "together",
+]
+
+# (name, statement, whether the statement needs dspy). Heavy modules imported by dspy itself are not counted
+# against the scenarios that need dspy.
+SCENARIOS = [
+    ("import knowledge_storm", "import knowledge_storm", False),
+    (
+        "TogetherClient + BingSearch",
+        "from knowledge_storm.lm import TogetherClient; from knowledge_storm.rm import BingSearch",
+        True,
+    ),
+    (
+        "STORMWikiRunner",
+        "from knowledge_storm import STORMWikiRunner, STORMWikiLMConfigs, STORMWikiRunnerArguments",
+        True,
+    ),
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(m.split(".")[0] for m in sys.modules)}}))
+"""
+
+
+def run_scenario(statement: str):
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    failed = False
+    imported_by_dspy = set(HEAVY_MODULES) & set(run_scenario("import dspy")["modules"])
+    if imported_by_dspy:
+        print(f"dspy itself imports: {', '.join(sorted(imported_by_dspy))}")
+    for name, statement, uses_dspy in SCENARIOS:
+        allowed = imported_by_dspy if uses_dspy else set()
+        timings, loaded = [], set()
+        for _ in range(args.repeat):
+            result = run_scenario(statement)
+            timings.append(result["seconds"])
+            loaded.update(result["modules"])
+        unexpected = sorted(set(HEAVY_MODULES) & loaded - allowed)
+        median = statistics.median(timings)
+        print(f"{name}: median {median:.3f}s over {args.repeat} run(s)")
+        if unexpected:
+            failed = True
+            print(f"    unexpected heavy imports: {', '.join(unexpected)}")
+        if args.max_seconds is not None and median > args.max_seconds:
+            failed = True
+            print(f"    slower than the budget of {args.max_seconds:.3f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of runs of each scenario."
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Fail if the median import time of a scenario exceeds this budget.",
+    )
+    main(parser.parse_args())
@@ -13,13 +13,16 @@ args.output_dir/
     report.txt         # Final article generated
 """
 
+import contextlib
 import os
 import json
 from argparse import ArgumentParser
 from knowledge_storm.collaborative_storm.engine import CollaborativeStormLMConfigs, RunnerArgument, CoStormRunner
 from knowledge_storm.collaborative_storm.modules.callback import LocalConsolePrintCallBackHandler
 from knowledge_storm.lm import OpenAIModel, AzureOpenAIModel
+from knowledge_storm.lm_history import LMHistorySink
 from knowledge_storm.logging_wrapper import LoggingWrapper
+from knowledge_storm.tracing import Tracer
 from knowledge_storm.rm import YouRM, BingSearch, BraveRM, SerperRM, DuckDuckGoSearchRM, TavilySearchRM, SearXNG
 from knowledge_storm.utils import load_api_key
 
@@ -83,7 +86,15 @@ def main(args):
         max_thread_num=args.max_thread_num,
         max_num_round_table_experts=args.max_num_round_table_experts,
         moderator_override_N_consecutive_answering_turn=args.moderator_override_N_consecutive_answering_turn,
-        node_expansion_trigger_count=args.node_expansion_trigger_count)
+        node_expansion_trigger_count=args.node_expansion_trigger_count,
+        profile=args.profile,
+        profile_dir=os.path.join(args.output_dir, "profile"))
+    # Stream the LM calls to disk as they happen instead of keeping the whole session in memory.
+    os.makedirs(args.output_dir, exist_ok=True)
+    lm_config.set_history_sink(LMHistorySink(os.path.join(args.output_dir, "llm_call_history.jsonl")))
+    if args.trace:
+        # Before the runner is created since its modules keep a reference to their LM.
+        lm_config.enable_tracing()
     logging_wrapper = LoggingWrapper(lm_config)
     callback_handler = LocalConsolePrintCallBackHandler() if args.enable_log_print else None
 
@@ -113,28 +124,34 @@ def main(args):
                                    rm=rm,
                                    callback_handler=callback_handler)
 
-    # warm start the system
-    costorm_runner.warm_start()
+    tracer = Tracer() if args.trace else None
+    with tracer.activate() if tracer is not None else contextlib.nullcontext():
+        # warm start the system
+        costorm_runner.warm_start()
+
+        # Below is an example of how users may interact with Co-STORM to seek information together
+        # In actual deployment, we suggest allowing the user to decide whether to observe the agent utterance or inject a turn
+
+        # observing Co-STORM LLM agent utterance for 5 turns
+        for _ in range(1):
+            conv_turn = costorm_runner.step()
+            print(f"**{conv_turn.role}**: {conv_turn.utterance}\n")
 
-    # Below is an example of how users may interact with Co-STORM to seek information together
-    # In actual deployment, we suggest allowing the user to decide whether to observe the agent utterance or inject a turn
-    
-    # observing Co-STORM LLM agent utterance for 5 turns
-    for _ in range(1):
+        # active engaging by injecting your utterance
+        your_utterance = input('Your utterance: ')
+        costorm_runner.step(user_utterance=your_utterance)
+
+        # continue observing
         conv_turn = costorm_runner.step()
         print(f"**{conv_turn.role}**: {conv_turn.utterance}\n")
-    
-    # active engaging by injecting your utterance
-    your_utterance = input('Your utterance: ')
-    costorm_runner.step(user_utterance=your_utterance)
 
-    # continue observing
-    conv_turn = costorm_runner.step()
-    print(f"**{conv_turn.role}**: {conv_turn.utterance}\n")
+        # generate report
+        costorm_runner.knowledge_base.reorganize()
+        article = costorm_runner.generate_report()
 
-    # generate report
-    costorm_runner.knowledge_base.reorganize()
-    article = costorm_runner.generate_report()
+    if tracer is not None:
+        # Open in chrome://tracing or https://ui.perfetto.dev.
+        tracer.export_chrome_trace(os.path.join(args.output_dir, "trace.json"))
 
     # save results
     os.makedirs(args.output_dir, exist_ok=True)
@@ -242,5 +259,15 @@ if __name__ == '__main__':
         action='store_true',
         help='If set, enable console log print.'
     )
+    parser.add_argument(
+        '--trace',
+        action='store_true',
+        help='If set, trace the LM, search, embedding and download calls and write them to trace.json.'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='If set, write a CPU and memory profile of each pipeline stage to the profile folder of the output directory.'
+    )
 
     main(parser.parse_args())
@@ -17,7 +17,7 @@ args.output_dir/
 """
 
 import os
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
 
 from knowledge_storm import (
     STORMWikiRunnerArguments,
@@ -64,6 +64,7 @@ def main(args):
     lm_configs.set_outline_gen_lm(outline_gen_lm)
     lm_configs.set_article_gen_lm(article_gen_lm)
     lm_configs.set_article_polish_lm(article_polish_lm)
+    lm_configs.set_mindmap_lm(conv_simulator_lm)
 
     engine_args = STORMWikiRunnerArguments(
         output_dir=args.output_dir,
@@ -118,26 +119,26 @@ if __name__ == "__main__":
         choices=["bing", "you", "serper"],
         help="The search engine API to use for retrieving information.",
     )
-    # stage of the pipeline
+    # stage of the pipeline; a stage whose flag is omitted runs only if its inputs changed since the last run
     parser.add_argument(
         "--do-research",
-        action="store_true",
-        help="If True, simulate conversation to research the topic; otherwise, load the results.",
+        action=BooleanOptionalAction,
+        help="If set, simulate conversation to research the topic; with --no-do-research, load the results.",
     )
     parser.add_argument(
         "--do-generate-outline",
-        action="store_true",
-        help="If True, generate an outline for the topic; otherwise, load the results.",
+        action=BooleanOptionalAction,
+        help="If set, generate an outline for the topic; with --no-do-generate-outline, load the results.",
     )
     parser.add_argument(
         "--do-generate-article",
-        action="store_true",
-        help="If True, generate an article for the topic; otherwise, load the results.",
+        action=BooleanOptionalAction,
+        help="If set, generate an article for the topic; with --no-do-generate-article, load the results.",
     )
     parser.add_argument(
         "--do-polish-article",
-        action="store_true",
-        help="If True, polish the article by adding a summarization section and (optionally) removing "
+        action=BooleanOptionalAction,
+        help="If set, polish the article by adding a summarization section and (optionally) removing "
         "duplicate content.",
     )
     # hyperparameters for the pre-writing stage
@@ -13,7 +13,7 @@ import streamlit as st
 # Uncomment the following lines:
 # import sys
 # sys.path.append('../../')
-from knowledge_storm import STORMWikiRunnerArguments, STORMWikiRunner, STORMWikiLMConfigs
+from knowledge_storm import STORMWikiRunnerArguments, STORMWikiRunner, STORMWikiLMConfigs, ArtifactStore
 from knowledge_storm.lm import OpenAIModel
 from knowledge_storm.rm import YouRM
 from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
@@ -175,12 +175,20 @@ class DemoFileIOHelper():
             full_article_name = "storm_gen_article_polished.txt" if "storm_gen_article_polished.txt" in article_file_path_dict else "storm_gen_article.txt"
             article_data = {"article": DemoTextProcessingHelper.parse(
                 DemoFileIOHelper.read_txt_file(article_file_path_dict[full_article_name]))}
+            # Runs with artifact_format="compact" keep the JSON artifacts in one store file.
+            artifact_store = ArtifactStore(article_file_path_dict[ArtifactStore.FILE_NAME]) \
+                if ArtifactStore.FILE_NAME in article_file_path_dict else None
             if "url_to_info.json" in article_file_path_dict:
                 article_data["citations"] = _construct_citation_dict_from_search_result(
                     DemoFileIOHelper.read_json_file(article_file_path_dict["url_to_info.json"]))
+            elif artifact_store is not None and "url_to_info.json" in artifact_store:
+                article_data["citations"] = _construct_citation_dict_from_search_result(
+                    artifact_store.load("url_to_info.json"))
             if "conversation_log.json" in article_file_path_dict:
                 article_data["conversation_log"] = DemoFileIOHelper.read_json_file(
                     article_file_path_dict["conversation_log.json"])
+            elif artifact_store is not None and "conversation_log.json" in artifact_store:
+                article_data["conversation_log"] = artifact_store.load("conversation_log.json")
             return article_data
         return None
 
@@ -483,6 +491,11 @@ def _display_main_article(selected_article_file_path_dict, show_reference=True,
                 ":sunglasses: Click here to view the agent's brain**STORM**ing process!"):
             _display_persona_conversations(conversation_log=article_data.get("conversation_log", {}))
 
+    # display the mindmap of the collected information
+    if show_conversation and "graph_mindmap.png" in selected_article_file_path_dict:
+        with st.expander(":spider_web: Click here to view the mindmap of the information collected during the research!"):
+            st.image(selected_article_file_path_dict["graph_mindmap.png"])
+
 
 def get_demo_dir():
     return os.path.dirname(os.path.abspath(__file__))
@@ -533,8 +546,11 @@ def display_article_page(selected_article_name, selected_article_file_path_dict,
 
 
 class StreamlitCallbackHandler(BaseCallbackHandler):
+    stream_section_tokens = True
+
     def __init__(self, status_container):
         self.status_container = status_container
+        self.section_placeholders = {}
 
     def on_identify_perspective_start(self, **kwargs):
         self.status_container.info('Start identifying different perspectives for researching the topic.')
@@ -572,3 +588,8 @@ class StreamlitCallbackHandler(BaseCallbackHandler):
 
     def on_outline_refinement_end(self, outline: str, **kwargs):
         self.status_container.success(f'Finish leveraging the collected information.')
+
+    def on_section_partial(self, section_name: str, partial_content: str, **kwargs):
+        if section_name not in self.section_placeholders:
+            self.section_placeholders[section_name] = self.status_container.empty()
+        self.section_placeholders[section_name].markdown(f"**{section_name}**\n\n{partial_content}")
@@ -64,6 +64,10 @@ def handle_pre_writing():
             conversation_log_path = os.path.join(st.session_state["page3_current_working_dir"],
                                                  st.session_state["page3_topic_name_truncated"], "conversation_log.json")
             demo_util._display_persona_conversations(DemoFileIOHelper.read_json_file(conversation_log_path))
+            # saved as graph_mindmap.png next to the article, which is also shown on the article page
+            mindmap_path = st.session_state["runner"].render_mindmap()
+            if mindmap_path is not None:
+                st.image(mindmap_path, caption="Mindmap of the collected information")
             st.session_state["page3_write_article_state"] = "final_writing"
             status.update(label="brain**STORM**ing complete!", state="complete")
 
@@ -75,7 +79,8 @@ def handle_final_writing():
             st.info('Now I will connect the information I found for your reference. (This may take 4-5 minutes.)')
             st.session_state["runner"].run(topic=st.session_state["page3_topic"], do_research=False,
                                            do_generate_outline=False,
-                                           do_generate_article=True, do_polish_article=True, remove_duplicate=False)
+                                           do_generate_article=True, do_polish_article=True, remove_duplicate=False,
+                                           callback_handler=demo_util.StreamlitCallbackHandler(status))
             # finish the session
             st.session_state["runner"].post_run()
 
@@ -1,10 +1,188 @@
-from .storm_wiki import *
-from .collaborative_storm import *
-from .encoder import *
-from .interface import *
-from .lm import *
-from .rm import *
-from .utils import *
-from .dataclass import *
+from .lazy_loader import attach
+
+# Submodules are imported on first access to one of their attributes, see `lazy_loader.attach`.
+_import_structure = {
+    "storm_wiki": [
+        "StormArticleGenerationModule",
+        "StormArticlePolishingModule",
+        "StormOutlineGenerationModule",
+        "STORMWikiLMConfigs",
+        "STORMWikiRunnerArguments",
+        "STORMWikiRunner",
+        "STORMWikiBatchRunner",
+        "ArtifactStore",
+        "MindmapGraph",
+        "script_dir",
+        "ConvSimulator",
+        "WikiWriter",
+        "AskQuestion",
+        "TopicExpert",
+        "StormKnowledgeCurationModule",
+        "get_wiki_page_title_and_toc",
+        "FindRelatedTopic",
+        "GenPersona",
+        "CreateWriterWithPersona",
+        "StormPersonaGenerator",
+        "GENERALLY_UNRELIABLE",
+        "DEPRECATED",
+        "BLACKLISTED",
+        "is_valid_wikipedia_source",
+        "DialogueTurn",
+        "StormInformationTable",
+        "StormArticle",
+    ],
+    "collaborative_storm": [
+        "clean_up_section",
+        "WriteSection",
+        "separate_citations",
+        "QuestionToQuery",
+        "AnswerQuestion",
+        "format_search_results",
+        "extract_cited_storm_info",
+        "GroundedQuestionGeneration",
+        "GroundedQuestionGenerationModule",
+        "InsertInformation",
+        "InsertInformationCandidateChoice",
+        "InsertInformationModule",
+        "ExpandSection",
+        "ExpandNodeModule",
+        "AskQuestionWithPersona",
+        "GenSimulatedUserUtterance",
+        "WritePageOutline",
+        "AP",
+        "WarmStartModerator",
+        "SectionToConvTranscript",
+        "ReportToConversation",
+        "WarmStartConversation",
+        "GenerateWarmStartOutline",
+        "GenerateWarmStartOutlineModule",
+        "KnowledgeBaseSummmary",
+        "KnowledgeBaseSummaryModule",
+        "trim_output_after_hint",
+        "extract_and_remove_citations",
+        "keep_first_and_last_paragraph",
+        "AnswerQuestionModule",
+        "ConvertUtteranceStyle",
+        "GenExpertActionPlanning",
+        "CoStormExpertUtteranceGenerationModule",
+        "collaborative_storm_utils",
+        "BaseCallbackHandler",
+        "SimulatedUser",
+        "PureRAGAgent",
+        "Moderator",
+        "CoStormExpert",
+        "GenerateExpertModule",
+        "WarmStartModule",
+        "LoggingWrapper",
+        "CollaborativeStormLMConfigs",
+        "RunnerArgument",
+        "TurnPolicySpec",
+        "DiscourseManager",
+        "CoStormRunner",
+    ],
+    "encoder": [
+        "EmbeddingModel",
+        "OpenAIEmbeddingModel",
+        "TogetherEmbeddingModel",
+        "AzureOpenAIEmbeddingModel",
+    ],
+    "interface": [
+        "logger",
+        "pipeline_event_loop",
+        "InformationTable",
+        "ArticleSectionNode",
+        "Article",
+        "Retriever",
+        "KnowledgeCurationModule",
+        "OutlineGenerationModule",
+        "ArticleGenerationModule",
+        "ArticlePolishingModule",
+        "log_execution_time",
+        "LMConfigs",
+        "Engine",
+        "Agent",
+    ],
+    "lm": [
+        "RateLimiter",
+        "parse_retry_after",
+        "PromptBatcher",
+        "get_loop_bound_client",
+        "apost_json",
+        "ASYNC_LM_TIMEOUT",
+        "stream_tokens",
+        "get_token_stream_callback",
+        "iter_sse_data",
+        "DeepSeekModel",
+        "AzureOpenAIModel",
+        "GroqModel",
+        "ClaudeModel",
+        "VLLMClient",
+        "OllamaClient",
+        "TGIClient",
+        "LMEndpointPool",
+        "TogetherClient",
+        "GoogleModel",
+        "LatencyHistogram",
+        "HedgedLM",
+        "FairConcurrencyBudget",
+        "BudgetedLM",
+        "TracedLM",
+        "MeteredLM",
+        "OpenAIModel",
+    ],
+    "lm_history": ["LMHistorySink", "LMCallHistory"],
+    "rm": [
+        "YouRM",
+        "BingSearch",
+        "VectorRM",
+        "StanfordOvalArxivRM",
+        "SerperRM",
+        "BraveRM",
+        "SearXNG",
+        "DuckDuckGoSearchRM",
+        "TavilySearchRM",
+        "GoogleSearch",
+        "AzureAISearch",
+        "BudgetedRM",
+    ],
+    "metrics": [
+        "REGISTRY",
+        "MetricsRegistry",
+        "Counter",
+        "Gauge",
+        "Histogram",
+        "MetricsHandler",
+        "start_metrics_server",
+    ],
+    "profiling": ["StageProfiler"],
+    "tracing": [
+        "Tracer",
+        "span",
+        "traced",
+        "current_span",
+        "propagate_context",
+        "instrument_dspy_modules",
+    ],
+    "utils": [
+        "truncate_filename",
+        "load_api_key",
+        "makeStringRed",
+        "QdrantVectorStoreManager",
+        "ArticleTextProcessing",
+        "FileIOHelper",
+        "WebPageHelper",
+        "user_input_appropriateness_check",
+        "purpose_appropriateness_check",
+    ],
+    "dataclass": [
+        "get_text_embeddings",
+        "Information",
+        "ConversationTurn",
+        "KnowledgeNode",
+        "KnowledgeBase",
+    ],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _import_structure)
 
 __version__ = "1.0.0"
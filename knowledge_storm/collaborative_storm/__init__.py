@@ -1,2 +1,71 @@
-from .modules import *
-from .engine import *
+from ..lazy_loader import attach
+
+# Submodules are imported on first access to one of their attributes, see `lazy_loader.attach`.
+_import_structure = {
+    "modules": [
+        "clean_up_section",
+        "ArticleGenerationModule",
+        "WriteSection",
+        "separate_citations",
+        "ArticleTextProcessing",
+        "QuestionToQuery",
+        "AnswerQuestion",
+        "format_search_results",
+        "extract_cited_storm_info",
+        "GroundedQuestionGeneration",
+        "GroundedQuestionGenerationModule",
+        "KnowledgeNode",
+        "get_text_embeddings",
+        "Information",
+        "InsertInformation",
+        "InsertInformationCandidateChoice",
+        "InsertInformationModule",
+        "ExpandSection",
+        "ExpandNodeModule",
+        "AskQuestionWithPersona",
+        "GenSimulatedUserUtterance",
+        "WritePageOutline",
+        "AP",
+        "WarmStartModerator",
+        "SectionToConvTranscript",
+        "ReportToConversation",
+        "WarmStartConversation",
+        "GenerateWarmStartOutline",
+        "GenerateWarmStartOutlineModule",
+        "KnowledgeBaseSummmary",
+        "KnowledgeBaseSummaryModule",
+        "trim_output_after_hint",
+        "extract_and_remove_citations",
+        "keep_first_and_last_paragraph",
+        "AnswerQuestionModule",
+        "ConvertUtteranceStyle",
+        "GenExpertActionPlanning",
+        "CoStormExpertUtteranceGenerationModule",
+    ],
+    "engine": [
+        "collaborative_storm_utils",
+        "BaseCallbackHandler",
+        "SimulatedUser",
+        "PureRAGAgent",
+        "Moderator",
+        "CoStormExpert",
+        "GenerateExpertModule",
+        "WarmStartModule",
+        "ConversationTurn",
+        "KnowledgeBase",
+        "LMConfigs",
+        "Agent",
+        "LoggingWrapper",
+        "OpenAIModel",
+        "AzureOpenAIModel",
+        "TogetherClient",
+        "BingSearch",
+        "CollaborativeStormLMConfigs",
+        "RunnerArgument",
+        "TurnPolicySpec",
+        "DiscourseManager",
+        "CoStormRunner",
+    ],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _import_structure)
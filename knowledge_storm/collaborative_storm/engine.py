@@ -1,5 +1,7 @@
 import dspy
+import logging
 import os
+import tempfile
 from dataclasses import dataclass, field, asdict
 from typing import List, Union, Literal, Optional, Dict
 
@@ -16,7 +18,8 @@ from .modules.warmstart_hierarchical_chat import WarmStartModule
 from ..dataclass import ConversationTurn, KnowledgeBase
 from ..interface import LMConfigs, Agent
 from ..logging_wrapper import LoggingWrapper
-from ..lm import OpenAIModel, AzureOpenAIModel, TogetherClient
+from ..profiling import StageProfiler
+from ..lm import OpenAIModel, AzureOpenAIModel, TogetherClient, HedgedLM
 from ..rm import BingSearch
 
 
@@ -159,6 +162,18 @@ class CollaborativeStormLMConfigs(LMConfigs):
     def set_knowledge_base_lm(self, model: Union[dspy.dsp.LM, dspy.dsp.HFModel]):
         self.knowledge_base_lm = model
 
+    def enable_hedging(self, **hedge_kwargs):
+        """Hedge the calls on the critical path of `CoStormRunner.step()`.
+
+        These are the moderator's question (`question_asking_lm`), the turn policy and action planning
+        (`discourse_manage_lm`) and the experts' answers (`question_answering_lm`). See `HedgedLM` for
+        `hedge_kwargs`.
+        """
+        self._wrap_lms(
+            lambda lm: HedgedLM(lm, **hedge_kwargs),
+            ["question_asking_lm", "discourse_manage_lm", "question_answering_lm"],
+        )
+
     def collect_and_reset_lm_usage(self):
         lm_usage = {}
         for attr_name in self.__dict__:
@@ -266,6 +281,21 @@ class RunnerArgument:
         default=False,
         metadata={"help": "If True, switch to rag online baseline mode"},
     )
+    profile: bool = field(
+        default=False,
+        metadata={
+            "help": "If True, profile the CPU time (with a sampling profiler) and the peak memory (with tracemalloc) "
+            "of each pipeline stage and write the profiles to profile_dir."
+        },
+    )
+    profile_dir: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "Directory of the stage profiles, see profile. If None, the profile folder next to the LM "
+            "call history of the LM configs (see set_history_sink()), or a new temporary directory if the "
+            "history is not written to disk."
+        },
+    )
 
     def to_dict(self):
         """
@@ -511,6 +541,12 @@ class CoStormRunner:
         self.runner_argument = runner_argument
         self.lm_config = lm_config
         self.logging_wrapper = logging_wrapper
+        if self.runner_argument.profile:
+            if self.runner_argument.profile_dir is None:
+                self.runner_argument.profile_dir = self._default_profile_dir()
+            self.logging_wrapper.stage_profiler = StageProfiler(
+                self.runner_argument.profile_dir
+            )
         self.callback_handler = callback_handler
         if rm is None:
             self.rm = BingSearch(k=runner_argument.retrieve_top_k)
@@ -531,6 +567,17 @@ class CoStormRunner:
             callback_handler=callback_handler,
         )
 
+    def _default_profile_dir(self):
+        """The profile folder of the session output, i.e., next to the LM call history if it is written to disk."""
+        history_sink = getattr(self.lm_config, "history_sink", None)
+        if history_sink is not None:
+            return os.path.join(
+                os.path.dirname(os.path.abspath(history_sink.path)), "profile"
+            )
+        profile_dir = tempfile.mkdtemp(prefix="co-storm-profile-")
+        logging.info(f"Writing the stage profiles to {profile_dir}")
+        return profile_dir
+
     def to_dict(self):
         return {
             "runner_argument": self.runner_argument.to_dict(),
@@ -1,8 +1,65 @@
-from .article_generation import *
-from .grounded_question_answering import *
-from .grounded_question_generation import *
-from .information_insertion_module import *
-from .simulate_user import *
-from .warmstart_hierarchical_chat import *
-from .knowledge_base_summary import *
-from .costorm_expert_utterance_generator import *
+from ...lazy_loader import attach
+
+# Submodules are imported on first access to one of their attributes, see `lazy_loader.attach`.
+_import_structure = {
+    "article_generation": [
+        "clean_up_section",
+        "ArticleGenerationModule",
+        "WriteSection",
+    ],
+    "grounded_question_answering": [
+        "separate_citations",
+        "ArticleTextProcessing",
+        "QuestionToQuery",
+        "AnswerQuestion",
+    ],
+    "grounded_question_generation": [
+        "format_search_results",
+        "extract_cited_storm_info",
+        "GroundedQuestionGeneration",
+        "GroundedQuestionGenerationModule",
+    ],
+    "information_insertion_module": [
+        "KnowledgeNode",
+        "get_text_embeddings",
+        "Information",
+        "InsertInformation",
+        "InsertInformationCandidateChoice",
+        "InsertInformationModule",
+        "ExpandSection",
+        "ExpandNodeModule",
+    ],
+    "simulate_user": ["AskQuestionWithPersona", "GenSimulatedUserUtterance"],
+    "warmstart_hierarchical_chat": [
+        "GenerateExpertModule",
+        "LMConfigs",
+        "WritePageOutline",
+        "AP",
+        "WarmStartModerator",
+        "SectionToConvTranscript",
+        "ReportToConversation",
+        "WarmStartConversation",
+        "GenerateWarmStartOutline",
+        "GenerateWarmStartOutlineModule",
+        "WarmStartModule",
+    ],
+    "knowledge_base_summary": [
+        "KnowledgeBase",
+        "KnowledgeBaseSummmary",
+        "KnowledgeBaseSummaryModule",
+    ],
+    "costorm_expert_utterance_generator": [
+        "BaseCallbackHandler",
+        "trim_output_after_hint",
+        "extract_and_remove_citations",
+        "keep_first_and_last_paragraph",
+        "AnswerQuestionModule",
+        "ConvertUtteranceStyle",
+        "ConversationTurn",
+        "LoggingWrapper",
+        "GenExpertActionPlanning",
+        "CoStormExpertUtteranceGenerationModule",
+    ],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _import_structure)
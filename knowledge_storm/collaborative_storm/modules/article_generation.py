@@ -4,6 +4,7 @@ from typing import Set, Union
 
 from .collaborative_storm_utils import clean_up_section
 from ...dataclass import KnowledgeBase, KnowledgeNode
+from ...tracing import propagate_context
 
 
 class ArticleGenerationModule(dspy.Module):
@@ -80,7 +81,7 @@ class ArticleGenerationModule(dspy.Module):
         with ThreadPoolExecutor(max_workers=5) as executor:
             # Submit all tasks
             future_to_node = {
-                executor.submit(_node_generate_paragraph, node): node
+                executor.submit(propagate_context(_node_generate_paragraph), node): node
                 for node in all_nodes
             }
 
@@ -4,13 +4,13 @@ import re
 import traceback
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from sklearn.metrics.pairwise import cosine_similarity
 from typing import List, Union, Dict, Optional
 
 from .collaborative_storm_utils import trim_output_after_hint
 from ...dataclass import KnowledgeNode, KnowledgeBase
 from ...encoder import get_text_embeddings
 from ...interface import Information
+from ...tracing import propagate_context
 
 
 class InsertInformation(dspy.Signature):
@@ -152,6 +152,8 @@ class InsertInformationModule(dspy.Module):
         question: str,
         query: str,
     ):
+        from sklearn.metrics.pairwise import cosine_similarity
+
         if encoded_outline is not None and encoded_outline.size > 0:
             encoded_query, token_usage = get_text_embeddings(f"{question}, {query}")
             sim = cosine_similarity([encoded_query], encoded_outline)[0]
@@ -278,7 +280,9 @@ class InsertInformationModule(dspy.Module):
             # use multi thread as knowledge base structure does not change
             with ThreadPoolExecutor(max_workers=max_thread) as executor:
                 futures = {
-                    executor.submit(process_intent, question, query): (question, query)
+                    executor.submit(
+                        propagate_context(process_intent), question, query
+                    ): (question, query)
                     for (question, query) in intent_to_placement_dict
                 }
 
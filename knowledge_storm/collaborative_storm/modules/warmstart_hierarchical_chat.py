@@ -20,6 +20,7 @@ from .grounded_question_answering import AnswerQuestionModule
 from ...dataclass import ConversationTurn, KnowledgeBase
 from ...interface import LMConfigs
 from ...logging_wrapper import LoggingWrapper
+from ...tracing import propagate_context
 from ...storm_wiki.modules.outline_generation import WritePageOutline
 from ...utils import ArticleTextProcessing as AP
 
@@ -91,7 +92,8 @@ class ReportToConversation(dspy.Module):
 
         with concurrent.futures.ThreadPoolExecutor() as executor:
             future_to_node = {
-                executor.submit(process_node, node, topic): node for node in nodes
+                executor.submit(propagate_context(process_node), node, topic): node
+                for node in nodes
             }
             for future in concurrent.futures.as_completed(future_to_node):
                 node = future_to_node[future]
@@ -244,7 +246,7 @@ class WarmStartConversation(dspy.Module):
             max_workers=self.max_thread
         ) as executor:
             futures = [
-                executor.submit(process_expert, expert)
+                executor.submit(propagate_context(process_expert), expert)
                 for expert in experts[: min(len(experts), self.max_num_experts)]
             ]
             concurrent.futures.wait(futures)
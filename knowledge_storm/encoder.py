@@ -5,6 +5,15 @@ import numpy as np
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from .metrics import (
+    EMBEDDING_IN_FLIGHT,
+    EMBEDDING_REQUESTS,
+    EMBEDDING_SECONDS,
+    record_cache_lookup,
+    track,
+)
+from .tracing import add_to_current_span, propagate_context, span
+
 
 class EmbeddingModel:
     def __init__(self):
@@ -106,13 +115,23 @@ def get_text_embeddings(
         )
 
     def fetch_embedding(text: str) -> Tuple[str, np.ndarray, int]:
+        if embedding_cache is not None:
+            record_cache_lookup("embedding", hit=text in embedding_cache)
         if embedding_cache is not None and text in embedding_cache:
+            add_to_current_span(cache_hits=1)
             return (
                 text,
                 embedding_cache[text],
                 0,
             )  # Returning 0 tokens since no API call is made
-        embedding, token_usage = embedding_model.get_embedding(text)
+        with span("embedding", "embedding", chars=len(text)) as s, track(
+            EMBEDDING_REQUESTS,
+            EMBEDDING_SECONDS,
+            EMBEDDING_IN_FLIGHT,
+            provider=encoder_type,
+        ):
+            embedding, token_usage = embedding_model.get_embedding(text)
+            s.set(tokens=token_usage)
         return text, embedding, token_usage
 
     if isinstance(texts, str):
@@ -122,8 +141,13 @@ def get_text_embeddings(
     embeddings = []
     total_tokens = 0
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(fetch_embedding, text): text for text in texts}
+    with span(
+        "get_text_embeddings", "embedding", num_texts=len(texts)
+    ) as batch_span, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(propagate_context(fetch_embedding), text): text
+            for text in texts
+        }
 
         for future in as_completed(futures):
             try:
@@ -133,6 +157,7 @@ def get_text_embeddings(
             except Exception as e:
                 print(f"An error occurred for text: {futures[future]}")
                 print(e)
+        batch_span.set(tokens=total_tokens)
 
     # Sort results to match the order of the input texts
     embeddings.sort(key=lambda x: texts.index(x[0]))
@@ -1,14 +1,20 @@
+import asyncio
 import concurrent.futures
+import contextvars
 import dspy
 import functools
 import hashlib
+import inspect
 import json
 import logging
 import time
 from abc import ABC, abstractmethod
 from collections import OrderedDict
-from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
 
+from . import metrics
+from .tracing import propagate_context, span
 from .utils import ArticleTextProcessing
 
 logging.basicConfig(
@@ -19,6 +25,12 @@ logger = logging.getLogger(__name__)
 if TYPE_CHECKING:
     from .logging_wrapper import LoggingWrapper
 
+# Event loop of the running `arun()` pipeline. Worker threads started with `asyncio.to_thread()` inherit it, which
+# lets synchronous module code hand I/O (e.g., search requests) back to the loop instead of blocking a thread on it.
+pipeline_event_loop: contextvars.ContextVar[Optional[asyncio.AbstractEventLoop]] = (
+    contextvars.ContextVar("pipeline_event_loop", default=None)
+)
+
 
 class InformationTable(ABC):
     """
@@ -269,6 +281,9 @@ class Retriever:
     def __init__(self, rm: dspy.Retrieve, max_thread: int = 1):
         self.max_thread = max_thread
         self.rm = rm
+        # Threads for retrieval models without `aforward()` in `aretrieve()`. Kept apart from the event loop's
+        # default executor so that searches never wait behind the module threads that issued them.
+        self._async_fallback_executor = None
 
     def collect_and_reset_rm_usage(self):
         combined_usage = []
@@ -285,34 +300,108 @@ class Retriever:
 
         return name_to_usage
 
+    @staticmethod
+    def _to_information(retrieved_data_list: List[Dict], q: str) -> List[Information]:
+        local_to_return = []
+        for data in retrieved_data_list:
+            for i in range(len(data["snippets"])):
+                # STORM generate the article with citations. We do not consider multi-hop citations.
+                # Remove citations in the source to avoid confusion.
+                data["snippets"][i] = ArticleTextProcessing.remove_citations(
+                    data["snippets"][i]
+                )
+            storm_info = Information.from_dict(data)
+            storm_info.meta["query"] = q
+            local_to_return.append(storm_info)
+        return local_to_return
+
     def retrieve(
         self, query: Union[str, List[str]], exclude_urls: List[str] = []
     ) -> List[Information]:
+        loop = pipeline_event_loop.get()
+        if loop is not None and loop.is_running():
+            try:
+                running_loop = asyncio.get_running_loop()
+            except RuntimeError:
+                running_loop = None
+            if running_loop is None:
+                # Called from a worker thread of `arun()`: let the event loop do the I/O.
+                return asyncio.run_coroutine_threadsafe(
+                    self.aretrieve(query, exclude_urls=exclude_urls), loop
+                ).result()
+
         queries = query if isinstance(query, list) else [query]
         to_return = []
 
         def process_query(q):
-            retrieved_data_list = self.rm(
-                query_or_queries=[q], exclude_urls=exclude_urls
-            )
-            local_to_return = []
-            for data in retrieved_data_list:
-                for i in range(len(data["snippets"])):
-                    # STORM generate the article with citations. We do not consider multi-hop citations.
-                    # Remove citations in the source to avoid confusion.
-                    data["snippets"][i] = ArticleTextProcessing.remove_citations(
-                        data["snippets"][i]
-                    )
-                storm_info = Information.from_dict(data)
-                storm_info.meta["query"] = q
-                local_to_return.append(storm_info)
-            return local_to_return
-
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=self.max_thread
-        ) as executor:
-            results = list(executor.map(process_query, queries))
+            with span("search", "rm", query=q) as s, self._track_query():
+                retrieved_data_list = self.rm(
+                    query_or_queries=[q], exclude_urls=exclude_urls
+                )
+                s.set(num_results=len(retrieved_data_list))
+            return self._to_information(retrieved_data_list, q)
+
+        with span("retrieve", "rm", num_queries=len(queries)) as s:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_thread
+            ) as executor:
+                results = list(executor.map(propagate_context(process_query), queries))
+
+            for result in results:
+                to_return.extend(result)
+            s.set(num_results=len(to_return))
+
+        return to_return
 
+    def _track_query(self):
+        return metrics.track(
+            metrics.RM_QUERIES,
+            metrics.RM_SECONDS,
+            metrics.RM_IN_FLIGHT,
+            rm=type(self.rm).__name__,
+        )
+
+    async def aretrieve(
+        self, query: Union[str, List[str]], exclude_urls: List[str] = []
+    ) -> List[Information]:
+        """Asyncio counterpart of `retrieve()`.
+
+        Uses `rm.aforward()` when the retrieval model provides it; otherwise the synchronous retrieval model runs in
+        worker threads. At most `max_thread` queries are in flight.
+        """
+        queries = query if isinstance(query, list) else [query]
+        semaphore = asyncio.Semaphore(self.max_thread)
+
+        async def process_query(q):
+            async with semaphore:
+                # The span and the metrics are plain context managers, they cannot be combined with `async with`.
+                with span("search", "rm", query=q), self._track_query():
+                    if hasattr(self.rm, "aforward"):
+                        retrieved_data_list = await self.rm.aforward(
+                            query_or_queries=[q], exclude_urls=exclude_urls
+                        )
+                    else:
+                        if self._async_fallback_executor is None:
+                            self._async_fallback_executor = (
+                                concurrent.futures.ThreadPoolExecutor(
+                                    max_workers=self.max_thread
+                                )
+                            )
+                        retrieved_data_list = (
+                            await asyncio.get_running_loop().run_in_executor(
+                                self._async_fallback_executor,
+                                functools.partial(
+                                    propagate_context(self.rm),
+                                    query_or_queries=[q],
+                                    exclude_urls=exclude_urls,
+                                ),
+                            )
+                        )
+            return self._to_information(retrieved_data_list, q)
+
+        results = await asyncio.gather(*[process_query(q) for q in queries])
+
+        to_return = []
         for result in results:
             to_return.extend(result)
 
@@ -440,12 +529,70 @@ class LMConfigs(ABC):
                     f"Language model for {attr_name} is not initialized. Please call set_{attr_name}()"
                 )
 
+    def _wrap_lms(
+        self,
+        wrapper_factory: Callable[[dspy.dsp.LM], dspy.dsp.LM],
+        attr_names: Optional[List[str]] = None,
+    ):
+        """Replace the language models in `attr_names` (all of them by default) with `wrapper_factory(lm)`.
+
+        A client used in several places gets a single wrapper, and a language model already wrapped by a wrapper
+        of the same class is left as is. Must be called before the runner is created since the modules keep a
+        reference to their language model.
+        """
+        if attr_names is None:
+            attr_names = [
+                attr_name for attr_name in self.__dict__ if "_lm" in attr_name
+            ]
+        wrappers = {}
+        for attr_name in attr_names:
+            lm = getattr(self, attr_name)
+            if lm is None:
+                continue
+            if id(lm) not in wrappers:
+                wrapper = wrapper_factory(lm)
+                wrappers[id(lm)] = lm if type(wrapper) is type(lm) else wrapper
+            setattr(self, attr_name, wrappers[id(lm)])
+
+    def enable_tracing(self):
+        """Wrap all language models with `TracedLM` so that their calls show up in traces."""
+        from .lm import TracedLM
+
+        self._wrap_lms(TracedLM)
+
+    def enable_metrics(self):
+        """Wrap all language models with `MeteredLM` to count their calls, latency and errors in `knowledge_storm.metrics`."""
+        from .lm import MeteredLM
+
+        self._wrap_lms(MeteredLM)
+
+    def set_history_sink(self, sink, max_history_size: int = 100):
+        """Stream the calls of all language models to `sink` (a `LMHistorySink`) as they happen.
+
+        The LMs then only keep their last `max_history_size` calls in memory, so `collect_and_reset_lm_history()`
+        returns at most that many calls per LM; the full history is in the sink.
+        """
+        self.history_sink = sink
+        self.max_history_size = max_history_size
+        for attr_name in self.__dict__:
+            if "_lm" in attr_name and hasattr(getattr(self, attr_name), "history"):
+                getattr(self, attr_name).history = self._new_lm_history(attr_name)
+
+    def _new_lm_history(self, attr_name):
+        from .lm_history import LMCallHistory
+
+        if getattr(self, "history_sink", None) is None:
+            return []
+        return LMCallHistory(
+            self.history_sink, source=attr_name, max_size=self.max_history_size
+        )
+
     def collect_and_reset_lm_history(self):
         history = []
         for attr_name in self.__dict__:
             if "_lm" in attr_name and hasattr(getattr(self, attr_name), "history"):
                 history.extend(getattr(self, attr_name).history)
-                getattr(self, attr_name).history = []
+                getattr(self, attr_name).history = self._new_lm_history(attr_name)
 
         return history
 
@@ -489,14 +636,18 @@ class Engine(ABC):
         self.time = {}
         self.lm_cost = {}  # Cost of language models measured by in/out tokens.
         self.rm_cost = {}  # Cost of retrievers measured by number of queries.
+        # A `StageProfiler` profiling each run_* method, set by the runners when profiling is enabled.
+        self.stage_profiler = None
+
+    def _profile_stage(self, stage: str):
+        if self.stage_profiler is None:
+            return nullcontext()
+        return self.stage_profiler.profile(stage)
 
     def log_execution_time_and_lm_rm_usage(self, func):
         """Decorator to log the execution time, language model usage, and retrieval model usage of a function."""
 
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            start_time = time.time()
-            result = func(*args, **kwargs)
+        def log_usage(start_time):
             end_time = time.time()
             execution_time = end_time - start_time
             self.time[func.__name__] = execution_time
@@ -506,6 +657,29 @@ class Engine(ABC):
                 self.rm_cost[func.__name__] = (
                     self.retriever.collect_and_reset_rm_usage()
                 )
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_time = time.time()
+                with span(func.__name__, "stage"), metrics.stage(
+                    type(self).__name__, func.__name__
+                ), self._profile_stage(func.__name__):
+                    result = await func(*args, **kwargs)
+                log_usage(start_time)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.time()
+            with span(func.__name__, "stage"), metrics.stage(
+                type(self).__name__, func.__name__
+            ), self._profile_stage(func.__name__):
+                result = func(*args, **kwargs)
+            log_usage(start_time)
             return result
 
         return wrapper
@@ -515,7 +689,8 @@ class Engine(ABC):
         methods_to_decorate = [
             method_name
             for method_name in dir(self)
-            if callable(getattr(self, method_name)) and method_name.startswith("run_")
+            if callable(getattr(self, method_name))
+            and method_name.startswith(("run_", "arun_"))
         ]
         for method_name in methods_to_decorate:
             original_method = getattr(self, method_name)
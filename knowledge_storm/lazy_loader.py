@@ -0,0 +1,45 @@
+import importlib
+import importlib.util
+from typing import Dict, List
+
+
+def attach(package_name: str, import_structure: Dict[str, List[str]]):
+    """Lazily expose the attributes of a package's submodules.
+
+    Importing the whole package eagerly pulls in every LM/RM client and their dependencies (dspy, transformers,
+    sentence_transformers, langchain, ...). With this, a submodule is only imported the first time one of its
+    attributes is accessed on the package, e.g., `knowledge_storm.TogetherClient` imports `knowledge_storm.lm` but
+    not `knowledge_storm.rm`.
+
+    Usage in a package `__init__.py`:
+        __getattr__, __dir__, __all__ = attach(__name__, {"submodule": ["Name1", "Name2"]})
+
+    Args:
+        package_name: `__name__` of the package.
+        import_structure: Mapping from submodule name (relative to the package) to the names it exports.
+
+    Returns:
+        The module-level `__getattr__` and `__dir__` functions and the `__all__` list for the package.
+    """
+    name_to_module = {
+        name: module for module, names in import_structure.items() for name in names
+    }
+    package = importlib.import_module(package_name)
+
+    def __getattr__(name):
+        if name in name_to_module:
+            module = importlib.import_module(f".{name_to_module[name]}", package_name)
+            value = getattr(module, name)
+        elif importlib.util.find_spec(f"{package_name}.{name}") is not None:
+            # Submodules used to be reachable as attributes after importing the package.
+            value = importlib.import_module(f".{name}", package_name)
+        else:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        # Cache on the package so that later lookups don't go through __getattr__.
+        setattr(package, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(package)) | set(name_to_module))
+
+    return __getattr__, __dir__, list(name_to_module)
@@ -1,23 +1,362 @@
+import asyncio
+import bisect
+import concurrent.futures
+import contextvars
+import json
 import logging
 import os
 import random
 import threading
-from typing import Optional, Literal, Any
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from types import SimpleNamespace
 
 import backoff
 import dspy
+import httpx
+import openai
 import requests
 from dsp import ERRORS, backoff_hdlr, giveup_hdlr
 from dsp.modules.hf import openai_to_hf
 from dsp.modules.hf_client import send_hftgi_request_v01_wrapped
 from openai import OpenAI
-from transformers import AutoTokenizer
+from requests.adapters import HTTPAdapter
 import time
 
-try:
-    from anthropic import RateLimitError
-except ImportError:
-    RateLimitError = None
+from .metrics import LM_IN_FLIGHT, LM_REQUESTS, LM_SECONDS, LM_TOKENS, track
+from .tracing import add_to_current_span, propagate_context, span
+
+
+def _is_anthropic_rate_limit_error(e) -> bool:
+    """Check for anthropic's RateLimitError without importing anthropic when the module is loaded."""
+    return any(
+        cls.__name__ == "RateLimitError" and cls.__module__.startswith("anthropic")
+        for cls in type(e).__mro__
+    )
+
+
+def _giveup_anthropic(e) -> bool:
+    return not _is_anthropic_rate_limit_error(e) or giveup_hdlr(e)
+
+
+class RateLimiter:
+    """A thread-safe token-bucket rate limiter measured in requests per minute and tokens per minute.
+
+    The budget refills continuously, so a caller proceeds immediately whenever enough capacity is left and
+    only waits for the deficit otherwise. A server-provided Retry-After pauses every caller sharing the limiter.
+    Use `RateLimiter.for_model()` to share one limiter across all clients (and threads) of the same model.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._request_budget = float(requests_per_minute or 0)
+        self._token_budget = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+    @classmethod
+    def for_model(
+        cls,
+        model: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> "RateLimiter":
+        """Get the limiter shared by all clients of `model`, creating it on first use.
+
+        Limits passed by later callers tighten (never loosen) the shared limiter.
+        """
+        with cls._registry_lock:
+            limiter = cls._registry.get(model)
+            if limiter is None:
+                limiter = cls(requests_per_minute, tokens_per_minute)
+                cls._registry[model] = limiter
+            else:
+                limiter._tighten(requests_per_minute, tokens_per_minute)
+            return limiter
+
+    def _tighten(self, requests_per_minute, tokens_per_minute):
+        with self._lock:
+            if requests_per_minute and (
+                not self.requests_per_minute
+                or requests_per_minute < self.requests_per_minute
+            ):
+                self.requests_per_minute = requests_per_minute
+                self._request_budget = min(self._request_budget, requests_per_minute)
+            if tokens_per_minute and (
+                not self.tokens_per_minute or tokens_per_minute < self.tokens_per_minute
+            ):
+                self.tokens_per_minute = tokens_per_minute
+                self._token_budget = min(self._token_budget, tokens_per_minute)
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_budget = min(
+                float(self.requests_per_minute),
+                self._request_budget + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self._token_budget = min(
+                float(self.tokens_per_minute),
+                self._token_budget + elapsed * self.tokens_per_minute / 60,
+            )
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Consume the capacity if available and return 0, otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._blocked_until - now
+            if wait > 0:
+                return wait
+            wait = 0.0
+            if self.requests_per_minute and self._request_budget < 1:
+                wait = max(
+                    wait, (1 - self._request_budget) * 60 / self.requests_per_minute
+                )
+            if self.tokens_per_minute:
+                # A single request larger than the whole budget would otherwise wait forever.
+                needed = min(tokens, self.tokens_per_minute)
+                if self._token_budget < needed:
+                    wait = max(
+                        wait,
+                        (needed - self._token_budget) * 60 / self.tokens_per_minute,
+                    )
+            if wait <= 0:
+                if self.requests_per_minute:
+                    self._request_budget -= 1
+                if self.tokens_per_minute:
+                    self._token_budget -= tokens
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """Block until one request and `tokens` tokens are available, then consume them."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            add_to_current_span(rate_limit_wait_seconds=wait)
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        """Asyncio counterpart of `acquire()` that waits without blocking the event loop."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            add_to_current_span(rate_limit_wait_seconds=wait)
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token budget once the real usage of a request is known."""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._token_budget += estimated_tokens - actual_tokens
+
+    def block_for(self, seconds: float):
+        """Pause all callers for `seconds`, e.g., when the server responds with Retry-After."""
+        with self._lock:
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + max(seconds, 0)
+            )
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class PromptBatcher:
+    """Coalesce prompts submitted concurrently from different threads into batched requests.
+
+    The first prompt to arrive opens a batch and its thread waits up to `batch_window` seconds (or until
+    `max_batch_size` prompts have arrived) before sending the whole batch with `send_batch(prompts, kwargs)`.
+    Only prompts with identical generation kwargs share a batch. `send_batch` must return one result per prompt,
+    in order.
+    """
+
+    class _Batch:
+        def __init__(self):
+            self.prompts = []
+            self.results = None
+            self.error = None
+            self.full = threading.Event()
+            self.done = threading.Event()
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[str], dict], list],
+        batch_window: float = 0.02,
+        max_batch_size: int = 32,
+    ):
+        self.send_batch = send_batch
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._open_batches: Dict[str, "PromptBatcher._Batch"] = {}
+
+    def submit(self, prompt: str, kwargs: dict):
+        """Add `prompt` to the open batch for `kwargs` and block until its result is available."""
+        key = json.dumps(kwargs, sort_keys=True, default=str)
+        with self._lock:
+            batch = self._open_batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._open_batches[key] = self._Batch()
+            index = len(batch.prompts)
+            batch.prompts.append(prompt)
+            if len(batch.prompts) >= self.max_batch_size:
+                # Close the batch so that later prompts open a new one.
+                self._open_batches.pop(key, None)
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.batch_window)
+            with self._lock:
+                if self._open_batches.get(key) is batch:
+                    self._open_batches.pop(key)
+            try:
+                batch.results = self.send_batch(list(batch.prompts), kwargs)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+
+def get_loop_bound_client(owner, factory):
+    """Get an async HTTP client for the running event loop, cached on `owner`.
+
+    Async clients (httpx.AsyncClient and the SDK clients built on it) must not be shared across event loops,
+    so a new client is created when the wrapper is used from a different loop (e.g., a new `asyncio.run()`).
+    """
+    loop = asyncio.get_running_loop()
+    client = getattr(owner, "_async_client", None)
+    if client is None or getattr(owner, "_async_client_loop", None) is not loop:
+        client = factory()
+        owner._async_client = client
+        owner._async_client_loop = loop
+    return client
+
+
+def _model_name(lm) -> str:
+    return (
+        getattr(lm, "kwargs", {}).get("model")
+        or getattr(lm, "model", None)
+        or type(lm).__name__
+    )
+
+
+def _provider_name(lm) -> str:
+    # Wrappers (HedgedLM, BudgetedLM, TracedLM, ...) keep the client they wrap in `lm`.
+    while isinstance(getattr(lm, "lm", None), dspy.dsp.LM):
+        lm = lm.lm
+    return type(lm).__name__
+
+
+def _record_usage(lm, prompt_tokens: int, completion_tokens: int):
+    """Add the token usage reported by a provider to the current trace span and to the metrics."""
+    add_to_current_span(
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+    )
+    labels = dict(provider=type(lm).__name__, model=_model_name(lm))
+    LM_TOKENS.inc(prompt_tokens, kind="prompt", **labels)
+    LM_TOKENS.inc(completion_tokens, kind="completion", **labels)
+
+
+def _giveup_http_error(e):
+    """Retry on transport errors, timeouts, rate limits and server errors; give up on other client errors."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code < 500 and e.response.status_code not in (
+            408,
+            409,
+            429,
+        )
+    return False
+
+
+@backoff.on_exception(
+    backoff.expo,
+    (httpx.HTTPStatusError, httpx.TransportError),
+    max_time=1000,
+    max_tries=8,
+    on_backoff=backoff_hdlr,
+    giveup=_giveup_http_error,
+)
+async def apost_json(client: httpx.AsyncClient, url: str, headers: dict, payload: dict):
+    """POST `payload` as JSON with retries and return the decoded JSON response."""
+    response = await client.post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+ASYNC_LM_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+
+_token_stream_callback = contextvars.ContextVar("token_stream_callback", default=None)
+
+
+@contextmanager
+def stream_tokens(callback):
+    """Stream the completions of LM calls made within this context to `callback`.
+
+    `callback` is called with each new piece of text as it arrives. LM clients that support streaming
+    (OpenAIModel, ClaudeModel, TogetherClient and VLLMClient) switch to streaming requests inside the
+    context; other clients ignore it and return the full completion as usual. The callback is bound to
+    the current thread / asyncio task, so concurrent sections can stream to different callbacks.
+    """
+    token = _token_stream_callback.set(callback)
+    try:
+        yield
+    finally:
+        _token_stream_callback.reset(token)
+
+
+def get_token_stream_callback():
+    """Get the callback registered by `stream_tokens()` for the current context, if any."""
+    return _token_stream_callback.get()
+
+
+def iter_sse_data(lines):
+    """Yield the decoded JSON payloads of a server-sent event stream until `data: [DONE]`."""
+    for line in lines:
+        if not line:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            break
+        yield json.loads(data)
 
 
 class OpenAIModel(dspy.OpenAI):
@@ -42,6 +381,11 @@ class OpenAIModel(dspy.OpenAI):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.get("prompt_tokens", 0)
                 self.completion_tokens += usage_data.get("completion_tokens", 0)
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.get("prompt_tokens", 0),
+                completion_tokens=usage_data.get("completion_tokens", 0),
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -75,7 +419,14 @@ class OpenAIModel(dspy.OpenAI):
         #     else:
         #         kwargs = {**kwargs, "logprobs": 5}
 
-        response = self.request(prompt, **kwargs)
+        stream_callback = get_token_stream_callback()
+        if (
+            stream_callback is not None
+            and kwargs.get("n", self.kwargs.get("n", 1)) == 1
+        ):
+            response = self.stream_request(prompt, stream_callback, **kwargs)
+        else:
+            response = self.request(prompt, **kwargs)
 
         # Log the token usage from the OpenAI API response.
         self.log_usage(response)
@@ -109,6 +460,109 @@ class OpenAIModel(dspy.OpenAI):
 
         return completions
 
+    @backoff.on_exception(
+        backoff.expo,
+        ERRORS,
+        max_time=1000,
+        on_backoff=backoff_hdlr,
+        giveup=giveup_hdlr,
+    )
+    def _create_stream(self, **kwargs):
+        if self.model_type == "chat":
+            return openai.chat.completions.create(
+                **kwargs, stream=True, stream_options={"include_usage": True}
+            )
+        return openai.completions.create(
+            **kwargs, stream=True, stream_options={"include_usage": True}
+        )
+
+    def stream_request(self, prompt: str, callback, **kwargs):
+        """Same as `basic_request()` but streams the completion to `callback` as it is generated.
+
+        Returns a response dict in the same format as the non-streaming API so that token usage logging,
+        history and choice parsing work unchanged. Streaming requests bypass the dspy request cache.
+        """
+        raw_kwargs = kwargs
+        kwargs = {**self.kwargs, **kwargs}
+        if self.model_type == "chat":
+            messages = [{"role": "user", "content": prompt}]
+            if getattr(self, "system_prompt", None):
+                messages.insert(0, {"role": "system", "content": self.system_prompt})
+            kwargs["messages"] = messages
+        else:
+            kwargs["prompt"] = prompt
+
+        text, finish_reason, usage = "", None, None
+        for chunk in self._create_stream(**kwargs):
+            if chunk.usage:
+                usage = chunk.usage.model_dump()
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            piece = choice.delta.content if self.model_type == "chat" else choice.text
+            if piece:
+                text += piece
+                callback(piece)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+
+        if self.model_type == "chat":
+            choice = {"message": {"role": "assistant", "content": text}}
+        else:
+            choice = {"text": text}
+        response = {
+            "choices": [{"index": 0, "finish_reason": finish_reason, **choice}],
+            "usage": usage,
+        }
+        self.history.append(
+            {
+                "prompt": prompt,
+                "response": response,
+                "kwargs": kwargs,
+                "raw_kwargs": raw_kwargs,
+            }
+        )
+        return response
+
+    async def acall(self, prompt: str, **kwargs) -> list[str]:
+        """Asyncio counterpart of `__call__()`. Sends the request with httpx.AsyncClient."""
+        raw_kwargs = kwargs
+        kwargs = {**self.kwargs, **kwargs}
+        if self.model_type == "chat":
+            messages = [{"role": "user", "content": prompt}]
+            if getattr(self, "system_prompt", None):
+                messages.insert(0, {"role": "system", "content": self.system_prompt})
+            kwargs["messages"] = messages
+            endpoint = "chat/completions"
+        else:
+            kwargs["prompt"] = prompt
+            endpoint = "completions"
+        api_base = str(openai.base_url or "https://api.openai.com/v1/")
+        headers = {
+            "Authorization": f"Bearer {openai.api_key or os.getenv('OPENAI_API_KEY')}"
+        }
+        client = get_loop_bound_client(
+            self, lambda: httpx.AsyncClient(timeout=ASYNC_LM_TIMEOUT)
+        )
+        response = await apost_json(
+            client, api_base.rstrip("/") + "/" + endpoint, headers, kwargs
+        )
+        self.log_usage(response)
+        self.history.append(
+            {
+                "prompt": prompt,
+                "response": response,
+                "kwargs": kwargs,
+                "raw_kwargs": raw_kwargs,
+            }
+        )
+
+        choices = response["choices"]
+        completed_choices = [c for c in choices if c["finish_reason"] != "length"]
+        if len(completed_choices):
+            choices = completed_choices
+        return [self._get_choice_text(c) for c in choices]
+
 
 class DeepSeekModel(dspy.OpenAI):
     """A wrapper class for DeepSeek API, compatible with dspy.OpenAI."""
@@ -139,6 +593,11 @@ class DeepSeekModel(dspy.OpenAI):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.get("prompt_tokens", 0)
                 self.completion_tokens += usage_data.get("completion_tokens", 0)
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.get("prompt_tokens", 0),
+                completion_tokens=usage_data.get("completion_tokens", 0),
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -238,6 +697,11 @@ class AzureOpenAIModel(dspy.AzureOpenAI):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.get("prompt_tokens", 0)
                 self.completion_tokens += usage_data.get("completion_tokens", 0)
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.get("prompt_tokens", 0),
+                completion_tokens=usage_data.get("completion_tokens", 0),
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -283,6 +747,11 @@ class GroqModel(dspy.OpenAI):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.get("prompt_tokens", 0)
                 self.completion_tokens += usage_data.get("completion_tokens", 0)
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.get("prompt_tokens", 0),
+                completion_tokens=usage_data.get("completion_tokens", 0),
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -415,6 +884,11 @@ class ClaudeModel(dspy.dsp.modules.lm.LM):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.input_tokens
                 self.completion_tokens += usage_data.output_tokens
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.input_tokens,
+                completion_tokens=usage_data.output_tokens,
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -435,7 +909,14 @@ class ClaudeModel(dspy.dsp.modules.lm.LM):
         # caching mechanism requires hashable kwargs
         kwargs["messages"] = [{"role": "user", "content": prompt}]
         kwargs.pop("n")
-        response = self.client.messages.create(**kwargs)
+        stream_callback = get_token_stream_callback()
+        if stream_callback is None:
+            response = self.client.messages.create(**kwargs)
+        else:
+            with self.client.messages.stream(**kwargs) as stream:
+                for text in stream.text_stream:
+                    stream_callback(text)
+                response = stream.get_final_message()
         # history = {
         #     "prompt": prompt,
         #     "response": response,
@@ -464,16 +945,67 @@ class ClaudeModel(dspy.dsp.modules.lm.LM):
 
     @backoff.on_exception(
         backoff.expo,
-        (RateLimitError,),
+        (Exception,),
         max_time=1000,
         max_tries=8,
         on_backoff=backoff_hdlr,
-        giveup=giveup_hdlr,
+        giveup=_giveup_anthropic,
     )
     def request(self, prompt: str, **kwargs):
         """Handles retrieval of completions from Anthropic whilst handling API errors."""
         return self.basic_request(prompt, **kwargs)
 
+    @backoff.on_exception(
+        backoff.expo,
+        (Exception,),
+        max_time=1000,
+        max_tries=8,
+        on_backoff=backoff_hdlr,
+        giveup=_giveup_anthropic,
+    )
+    async def arequest(self, prompt: str, **kwargs):
+        """Asyncio counterpart of `request()` using the httpx-based AsyncAnthropic client."""
+        from anthropic import AsyncAnthropic
+
+        raw_kwargs = kwargs
+        kwargs = {**self.kwargs, **kwargs}
+        kwargs["messages"] = [{"role": "user", "content": prompt}]
+        kwargs.pop("n")
+        client = get_loop_bound_client(
+            self, lambda: AsyncAnthropic(api_key=self.api_key)
+        )
+        response = await client.messages.create(**kwargs)
+        self.history.append(
+            {
+                "prompt": prompt,
+                "response": {
+                    "content": response.content[0].text,
+                    "model": response.model,
+                    "role": response.role,
+                    "stop_reason": response.stop_reason,
+                    "stop_sequence": response.stop_sequence,
+                    "type": response.type,
+                    "usage": {
+                        "input_tokens": response.usage.input_tokens,
+                        "output_tokens": response.usage.output_tokens,
+                    },
+                },
+                "kwargs": kwargs,
+                "raw_kwargs": raw_kwargs,
+            }
+        )
+        return response
+
+    async def acall(self, prompt: str, **kwargs) -> list[str]:
+        """Asyncio counterpart of `__call__()`."""
+        n = kwargs.pop("n", 1)
+        completions = []
+        for _ in range(n):
+            response = await self.arequest(prompt, **kwargs)
+            self.log_usage(response)
+            completions = [c.text for c in response.content]
+        return completions
+
     def __call__(self, prompt, only_completed=True, return_sorted=False, **kwargs):
         """Retrieves completions from Anthropic.
 
@@ -517,28 +1049,141 @@ class VLLMClient(dspy.dsp.LM):
         model_type: Literal["chat", "text"] = "text",
         url="http://localhost",
         api_key="null",
+        batch_window: Optional[float] = None,
+        max_batch_size: int = 32,
+        hf_tokenizer_name: Optional[str] = None,
         **kwargs,
     ):
-        """Check out https://docs.vllm.ai/en/latest/serving/openai_compatible_server.html for more information."""
+        """Check out https://docs.vllm.ai/en/latest/serving/openai_compatible_server.html for more information.
+
+        Args:
+            batch_window: If set, prompts sent concurrently from different threads within `batch_window` seconds
+                are coalesced into one multi-prompt `/v1/completions` request (see `batch_request()`). The
+                completions endpoint does not apply the chat template the unbatched requests go through, so the
+                prompts are formatted with the chat template of the model's huggingface tokenizer first (requires
+                `transformers`).
+            max_batch_size: Maximum number of prompts in one coalesced request.
+            hf_tokenizer_name: Huggingface tokenizer whose chat template formats the batched prompts; defaults to
+                `model`.
+        """
         super().__init__(model=model)
         # Store additional kwargs for the generate method.
         self.kwargs = {**self.kwargs, **kwargs}
         self.model = model
+        self.model_type = model_type
         self.base_url = f"{url}:{port}/v1/"
+        self.completions_client = OpenAI(base_url=self.base_url, api_key=api_key)
         if model_type == "chat":
             self.base_url += "chat/"
         self.client = OpenAI(base_url=self.base_url, api_key=api_key)
         self.prompt_tokens = 0
         self.completion_tokens = 0
         self._token_usage_lock = threading.Lock()
+        self.batcher = None
+        if batch_window is not None:
+            logging.info("Loading huggingface tokenizer.")
+            from transformers import AutoTokenizer
+
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                hf_tokenizer_name or model, cache_dir=kwargs.get("cache_dir", None)
+            )
+            self.batcher = PromptBatcher(
+                self.batch_request,
+                batch_window=batch_window,
+                max_batch_size=max_batch_size,
+            )
+
+    @backoff.on_exception(
+        backoff.expo,
+        ERRORS,
+        max_time=1000,
+        on_backoff=backoff_hdlr,
+    )
+    def batch_request(self, prompts: List[str], kwargs: Optional[dict] = None):
+        """Send several prompts in one `/v1/completions` request.
+
+        Each prompt is sent as the chat-formatted user message the chat completions endpoint would build from it.
+
+        Args:
+            prompts: The prompts to complete.
+            kwargs: Generation kwargs shared by all prompts, merged over the client's kwargs.
+
+        Returns:
+            A list with the completions (a list of `n` strings) of each prompt, in order.
+        """
+        kwargs = {**self.kwargs, **(kwargs or {})}
+        n = kwargs.get("n", 1)
+        response = self.completions_client.completions.create(
+            prompt=[self._apply_chat_template(prompt) for prompt in prompts],
+            # The chat template already contains the special tokens (e.g., BOS) if the model uses them.
+            extra_body={"add_special_tokens": False},
+            **kwargs,
+        )
+        self.log_usage(response)
+        # Choices of prompt i are at indices [i * n, (i + 1) * n).
+        completions = [[] for _ in prompts]
+        for choice in sorted(response.choices, key=lambda c: c.index):
+            completions[choice.index // n].append(choice.text)
+        return completions
+
+    @staticmethod
+    def _messages(prompt: str) -> List[dict]:
+        return [{"role": "user", "content": prompt}]
+
+    def _apply_chat_template(self, prompt: str) -> str:
+        # vLLM's chat completions endpoint adds the generation prompt by default.
+        return self.tokenizer.apply_chat_template(
+            self._messages(prompt), tokenize=False, add_generation_prompt=True
+        )
 
     def basic_request(self, prompt, **kwargs):
         completion = self.client.chat.completions.create(
             **kwargs,
-            messages=[{"role": "user", "content": prompt}],
+            messages=self._messages(prompt),
         )
         return completion
 
+    @backoff.on_exception(
+        backoff.expo,
+        ERRORS,
+        max_time=1000,
+        on_backoff=backoff_hdlr,
+    )
+    def _create_stream(self, prompt, **kwargs):
+        return self.client.chat.completions.create(
+            **kwargs,
+            messages=self._messages(prompt),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+    def stream_request(self, prompt: str, callback, **kwargs):
+        """Same as `request()` but streams the completion to `callback` as it is generated.
+
+        Returns an object exposing `choices[i].message.content` and `usage` like the non-streaming response.
+        """
+        text, finish_reason, usage = "", None, None
+        for chunk in self._create_stream(prompt, **kwargs):
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                text += choice.delta.content
+                callback(choice.delta.content)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(role="assistant", content=text),
+                    finish_reason=finish_reason,
+                )
+            ],
+            usage=usage,
+        )
+
     @backoff.on_exception(
         backoff.expo,
         ERRORS,
@@ -555,6 +1200,11 @@ class VLLMClient(dspy.dsp.LM):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.prompt_tokens
                 self.completion_tokens += usage_data.completion_tokens
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.prompt_tokens,
+                completion_tokens=usage_data.completion_tokens,
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -571,10 +1221,24 @@ class VLLMClient(dspy.dsp.LM):
         return usage
 
     def __call__(self, prompt: str, **kwargs):
-        kwargs = {**self.kwargs, **kwargs}
+        stream_callback = get_token_stream_callback()
+        if self.batcher is not None and stream_callback is None:
+            completions = self.batcher.submit(prompt, kwargs)
+            self.history.append(
+                {
+                    "prompt": prompt,
+                    "response": {"choices": completions},
+                    "kwargs": {**self.kwargs, **kwargs},
+                }
+            )
+            return completions
 
+        kwargs = {**self.kwargs, **kwargs}
         try:
-            response = self.request(prompt, **kwargs)
+            if stream_callback is None:
+                response = self.request(prompt, **kwargs)
+            else:
+                response = self.stream_request(prompt, stream_callback, **kwargs)
         except Exception as e:
             print(f"Failed to generate completion: {e}")
             raise Exception(e)
@@ -593,6 +1257,33 @@ class VLLMClient(dspy.dsp.LM):
 
         return completions
 
+    async def acall(self, prompt: str, **kwargs) -> list[str]:
+        """Asyncio counterpart of `__call__()`. Sends the request with httpx.AsyncClient."""
+        kwargs = {**self.kwargs, **kwargs}
+        client = get_loop_bound_client(
+            self, lambda: httpx.AsyncClient(timeout=ASYNC_LM_TIMEOUT)
+        )
+        response = await apost_json(
+            client,
+            f"{self.base_url}chat/completions",
+            {"Authorization": f"Bearer {self.client.api_key}"},
+            {**kwargs, "messages": self._messages(prompt)},
+        )
+        usage_data = response.get("usage")
+        if usage_data:
+            with self._token_usage_lock:
+                self.prompt_tokens += usage_data.get("prompt_tokens", 0)
+                self.completion_tokens += usage_data.get("completion_tokens", 0)
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.get("prompt_tokens", 0),
+                completion_tokens=usage_data.get("completion_tokens", 0),
+            )
+
+        completions = [choice["message"]["content"] for choice in response["choices"]]
+        self.history.append({"prompt": prompt, "response": response, "kwargs": kwargs})
+        return completions
+
 
 class OllamaClient(dspy.OllamaLocal):
     """A wrapper class for dspy.OllamaClient."""
@@ -608,7 +1299,23 @@ class OllamaClient(dspy.OllamaLocal):
 
 
 class TGIClient(dspy.HFClientTGI):
-    def __init__(self, model, port, url, http_request_kwargs=None, **kwargs):
+    def __init__(
+        self,
+        model,
+        port,
+        url,
+        http_request_kwargs=None,
+        batch_window: Optional[float] = None,
+        max_batch_size: int = 32,
+        **kwargs,
+    ):
+        """
+        Args:
+            batch_window: If set, prompts sent concurrently from different threads within `batch_window` seconds
+                are coalesced into one multi-prompt `/v1/completions` request (see `batch_request()`). Requests
+                with `n > 1` are always sent individually.
+            max_batch_size: Maximum number of prompts in one coalesced request.
+        """
         super().__init__(
             model=model,
             port=port,
@@ -616,9 +1323,58 @@ class TGIClient(dspy.HFClientTGI):
             http_request_kwargs=http_request_kwargs,
             **kwargs,
         )
+        self.batcher = None
+        if batch_window is not None:
+            self.batcher = PromptBatcher(
+                self.batch_request,
+                batch_window=batch_window,
+                max_batch_size=max_batch_size,
+            )
+
+    @backoff.on_exception(
+        backoff.expo,
+        (requests.exceptions.RequestException,),
+        max_time=1000,
+        on_backoff=backoff_hdlr,
+    )
+    def batch_request(self, prompts: List[str], kwargs: Optional[dict] = None):
+        """Send several prompts in one request to the OpenAI-compatible `/v1/completions` endpoint of TGI.
+
+        Args:
+            prompts: The prompts to complete.
+            kwargs: Generation kwargs shared by all prompts, merged over the client's kwargs.
+
+        Returns:
+            A list with the completions (a list with one string) of each prompt, in order.
+        """
+        kwargs = {**self.kwargs, **(kwargs or {})}
+        payload = {
+            "model": "tgi",
+            "prompt": prompts,
+            "max_tokens": kwargs.get("max_tokens"),
+            "temperature": kwargs.get("temperature"),
+            "top_p": kwargs.get("top_p"),
+            "stop": kwargs.get("stop"),
+        }
+        payload = {k: v for k, v in payload.items() if v is not None}
+        response = requests.post(
+            f"{self.url}:{random.Random().choice(self.ports)}/v1/completions",
+            json=payload,
+            headers=self.headers,
+            **self.http_request_kwargs,
+        )
+        response.raise_for_status()
+        completions = [[] for _ in prompts]
+        for choice in response.json()["choices"]:
+            completions[choice["index"]].append(choice["text"])
+        return completions
 
     def _generate(self, prompt, **kwargs):
         """Copied from dspy/dsp/modules/hf_client.py with the addition of removing hard-coded parameters."""
+        if self.batcher is not None and {**self.kwargs, **kwargs}.get("n", 1) == 1:
+            completions = self.batcher.submit(prompt, kwargs)
+            return {"prompt": prompt, "choices": [{"text": c} for c in completions]}
+
         kwargs = {**self.kwargs, **kwargs}
 
         payload = {
@@ -669,6 +1425,229 @@ class TGIClient(dspy.HFClientTGI):
             raise Exception("Received invalid JSON response from server")
 
 
+class LMEndpointPool(dspy.dsp.LM):
+    """Route requests for one model across several replicas of a model server.
+
+    Wraps N clients (e.g., `VLLMClient`, `TGIClient` or `OllamaClient` instances pointing at different replicas
+    of the same model) and can be used wherever a single client is expected. Each request goes to the endpoint with
+    the fewest outstanding requests ("least_outstanding") or the lowest latency EWMA weighted by its outstanding
+    requests ("latency_ewma"). A failed request is retried on another endpoint. Endpoints that fail
+    `failure_threshold` times in a row are ejected for `ejection_time` seconds or until the background health check
+    sees them healthy again.
+    """
+
+    class _Endpoint:
+        def __init__(self, client, name: str, health_url: Optional[str]):
+            self.client = client
+            self.name = name
+            self.health_url = health_url
+            self.outstanding = 0
+            self.latency_ewma = None
+            self.consecutive_failures = 0
+            self.ejected_until = 0.0
+            self.request_count = 0
+            self.failure_count = 0
+
+    def __init__(
+        self,
+        clients: List[dspy.dsp.LM],
+        routing: Literal["least_outstanding", "latency_ewma"] = "least_outstanding",
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        health_check_interval: Optional[float] = 10.0,
+        health_check_timeout: float = 2.0,
+        ewma_alpha: float = 0.3,
+    ):
+        """
+        Args:
+            clients: Clients of the same model, one per endpoint.
+            routing: "least_outstanding" or "latency_ewma".
+            failure_threshold: Number of consecutive failures after which an endpoint is ejected.
+            ejection_time: Seconds an ejected endpoint is skipped unless a health check restores it earlier.
+            health_check_interval: Seconds between active health checks (GET on the server's health route).
+                Set to None to rely only on request failures.
+            health_check_timeout: Timeout of each health check request.
+            ewma_alpha: Smoothing factor of the latency EWMA.
+        """
+        if not clients:
+            raise ValueError("LMEndpointPool requires at least one client.")
+        if routing not in ("least_outstanding", "latency_ewma"):
+            raise ValueError(f"Unknown routing strategy: {routing}")
+        model = getattr(clients[0], "model", None) or clients[0].kwargs.get("model")
+        super().__init__(model=model)
+        self.endpoints = [
+            self._Endpoint(c, self._endpoint_name(c, i), self._health_url(c))
+            for i, c in enumerate(clients)
+        ]
+        self.model = model
+        self.kwargs = clients[0].kwargs
+        self.routing = routing
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    @property
+    def history(self):
+        return [h for e in getattr(self, "endpoints", []) for h in e.client.history]
+
+    @history.setter
+    def history(self, value):
+        # Only resetting is meaningful: the history lives in the endpoint clients.
+        for e in getattr(self, "endpoints", []):
+            e.client.history = (
+                value.empty_like() if hasattr(value, "empty_like") else list(value)
+            )
+
+    @staticmethod
+    def _endpoint_name(client, index: int) -> str:
+        if isinstance(client, TGIClient):
+            return f"{client.url}:{','.join(str(p) for p in client.ports)}"
+        if isinstance(client, VLLMClient):
+            return client.base_url.split("/v1/")[0]
+        return getattr(client, "base_url", None) or f"endpoint-{index}"
+
+    @staticmethod
+    def _health_url(client) -> Optional[str]:
+        if isinstance(client, TGIClient):
+            return f"{client.url}:{client.ports[0]}/health"
+        if isinstance(client, VLLMClient):
+            return client.base_url.split("/v1/")[0] + "/health"
+        if isinstance(client, OllamaClient):
+            # `OllamaLocal` stores the server root (e.g., http://localhost:11434) as `base_url`.
+            return client.base_url.rstrip("/") + "/api/version"
+        return None
+
+    def _pick_endpoint(self, excluded):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in excluded]
+            if not candidates:
+                return None
+            healthy = [e for e in candidates if e.ejected_until <= now]
+            if not healthy:
+                # Every endpoint is ejected: try the one that comes back first rather than failing outright.
+                healthy = [min(candidates, key=lambda e: e.ejected_until)]
+            if self.routing == "least_outstanding":
+                key = lambda e: (e.outstanding, e.latency_ewma or 0.0)
+            else:
+                # Endpoints without a latency estimate are tried first so that every replica gets measured.
+                key = lambda e: (e.latency_ewma or 0.0) * (e.outstanding + 1)
+            best = min(key(e) for e in healthy)
+            endpoint = random.choice([e for e in healthy if key(e) == best])
+            endpoint.outstanding += 1
+            endpoint.request_count += 1
+            return endpoint
+
+    def _release(self, endpoint, latency: Optional[float]):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if latency is None:
+                endpoint.failure_count += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold:
+                    endpoint.ejected_until = time.monotonic() + self.ejection_time
+                    logging.warning(
+                        f"Ejecting LM endpoint {endpoint.name} after {endpoint.consecutive_failures} failures."
+                    )
+            else:
+                endpoint.consecutive_failures = 0
+                endpoint.latency_ewma = (
+                    latency
+                    if endpoint.latency_ewma is None
+                    else self.ewma_alpha * latency
+                    + (1 - self.ewma_alpha) * endpoint.latency_ewma
+                )
+
+    def _route(self, method: str, prompt: str, **kwargs):
+        self._ensure_health_checks()
+        tried, last_error = [], None
+        while True:
+            endpoint = self._pick_endpoint(tried)
+            if endpoint is None:
+                raise last_error
+            tried.append(endpoint)
+            start = time.monotonic()
+            try:
+                result = getattr(endpoint.client, method)(prompt, **kwargs)
+            except Exception as e:
+                self._release(endpoint, None)
+                logging.warning(f"LM endpoint {endpoint.name} failed: {e}")
+                last_error = e
+                continue
+            self._release(endpoint, time.monotonic() - start)
+            return result
+
+    def basic_request(self, prompt: str, **kwargs):
+        return self._route("basic_request", prompt, **kwargs)
+
+    def __call__(self, prompt: str, **kwargs):
+        return self._route("__call__", prompt, **kwargs)
+
+    def _ensure_health_checks(self):
+        if self.health_check_interval is None or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(
+                    target=self._health_check_loop, daemon=True
+                )
+                self._health_thread.start()
+
+    def _health_check_loop(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            self._check_health()
+
+    def _check_health(self):
+        """Check every endpoint once: re-admit the healthy ejected ones and eject the unhealthy ones."""
+        for endpoint in self.endpoints:
+            if endpoint.health_url is None:
+                continue
+            try:
+                healthy = (
+                    requests.get(
+                        endpoint.health_url, timeout=self.health_check_timeout
+                    ).status_code
+                    < 400
+                )
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self._lock:
+                if healthy and endpoint.ejected_until > time.monotonic():
+                    logging.info(f"LM endpoint {endpoint.name} is healthy again.")
+                    endpoint.ejected_until = 0.0
+                    endpoint.consecutive_failures = 0
+                elif not healthy and endpoint.ejected_until <= time.monotonic():
+                    logging.warning(f"LM endpoint {endpoint.name} failed health check.")
+                    endpoint.ejected_until = time.monotonic() + (
+                        self.health_check_interval or self.ejection_time
+                    )
+
+    def get_usage_and_reset(self):
+        """Get the token usage and number of requests of each endpoint and reset them.
+
+        Keys are `<model>@<endpoint>` so that the usage of each replica is reported separately.
+        """
+        usage = {}
+        for endpoint in self.endpoints:
+            tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+            if hasattr(endpoint.client, "get_usage_and_reset"):
+                for t in endpoint.client.get_usage_and_reset().values():
+                    tokens["prompt_tokens"] += t["prompt_tokens"]
+                    tokens["completion_tokens"] += t["completion_tokens"]
+            with self._lock:
+                tokens["requests"] = endpoint.request_count
+                tokens["failures"] = endpoint.failure_count
+                endpoint.request_count = 0
+                endpoint.failure_count = 0
+            usage[f"{self.model}@{endpoint.name}"] = tokens
+        return usage
+
+
 class TogetherClient(dspy.HFModel):
     """A wrapper class for dspy.Together."""
 
@@ -679,12 +1658,36 @@ class TogetherClient(dspy.HFModel):
         apply_tokenizer_chat_template=False,
         hf_tokenizer_name=None,
         model_type: Literal["chat", "text"] = "chat",
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_thread_num: int = 10,
+        max_rate_limit_retries: int = 8,
         **kwargs,
     ):
-        """Copied from dspy/dsp/modules/hf_client.py with the support of applying tokenizer chat template."""
+        """Copied from dspy/dsp/modules/hf_client.py with the support of applying tokenizer chat template.
+
+        Args:
+            requests_per_minute: Request rate limit shared by all TogetherClient instances of the same model.
+            tokens_per_minute: Token rate limit (prompt + completion) shared the same way.
+            max_thread_num: Number of threads expected to call the client concurrently. Used to size the
+                connection pool; set it to the `max_thread_num` of the runner.
+            max_rate_limit_retries: Number of times to honour a 429/503 response before giving up.
+        """
 
         super().__init__(model=model, is_client=True)
         self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(max_thread_num, 1), pool_block=False
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rate_limiter = RateLimiter.for_model(
+            model,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.max_thread_num = max(max_thread_num, 1)
         self.api_key = api_key = (
             os.environ.get("TOGETHER_API_KEY") if api_key is None else api_key
         )
@@ -706,6 +1709,8 @@ class TogetherClient(dspy.HFModel):
             logging.info("Loading huggingface tokenizer.")
             if hf_tokenizer_name is None:
                 hf_tokenizer_name = self.model
+            from transformers import AutoTokenizer
+
             self.tokenizer = AutoTokenizer.from_pretrained(
                 hf_tokenizer_name, cache_dir=kwargs.get("cache_dir", None)
             )
@@ -733,6 +1738,11 @@ class TogetherClient(dspy.HFModel):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.get("prompt_tokens", 0)
                 self.completion_tokens += usage_data.get("completion_tokens", 0)
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.get("prompt_tokens", 0),
+                completion_tokens=usage_data.get("completion_tokens", 0),
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -754,6 +1764,96 @@ class TogetherClient(dspy.HFModel):
         on_backoff=backoff_hdlr,
     )
     def _generate(self, prompt, **kwargs):
+        prompt, body, max_tokens = self._build_body(prompt, **kwargs)
+
+        stream_callback = get_token_stream_callback()
+        if stream_callback is not None:
+            body["stream"] = True
+
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        # Rough prompt size (~4 characters per token) plus the completion budget; corrected after the call.
+        estimated_tokens = len(str(body.get("messages", prompt))) // 4 + max_tokens
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.rate_limiter.acquire(tokens=estimated_tokens)
+            resp = self.session.post(
+                self.api_base,
+                headers=headers,
+                json=body,
+                stream=stream_callback is not None,
+            )
+            if resp.status_code not in (429, 503):
+                break
+            self.rate_limiter.block_for(
+                self._retry_after(resp, attempt, estimated_tokens)
+            )
+            resp.close()
+        else:
+            resp.raise_for_status()
+
+        with resp:
+            if stream_callback is None:
+                resp_json = resp.json()
+            else:
+                resp_json = self._collect_stream(resp, stream_callback)
+            return self._process_response(prompt, resp_json, estimated_tokens)
+
+    @backoff.on_exception(
+        backoff.expo,
+        (httpx.HTTPStatusError, httpx.TransportError),
+        max_time=1000,
+        max_tries=8,
+        on_backoff=backoff_hdlr,
+        giveup=_giveup_http_error,
+    )
+    async def _agenerate(self, prompt, **kwargs):
+        """Asyncio counterpart of `_generate()`. Token streaming is not supported."""
+        prompt, body, max_tokens = self._build_body(prompt, **kwargs)
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        estimated_tokens = len(str(body.get("messages", prompt))) // 4 + max_tokens
+        client = get_loop_bound_client(
+            self,
+            lambda: httpx.AsyncClient(
+                timeout=ASYNC_LM_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.max_thread_num),
+            ),
+        )
+        for attempt in range(self.max_rate_limit_retries + 1):
+            await self.rate_limiter.aacquire(tokens=estimated_tokens)
+            resp = await client.post(self.api_base, headers=headers, json=body)
+            if resp.status_code not in (429, 503):
+                break
+            self.rate_limiter.block_for(
+                self._retry_after(resp, attempt, estimated_tokens)
+            )
+        resp.raise_for_status()
+        return self._process_response(prompt, resp.json(), estimated_tokens)
+
+    async def acall(self, prompt: str, **kwargs) -> list[str]:
+        """Asyncio counterpart of `__call__()`."""
+        response = await self._agenerate(prompt, **kwargs)
+        self.history.append(
+            {
+                "prompt": prompt,
+                "response": response,
+                "kwargs": {**self.kwargs, **kwargs},
+                "raw_kwargs": kwargs,
+            }
+        )
+        return [c["text"] for c in response["choices"]]
+
+    def _retry_after(self, resp, attempt, estimated_tokens):
+        """Return the back-off for a 429/503 response and give its token estimate back to the limiter."""
+        self.rate_limiter.reconcile(estimated_tokens, 0)
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = min(2**attempt, 60)
+        logging.warning(
+            f"Together API responded with {resp.status_code} for {self.model}. Retrying after {retry_after:.1f}s."
+        )
+        return retry_after
+
+    def _build_body(self, prompt, **kwargs):
+        """Build the request body. Returns the (templated) prompt, the body and the completion budget."""
         kwargs = {**self.kwargs, **kwargs}
 
         stop = kwargs.get("stop")
@@ -797,25 +1897,44 @@ class TogetherClient(dspy.HFModel):
                 "repetition_penalty": repetition_penalty,
                 "stop": stop,
             }
+        return prompt, body, max_tokens
+
+    def _process_response(self, prompt, resp_json, estimated_tokens):
+        # Log the token usage from the Together API response.
+        self.log_usage(resp_json)
+        usage_data = resp_json.get("usage") or {}
+        self.rate_limiter.reconcile(
+            estimated_tokens,
+            usage_data.get("prompt_tokens", 0) + usage_data.get("completion_tokens", 0)
+            or estimated_tokens,
+        )
+        if self.model_type == "chat":
+            # completions = [resp_json['output'].get('choices', [])[0].get('message', {}).get('content', "")]
+            completions = [
+                resp_json.get("choices", [])[0].get("message", {}).get("content", "")
+            ]
+        else:
+            # completions = [resp_json['output'].get('choices', [])[0].get('text', "")]
+            completions = [resp_json.get("choices", [])[0].get("text", "")]
+        response = {"prompt": prompt, "choices": [{"text": c} for c in completions]}
+        return response
 
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        time.sleep(1)
-        with self.session.post(self.api_base, headers=headers, json=body) as resp:
-            resp_json = resp.json()
-            # Log the token usage from the Together API response.
-            self.log_usage(resp_json)
-            if self.model_type == "chat":
-                # completions = [resp_json['output'].get('choices', [])[0].get('message', {}).get('content', "")]
-                completions = [
-                    resp_json.get("choices", [])[0]
-                    .get("message", {})
-                    .get("content", "")
-                ]
-            else:
-                # completions = [resp_json['output'].get('choices', [])[0].get('text', "")]
-                completions = [resp_json.get("choices", [])[0].get("text", "")]
-            response = {"prompt": prompt, "choices": [{"text": c} for c in completions]}
-            return response
+    def _collect_stream(self, resp, callback):
+        """Forward a server-sent event stream to `callback` and assemble it into a non-streaming response."""
+        text, usage = "", None
+        for chunk in iter_sse_data(resp.iter_lines()):
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                piece = (choice.get("delta") or {}).get("content") or choice.get("text")
+                if piece:
+                    text += piece
+                    callback(piece)
+        if self.model_type == "chat":
+            choice = {"message": {"role": "assistant", "content": text}}
+        else:
+            choice = {"text": text}
+        return {"choices": [choice], "usage": usage}
 
 
 class GoogleModel(dspy.dsp.modules.lm.LM):
@@ -876,6 +1995,11 @@ class GoogleModel(dspy.dsp.modules.lm.LM):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.prompt_token_count
                 self.completion_tokens += usage_data.candidates_token_count
+            _record_usage(
+                self,
+                prompt_tokens=usage_data.prompt_token_count,
+                completion_tokens=usage_data.candidates_token_count,
+            )
 
     def get_usage_and_reset(self):
         """Get the total tokens used and reset the token usage."""
@@ -943,3 +2067,437 @@ class GoogleModel(dspy.dsp.modules.lm.LM):
             completions.append(response.parts[0].text)
 
         return completions
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of request latencies with log-spaced buckets from 10ms to about 1.5 hours."""
+
+    _BUCKETS = [0.01 * 1.25**i for i in range(60)]
+    _registry: Dict[str, "LatencyHistogram"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self._BUCKETS) + 1)
+        self.total = 0
+
+    @classmethod
+    def for_model(cls, model: str) -> "LatencyHistogram":
+        """Get the histogram shared by every wrapper of `model`."""
+        with cls._registry_lock:
+            if model not in cls._registry:
+                cls._registry[model] = cls()
+            return cls._registry[model]
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self._BUCKETS, seconds)] += 1
+            self.total += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the upper bound of the bucket containing the q-quantile, or None if nothing is observed."""
+        with self._lock:
+            if self.total == 0:
+                return None
+            rank = q * self.total
+            cumulative = 0
+            for i, count in enumerate(self.counts):
+                cumulative += count
+                if cumulative >= rank:
+                    return self._BUCKETS[min(i, len(self._BUCKETS) - 1)]
+        return self._BUCKETS[-1]
+
+
+class _LMWrapper(dspy.dsp.LM):
+    """Base of the wrappers that add behavior around the calls of another client, `lm`.
+
+    A wrapper shares the kwargs, history and token usage of the client it wraps, so it can replace the client in
+    `LMConfigs` (see `LMConfigs._wrap_lms()`). By default, calls are passed through to the client.
+    """
+
+    def __init__(self, lm: dspy.dsp.LM, model: Optional[str] = None):
+        model = model or getattr(lm, "model", None) or lm.kwargs.get("model") or str(lm)
+        super().__init__(model=model)
+        self.lm = lm
+        self.model = model
+        self.kwargs = lm.kwargs
+
+    @property
+    def history(self):
+        return self.lm.history if hasattr(self, "lm") else []
+
+    @history.setter
+    def history(self, value):
+        if hasattr(self, "lm"):
+            self.lm.history = value
+
+    def get_usage_and_reset(self):
+        return self.lm.get_usage_and_reset()
+
+    def basic_request(self, prompt: str, **kwargs):
+        return self.lm.basic_request(prompt, **kwargs)
+
+    def __call__(self, prompt: str, **kwargs):
+        return self.lm(prompt, **kwargs)
+
+    async def acall(self, prompt: str, **kwargs):
+        """Asyncio counterpart of `__call__()`. Requires the wrapped client to implement `acall()`."""
+        return await self.lm.acall(prompt, **kwargs)
+
+
+class HedgedLM(_LMWrapper):
+    """Opt-in wrapper that sends a duplicate ("hedged") request when a call takes unusually long.
+
+    If the request has not finished after the adaptive hedge delay (the `hedge_quantile` latency of the model,
+    learnt from a histogram shared by all wrappers of the model), the same request is sent again and the first
+    response wins. The hedge delay is not applied until `min_samples` latencies are observed. At most
+    `max_hedge_fraction` of the requests are hedged, which caps the extra cost.
+
+    The requests of synchronous calls run in a bounded thread pool shared by all the wrappers. The hedge delay and
+    the latencies are measured from when a request starts running, not from when it is queued. A synchronous call
+    cannot cancel a request that is already running: the losing request finishes in the background and its result
+    is discarded (its tokens are still spent and counted); it is only dropped if it is still queued. `acall()`
+    cancels the loser. Calls made while a token stream callback is set are never hedged.
+    """
+
+    _shared_executor = None
+    _shared_executor_lock = threading.Lock()
+    # Size of the pool shared by the wrappers that are not given an executor.
+    SHARED_EXECUTOR_MAX_WORKERS = 32
+
+    def __init__(
+        self,
+        lm: dspy.dsp.LM,
+        hedge_quantile: float = 0.9,
+        min_samples: int = 20,
+        min_hedge_delay: float = 0.5,
+        max_hedge_fraction: float = 0.1,
+        executor: Optional[concurrent.futures.ThreadPoolExecutor] = None,
+    ):
+        """
+        Args:
+            lm: The client to wrap.
+            hedge_quantile: Latency quantile after which a duplicate request is sent.
+            min_samples: Number of observed latencies needed before hedging starts.
+            min_hedge_delay: Lower bound of the hedge delay in seconds.
+            max_hedge_fraction: Maximum fraction of requests that may be hedged.
+            executor: Thread pool running the requests of synchronous calls. Defaults to a pool of
+                `SHARED_EXECUTOR_MAX_WORKERS` threads shared by all the wrappers.
+        """
+        super().__init__(lm)
+        self.executor = executor
+        self.latency = LatencyHistogram.for_model(self.model)
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_fraction = max_hedge_fraction
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.hedge_count = 0
+        self.hedge_win_count = 0
+
+    def get_hedge_stats(self):
+        """Return the number of requests, hedged requests and hedges that returned first."""
+        with self._lock:
+            return {
+                "requests": self.request_count,
+                "hedged": self.hedge_count,
+                "hedge_wins": self.hedge_win_count,
+                "hedge_delay": self._hedge_delay(),
+            }
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.latency.total < self.min_samples:
+            return None
+        return max(self.min_hedge_delay, self.latency.quantile(self.hedge_quantile))
+
+    def _take_hedge_budget(self) -> bool:
+        with self._lock:
+            if self.hedge_count + 1 > self.max_hedge_fraction * self.request_count:
+                return False
+            self.hedge_count += 1
+            return True
+
+    def _timed(self, fn, *args, **kwargs):
+        start = time.monotonic()
+        result = fn(*args, **kwargs)
+        return result, time.monotonic() - start
+
+    @classmethod
+    def _get_shared_executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with cls._shared_executor_lock:
+            if cls._shared_executor is None:
+                cls._shared_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=cls.SHARED_EXECUTOR_MAX_WORKERS,
+                    thread_name_prefix="hedged-lm-request",
+                )
+            return cls._shared_executor
+
+    def _send(
+        self, prompt: str, kwargs: dict
+    ) -> Tuple[concurrent.futures.Future, threading.Event]:
+        """Queue the request; the future resolves to (completions, latency) and the event is set when it starts."""
+        started = threading.Event()
+
+        def run():
+            started.set()
+            return self._timed(self.lm, prompt, **kwargs)
+
+        executor = self.executor or self._get_shared_executor()
+        return executor.submit(propagate_context(run)), started
+
+    def __call__(self, prompt: str, **kwargs):
+        with self._lock:
+            self.request_count += 1
+        delay = self._hedge_delay()
+        if delay is None or get_token_stream_callback() is not None:
+            result, latency = self._timed(self.lm, prompt, **kwargs)
+            self.latency.observe(latency)
+            return result
+
+        primary, started = self._send(prompt, kwargs)
+        # The hedge delay counts from when the request is sent, not from when it is queued.
+        started.wait()
+        try:
+            result, latency = primary.result(timeout=delay)
+            self.latency.observe(latency)
+            return result
+        except concurrent.futures.TimeoutError:
+            pass
+        if not self._take_hedge_budget():
+            result, latency = primary.result()
+            self.latency.observe(latency)
+            return result
+
+        hedge, _ = self._send(prompt, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    # Only drops a request that is still queued, a running one cannot be interrupted.
+                    loser.cancel()
+                result, latency = future.result()
+                self.latency.observe(latency)
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_win_count += 1
+                return result
+        raise error
+
+    async def acall(self, prompt: str, **kwargs):
+        """Asyncio counterpart of `__call__()`. Requires the wrapped client to implement `acall()`."""
+        with self._lock:
+            self.request_count += 1
+
+        async def timed():
+            start = time.monotonic()
+            result = await self.lm.acall(prompt, **kwargs)
+            return result, time.monotonic() - start
+
+        delay = self._hedge_delay()
+        primary = asyncio.ensure_future(timed())
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done and self._take_hedge_budget():
+                hedge = asyncio.ensure_future(timed())
+                pending, error = {primary, hedge}, None
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        if task.exception() is not None:
+                            error = task.exception()
+                            continue
+                        for loser in pending:
+                            loser.cancel()
+                        result, latency = task.result()
+                        self.latency.observe(latency)
+                        if task is hedge:
+                            with self._lock:
+                                self.hedge_win_count += 1
+                        return result
+                raise error
+        result, latency = await primary
+        self.latency.observe(latency)
+        return result
+
+
+class FairConcurrencyBudget:
+    """Global cap on concurrent calls shared fairly by several owners (e.g., the topics of a batch).
+
+    At most `capacity` calls are in flight at once. When calls are waiting, a freed slot goes to the waiting owner
+    with the fewest calls in flight (ties go to the owner waiting the longest), so a topic that issues many calls
+    cannot starve the others.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1.")
+        self.capacity = capacity
+        self._cond = threading.Condition()
+        self._in_flight: Dict[Any, int] = {}
+        self._waiting: Dict[Any, int] = {}
+        self._waiting_since: Dict[Any, int] = {}
+        self._ticket = 0
+        self._total = 0
+
+    def _next_owner(self):
+        return min(
+            self._waiting,
+            key=lambda o: (self._in_flight.get(o, 0), self._waiting_since[o]),
+        )
+
+    @contextmanager
+    def slot(self, owner):
+        """Context manager holding one of the slots for `owner` while the call runs."""
+        with span("budget.wait", "queue", owner=str(owner)):
+            self._acquire(owner)
+        try:
+            yield
+        finally:
+            self._release(owner)
+
+    @asynccontextmanager
+    async def aslot(self, owner):
+        """Asyncio counterpart of `slot()`; the event loop is not blocked while waiting for the slot."""
+        with span("budget.wait", "queue", owner=str(owner)):
+            acquire = asyncio.ensure_future(asyncio.to_thread(self._acquire, owner))
+            try:
+                await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                # The waiting thread cannot be interrupted; give the slot back once it gets it.
+                def release_when_acquired(future):
+                    if not future.cancelled() and future.exception() is None:
+                        self._release(owner)
+
+                acquire.add_done_callback(release_when_acquired)
+                raise
+        try:
+            yield
+        finally:
+            self._release(owner)
+
+    def _acquire(self, owner):
+        with self._cond:
+            if owner not in self._waiting:
+                self._waiting_since[owner] = self._ticket
+                self._ticket += 1
+            self._waiting[owner] = self._waiting.get(owner, 0) + 1
+            while self._total >= self.capacity or self._next_owner() != owner:
+                self._cond.wait()
+            self._waiting[owner] -= 1
+            if self._waiting[owner] == 0:
+                del self._waiting[owner]
+                del self._waiting_since[owner]
+            self._in_flight[owner] = self._in_flight.get(owner, 0) + 1
+            self._total += 1
+            # Another owner may be next in line if there are still free slots.
+            self._cond.notify_all()
+
+    def _release(self, owner):
+        with self._cond:
+            self._in_flight[owner] -= 1
+            if self._in_flight[owner] == 0:
+                del self._in_flight[owner]
+            self._total -= 1
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self._total,
+                "waiting": sum(self._waiting.values()),
+            }
+
+
+class BudgetedLM(_LMWrapper):
+    """Wrapper that runs each call of `lm` in a slot of a `FairConcurrencyBudget` on behalf of `owner`.
+
+    Several wrappers (one per owner) can share the same client, so they also share its connections, rate limiter,
+    cache, history and token usage.
+    """
+
+    def __init__(self, lm: dspy.dsp.LM, budget: FairConcurrencyBudget, owner):
+        super().__init__(lm)
+        self.budget = budget
+        self.owner = owner
+
+    def basic_request(self, prompt: str, **kwargs):
+        with self.budget.slot(self.owner):
+            return self.lm.basic_request(prompt, **kwargs)
+
+    def __call__(self, prompt: str, **kwargs):
+        with self.budget.slot(self.owner):
+            return self.lm(prompt, **kwargs)
+
+    async def acall(self, prompt: str, **kwargs):
+        """Asyncio counterpart of `__call__()`. Requires the wrapped client to implement `acall()`."""
+        async with self.budget.aslot(self.owner):
+            return await self.lm.acall(prompt, **kwargs)
+
+
+class TracedLM(_LMWrapper):
+    """Wrapper that traces each call of `lm` as an "lm" span (see `knowledge_storm.tracing`).
+
+    The span records the model, the prompt length, the number of completions and the tokens reported by the client;
+    it is a no-op when no tracer is active.
+    """
+
+    def basic_request(self, prompt: str, **kwargs):
+        with span("lm.request", "lm", model=self.model, prompt_chars=len(prompt)):
+            return self.lm.basic_request(prompt, **kwargs)
+
+    def __call__(self, prompt: str, **kwargs):
+        with span("lm", "lm", model=self.model, prompt_chars=len(prompt)) as s:
+            completions = self.lm(prompt, **kwargs)
+            s.set(num_completions=len(completions))
+            return completions
+
+    async def acall(self, prompt: str, **kwargs):
+        """Asyncio counterpart of `__call__()`. Requires the wrapped client to implement `acall()`."""
+        with span("lm", "lm", model=self.model, prompt_chars=len(prompt)) as s:
+            completions = await self.lm.acall(prompt, **kwargs)
+            s.set(num_completions=len(completions))
+            return completions
+
+
+class MeteredLM(_LMWrapper):
+    """Wrapper that counts the calls of `lm` and their latency and errors in `knowledge_storm.metrics`.
+
+    The metrics are labeled with the pipeline stage, the provider (the class of the wrapped client) and the model.
+    """
+
+    def __init__(self, lm: dspy.dsp.LM):
+        super().__init__(lm, model=_model_name(lm))
+        self.provider = _provider_name(lm)
+
+    def _track(self):
+        return track(
+            LM_REQUESTS,
+            LM_SECONDS,
+            LM_IN_FLIGHT,
+            provider=self.provider,
+            model=self.model,
+        )
+
+    def basic_request(self, prompt: str, **kwargs):
+        with self._track():
+            return self.lm.basic_request(prompt, **kwargs)
+
+    def __call__(self, prompt: str, **kwargs):
+        with self._track():
+            return self.lm(prompt, **kwargs)
+
+    async def acall(self, prompt: str, **kwargs):
+        """Asyncio counterpart of `__call__()`. Requires the wrapped client to implement `acall()`."""
+        with self._track():
+            return await self.lm.acall(prompt, **kwargs)
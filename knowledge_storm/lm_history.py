@@ -0,0 +1,158 @@
+import copy
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+
+class LMHistorySink:
+    """Stream LM calls to a rotating JSONL file as they happen.
+
+    Each line is one call of a language model: the history entry appended by the LM client plus the name of the
+    LM configuration it came from and a timestamp. When the file reaches `max_bytes`, it is renamed to
+    `<path>.1` (`<path>.1.gz` with `compress=True`), the older files are shifted and only `backup_count` of them
+    are kept.
+
+    Prompts and completions can be large; `max_text_chars` truncates every string longer than it, and
+    `redact_prompts` replaces the prompts and messages by their hash and length, e.g., when the prompts contain
+    private documents.
+    """
+
+    PROMPT_KEYS = ("prompt", "messages")
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        backup_count: int = 5,
+        compress: bool = False,
+        max_text_chars: Optional[int] = None,
+        redact_prompts: bool = False,
+        drop_kwargs: bool = True,
+    ):
+        """
+        Args:
+            path: Path of the JSONL file.
+            max_bytes: Size at which the file is rotated; 0 disables the rotation.
+            backup_count: Number of rotated files to keep.
+            compress: Whether to gzip the rotated files.
+            max_text_chars: Truncate the strings in the records to this many characters; None keeps them whole.
+            redact_prompts: Replace the prompts by their SHA-256 and length.
+            drop_kwargs: Drop the request kwargs of the calls, they are the same for all calls of an LM and are
+                dumped together by `LMConfigs.log()`.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.max_text_chars = max_text_chars
+        self.redact_prompts = redact_prompts
+        self.drop_kwargs = drop_kwargs
+        self.num_records = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _truncate(self, value):
+        if isinstance(value, str):
+            if self.max_text_chars is not None and len(value) > self.max_text_chars:
+                return (
+                    value[: self.max_text_chars]
+                    + f"...[truncated {len(value) - self.max_text_chars} chars]"
+                )
+            return value
+        if isinstance(value, dict):
+            return {k: self._truncate(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._truncate(v) for v in value]
+        return value
+
+    def _prepare(self, entry: dict, source: Optional[str]) -> dict:
+        record = {"time": time.time(), "lm": source}
+        for key, value in entry.items():
+            if key == "kwargs" and self.drop_kwargs:
+                continue
+            if key in self.PROMPT_KEYS and self.redact_prompts:
+                text = json.dumps(value, default=str)
+                value = {
+                    "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                    "chars": len(text),
+                }
+            record[key] = value
+        return self._truncate(record)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        suffix = ".gz" if self.compress else ""
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}{suffix}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}{suffix}")
+        if self.backup_count > 0:
+            if self.compress:
+                with open(self.path, "rb") as src, gzip.open(
+                    f"{self.path}.1.gz", "wb"
+                ) as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, entry: dict, source: Optional[str] = None):
+        line = json.dumps(self._prepare(entry, source), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self.num_records += 1
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class LMCallHistory(list):
+    """The `history` list of an LM client that streams the appended calls to a `LMHistorySink`.
+
+    Only the last `max_size` calls are kept in memory (for `inspect_history()` and the like), so the memory used by
+    the history no longer grows with the length of the run.
+    """
+
+    def __init__(
+        self, sink: LMHistorySink, source: Optional[str] = None, max_size: int = 100
+    ):
+        super().__init__()
+        self.sink = sink
+        self.source = source
+        self.max_size = max_size
+
+    def append(self, entry):
+        self.sink.write(entry, source=self.source)
+        super().append(entry)
+        if len(self) > self.max_size:
+            del self[: len(self) - self.max_size]
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def empty_like(self):
+        return LMCallHistory(self.sink, source=self.source, max_size=self.max_size)
+
+    def __deepcopy__(self, memo):
+        # The sink (open file and lock) is shared by the copies.
+        history = self.empty_like()
+        list.extend(history, copy.deepcopy(list(self), memo))
+        return history
@@ -1,8 +1,12 @@
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+import contextvars
+import threading
 import time
 import pytz
 from datetime import datetime
 
+from . import metrics
+
 # Define California timezone
 CALIFORNIA_TZ = pytz.timezone("America/Los_Angeles")
 
@@ -13,16 +17,26 @@ class EventLog:
         self.start_time = None
         self.end_time = None
         self.child_events = {}
+        # Durations of the individual calls, which can overlap when the event is logged from several threads.
+        self.call_count = 0
+        self.call_seconds_total = 0.0
+        self.call_seconds_max = 0.0
 
     def record_start_time(self):
-        self.start_time = datetime.now(
-            pytz.utc
-        )  # Store in UTC for consistent timezone conversion
+        now = datetime.now(pytz.utc)  # Store in UTC for consistent timezone conversion
+        # Keep the earliest start so that the event spans all its calls.
+        if self.start_time is None or now < self.start_time:
+            self.start_time = now
 
     def record_end_time(self):
-        self.end_time = datetime.now(
-            pytz.utc
-        )  # Store in UTC for consistent timezone conversion
+        now = datetime.now(pytz.utc)  # Store in UTC for consistent timezone conversion
+        if self.end_time is None or now > self.end_time:
+            self.end_time = now
+
+    def record_call(self, duration: float):
+        self.call_count += 1
+        self.call_seconds_total += duration
+        self.call_seconds_max = max(self.call_seconds_max, duration)
 
     def get_total_time(self):
         if self.start_time and self.end_time:
@@ -53,12 +67,32 @@ class EventLog:
 
 
 class LoggingWrapper:
+    """Record the time usage, LM usage and query count of the Co-STORM pipeline stages.
+
+    Events can be logged from several threads at once. Each thread (more precisely, each context) has its own stack
+    of open events, held in an immutable tuple, so concurrent events never end each other. An event started in a
+    worker thread is nested under the event that submitted the work if the submitted callable runs in the
+    submitter's context (see `knowledge_storm.tracing.propagate_context()`), and directly under the pipeline stage
+    otherwise.
+    """
+
     def __init__(self, lm_config):
         self.logging_dict = {}
         self.lm_config = lm_config
         self.current_pipeline_stage = None
-        self.event_stack = []
         self.pipeline_stage_active = False
+        self._stage_start_num_records = 0
+        self._lock = threading.RLock()
+        self._event_stack = contextvars.ContextVar(
+            f"logging_wrapper_event_stack_{id(self)}", default=()
+        )
+        # A `StageProfiler` profiling each pipeline stage, set by `CoStormRunner` when profiling is enabled.
+        self.stage_profiler = None
+
+    @property
+    def event_stack(self):
+        """The open events of the current thread, innermost last."""
+        return list(self._event_stack.get())
 
     def _pipeline_stage_start(self, pipeline_stage: str):
         if self.pipeline_stage_active:
@@ -73,72 +107,38 @@ class LoggingWrapper:
             "lm_history": [],
             "query_count": 0,
         }
+        history_sink = getattr(self.lm_config, "history_sink", None)
+        self._stage_start_num_records = (
+            history_sink.num_records if history_sink is not None else 0
+        )
         self.pipeline_stage_active = True
 
-    def _event_start(self, event_name: str):
+    def _event_start(self, event_name: str) -> EventLog:
         if not self.pipeline_stage_active:
             raise RuntimeError("No pipeline stage is currently active.")
 
-        if not self.event_stack and self.current_pipeline_stage:
-            # Top-level event (directly under the pipeline stage)
-            if (
-                event_name
-                not in self.logging_dict[self.current_pipeline_stage]["time_usage"]
-            ):
-                event = EventLog(event_name=event_name)
-                event.record_start_time()
-                self.logging_dict[self.current_pipeline_stage]["time_usage"][
-                    event_name
-                ] = event
-                self.event_stack.append(event)
+        event_stack = self._event_stack.get()
+        with self._lock:
+            time_usage = self.logging_dict[self.current_pipeline_stage]["time_usage"]
+            if not event_stack:
+                # Top-level event (directly under the pipeline stage)
+                siblings = time_usage
             else:
-                self.logging_dict[self.current_pipeline_stage]["time_usage"][
-                    event_name
-                ].record_start_time()
-        elif self.event_stack:
-            # Nested event (under another event)
-            parent_event = self.event_stack[-1]
-            if event_name not in parent_event.get_child_events():
+                # Nested event (under another event)
+                siblings = event_stack[-1].get_child_events()
+            if event_name not in siblings:
                 event = EventLog(event_name=event_name)
-                event.record_start_time()
-                parent_event.add_child_event(event)
-                self.logging_dict[self.current_pipeline_stage]["time_usage"][
-                    event_name
-                ] = event
-                self.event_stack.append(event)
-            else:
-                parent_event.get_child_events()[event_name].record_start_time()
-        else:
-            raise RuntimeError(
-                "Cannot start an event without an active pipeline stage or parent event."
-            )
-
-    def _event_end(self, event_name: str):
-        if not self.pipeline_stage_active:
-            raise RuntimeError("No pipeline stage is currently active.")
-
-        if not self.event_stack:
-            raise RuntimeError("No parent event is currently active.")
-
-        if self.event_stack:
-            current_event_log = self.event_stack[-1]
-            if event_name in current_event_log.get_child_events():
-                current_event_log.get_child_events()[event_name].record_end_time()
-            elif (
-                event_name
-                in self.logging_dict[self.current_pipeline_stage]["time_usage"]
-            ):
-                self.logging_dict[self.current_pipeline_stage]["time_usage"][
-                    event_name
-                ].record_end_time()
-            else:
-                raise AssertionError(
-                    f"Failure to record end time for event {event_name}. Start time is not recorded."
-                )
-            if current_event_log.event_name == event_name:
-                self.event_stack.pop()
-        else:
-            raise RuntimeError("Cannot end an event without an active parent event.")
+                if event_stack:
+                    event_stack[-1].add_child_event(event)
+                time_usage[event_name] = event
+            event = siblings[event_name]
+            event.record_start_time()
+        return event
+
+    def _event_end(self, event: EventLog, duration: float):
+        with self._lock:
+            event.record_end_time()
+            event.record_call(duration)
 
     def _pipeline_stage_end(self):
         if not self.pipeline_stage_active:
@@ -147,9 +147,15 @@ class LoggingWrapper:
         self.logging_dict[self.current_pipeline_stage][
             "lm_usage"
         ] = self.lm_config.collect_and_reset_lm_usage()
-        self.logging_dict[self.current_pipeline_stage][
-            "lm_history"
-        ] = self.lm_config.collect_and_reset_lm_history()
+        lm_history = self.lm_config.collect_and_reset_lm_history()
+        history_sink = getattr(self.lm_config, "history_sink", None)
+        if history_sink is not None:
+            # The calls were streamed to the sink, keeping them here would grow without bound in long sessions.
+            lm_history = {
+                "path": history_sink.path,
+                "num_calls": history_sink.num_records - self._stage_start_num_records,
+            }
+        self.logging_dict[self.current_pipeline_stage]["lm_history"] = lm_history
         self.pipeline_stage_active = False
 
     def add_query_count(self, count):
@@ -158,16 +164,22 @@ class LoggingWrapper:
                 "No pipeline stage is currently active to add query count."
             )
 
-        self.logging_dict[self.current_pipeline_stage]["query_count"] += count
+        with self._lock:
+            self.logging_dict[self.current_pipeline_stage]["query_count"] += count
 
     @contextmanager
     def log_event(self, event_name):
         if not self.pipeline_stage_active:
             raise RuntimeError("No pipeline stage is currently active.")
 
-        self._event_start(event_name)
-        yield
-        self._event_end(event_name)
+        event = self._event_start(event_name)
+        token = self._event_stack.set(self._event_stack.get() + (event,))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._event_stack.reset(token)
+            self._event_end(event, time.perf_counter() - start)
 
     @contextmanager
     def log_pipeline_stage(self, pipeline_stage):
@@ -180,7 +192,14 @@ class LoggingWrapper:
         start_time = time.time()
         try:
             self._pipeline_stage_start(pipeline_stage)
-            yield
+            # The Co-STORM pipeline stages label the metrics recorded in them, as the run_* methods of the runners do.
+            profile = (
+                self.stage_profiler.profile(pipeline_stage)
+                if self.stage_profiler is not None
+                else nullcontext()
+            )
+            with metrics.stage("CoStormRunner", pipeline_stage), profile:
+                yield
         except Exception as e:
             print(f"Error occurred during pipeline stage '{pipeline_stage}': {e}")
         finally:
@@ -190,23 +209,27 @@ class LoggingWrapper:
             self._pipeline_stage_end()
 
     def dump_logging_and_reset(self, reset_logging=True):
-        log_dump = {}
-        for pipeline_stage, pipeline_log in self.logging_dict.items():
-            time_stamp_log = {
-                event_name: {
-                    "total_time_seconds": event.get_total_time(),
-                    "start_time": event.get_start_time(),
-                    "end_time": event.get_end_time(),
+        with self._lock:
+            log_dump = {}
+            for pipeline_stage, pipeline_log in self.logging_dict.items():
+                time_stamp_log = {
+                    event_name: {
+                        "total_time_seconds": event.get_total_time(),
+                        "start_time": event.get_start_time(),
+                        "end_time": event.get_end_time(),
+                        "call_count": event.call_count,
+                        "call_seconds_total": event.call_seconds_total,
+                        "call_seconds_max": event.call_seconds_max,
+                    }
+                    for event_name, event in pipeline_log["time_usage"].items()
                 }
-                for event_name, event in pipeline_log["time_usage"].items()
-            }
-            log_dump[pipeline_stage] = {
-                "time_usage": time_stamp_log,
-                "lm_usage": pipeline_log["lm_usage"],
-                "lm_history": pipeline_log["lm_history"],
-                "query_count": pipeline_log["query_count"],
-                "total_wall_time": pipeline_log["total_wall_time"],
-            }
-        if reset_logging:
-            self.logging_dict.clear()
+                log_dump[pipeline_stage] = {
+                    "time_usage": time_stamp_log,
+                    "lm_usage": pipeline_log["lm_usage"],
+                    "lm_history": pipeline_log["lm_history"],
+                    "query_count": pipeline_log["query_count"],
+                    "total_wall_time": pipeline_log["total_wall_time"],
+                }
+            if reset_logging:
+                self.logging_dict.clear()
         return log_dump
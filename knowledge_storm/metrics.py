@@ -0,0 +1,400 @@
+"""In-process metrics of the pipelines, e.g., for a long-running service.
+
+The LM clients, the retriever, the webpage downloads and the embedding calls update the counters, gauges and latency
+histograms below in `REGISTRY`. The metrics carry the pipeline stage they were recorded in (the `run_*` method of the
+runner, or the Co-STORM pipeline stage), so that throughput and latency can be broken down per stage, model and
+provider. `REGISTRY.render()` formats them in the Prometheus text format, and `start_metrics_server()` serves them
+over HTTP for Prometheus to scrape.
+
+Usage:
+    lm_configs.enable_metrics()  # Latency and in-flight requests of the LMs; before the runner is created.
+    start_metrics_server(port=9464)
+    runner.run(...)
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "knowledge_storm_stage", default=""
+)
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+
+def current_stage() -> str:
+    """The pipeline stage recorded in the metrics of the current context, "" outside of a stage."""
+    return _current_stage.get()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    TYPE = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if "stage" in self.labelnames and "stage" not in labels:
+            labels = {**labels, "stage": current_stage()}
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects the labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Tuple = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g., the number of requests."""
+
+    TYPE = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [("", self._format_labels(key), value) for key, value in values]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g., the number of requests in flight."""
+
+    TYPE = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [("", self._format_labels(key), value) for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g., request latencies, in cumulative buckets."""
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            state = self._values[key]
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(
+                (key, {**state, "counts": list(state["counts"])})
+                for key, state in self._values.items()
+            )
+        samples = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                cumulative += count
+                samples.append(
+                    (
+                        "_bucket",
+                        self._format_labels(key, (("le", _format_value(bound)),)),
+                        cumulative,
+                    )
+                )
+            samples.append(("_sum", self._format_labels(key), state["sum"]))
+            samples.append(("_count", self._format_labels(key), state["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            metric = self._metrics[name]
+        if not isinstance(metric, cls):
+            raise ValueError(f"{name} is already registered as a {metric.TYPE}")
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        return "".join(metric.render() for _, metric in metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_RUNS = REGISTRY.counter(
+    "storm_stage_runs_total", "Pipeline stage runs.", ["engine", "stage", "status"]
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "storm_stage_duration_seconds",
+    "Duration of the pipeline stages.",
+    ["engine", "stage"],
+)
+LM_REQUESTS = REGISTRY.counter(
+    "storm_lm_requests_total", "LM calls.", ["stage", "provider", "model", "status"]
+)
+LM_SECONDS = REGISTRY.histogram(
+    "storm_lm_request_duration_seconds",
+    "Latency of the LM calls.",
+    ["stage", "provider", "model"],
+)
+LM_IN_FLIGHT = REGISTRY.gauge(
+    "storm_lm_requests_in_flight",
+    "LM calls in progress.",
+    ["stage", "provider", "model"],
+)
+LM_TOKENS = REGISTRY.counter(
+    "storm_lm_tokens_total",
+    "Tokens reported by the LM providers.",
+    ["stage", "provider", "model", "kind"],
+)
+RM_QUERIES = REGISTRY.counter(
+    "storm_rm_queries_total", "Search queries.", ["stage", "rm", "status"]
+)
+RM_SECONDS = REGISTRY.histogram(
+    "storm_rm_query_duration_seconds", "Latency of the search queries.", ["stage", "rm"]
+)
+RM_IN_FLIGHT = REGISTRY.gauge(
+    "storm_rm_queries_in_flight", "Search queries in progress.", ["stage", "rm"]
+)
+DOWNLOADS = REGISTRY.counter(
+    "storm_webpage_downloads_total", "Webpage downloads.", ["stage", "status"]
+)
+DOWNLOAD_SECONDS = REGISTRY.histogram(
+    "storm_webpage_download_duration_seconds",
+    "Latency of the webpage downloads.",
+    ["stage"],
+)
+DOWNLOADS_IN_FLIGHT = REGISTRY.gauge(
+    "storm_webpage_downloads_in_flight", "Webpage downloads in progress.", ["stage"]
+)
+DOWNLOAD_BYTES = REGISTRY.counter(
+    "storm_webpage_download_bytes_total", "Bytes of the downloaded webpages.", ["stage"]
+)
+EMBEDDING_REQUESTS = REGISTRY.counter(
+    "storm_embedding_requests_total",
+    "Text embedding API calls.",
+    ["stage", "provider", "status"],
+)
+EMBEDDING_SECONDS = REGISTRY.histogram(
+    "storm_embedding_request_duration_seconds",
+    "Latency of the text embedding API calls.",
+    ["stage", "provider"],
+)
+EMBEDDING_IN_FLIGHT = REGISTRY.gauge(
+    "storm_embedding_requests_in_flight",
+    "Text embedding API calls in progress.",
+    ["stage", "provider"],
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "storm_cache_lookups_total",
+    "Cache lookups by result (hit or miss); the hit rate is hits / (hits + misses).",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def track(requests: Counter, seconds: Histogram, in_flight: Gauge, **labels):
+    """Count the enclosed call in `requests` by status ("ok" or "error"), time it and count it as in flight."""
+    labels.setdefault("stage", current_stage())
+    in_flight.inc(**labels)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        in_flight.dec(**labels)
+        seconds.observe(time.perf_counter() - start, **labels)
+        requests.inc(status=status, **labels)
+
+
+@contextmanager
+def stage(engine: str, name: str):
+    """Record the enclosed block as the stage `name` and label the metrics recorded in it with the stage."""
+    token = _current_stage.set(name)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_stage.reset(token)
+        STAGE_SECONDS.observe(time.perf_counter() - start, engine=engine, stage=name)
+        STAGE_RUNS.inc(engine=engine, stage=name, status=status)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve `registry.render()` on GET /metrics."""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent, do not log them to stderr.
+        pass
+
+
+def start_metrics_server(
+    port: int = 9464,
+    host: str = "127.0.0.1",
+    registry: Optional[MetricsRegistry] = None,
+) -> ThreadingHTTPServer:
+    """Serve the metrics at http://<host>:<port>/metrics from a daemon thread; call `shutdown()` on the result to stop."""
+    handler = type(
+        "MetricsHandler", (MetricsHandler,), {"registry": registry or REGISTRY}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(
+        target=server.serve_forever, name="storm-metrics-server", daemon=True
+    ).start()
+    return server
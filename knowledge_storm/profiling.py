@@ -0,0 +1,252 @@
+"""Per-stage CPU and memory profiles of the pipelines.
+
+`StageProfiler.profile(stage)` profiles the enclosed stage with a sampling profiler: a background thread records the
+stacks of all threads every `interval` seconds, so the work done in the thread pools of the stage is included. The
+samples are written as collapsed stacks (`<stage>.folded`, readable by speedscope, flamegraph.pl or
+`py-spy`-compatible viewers) together with a summary (`<stage>.json`) of the hottest functions and of the peak memory
+traced by `tracemalloc` during the stage. On interpreters without `sys._current_frames()` the stage is profiled with
+cProfile instead (`<stage>.pstats`, calling thread only).
+
+The sampler records wall-clock samples; samples of threads idling in the thread pools (waiting for work or on a
+lock) are counted as idle and left out of the profile.
+
+`tracemalloc` is process-wide: profilers running at the same time share one tracing session, which is started by
+the first of them (unless it is already running) and stopped by the last. The peak is only attributed to a stage if
+no other stage was traced at the same time and the tracing was started for it; otherwise `peak_exclusive` is false
+in its summary and `peak_bytes` also covers the memory allocated outside the stage.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Leaf frames in these files are threads waiting for work or on a lock.
+_IDLE_FILES = (
+    os.path.join("concurrent", "futures", "thread.py"),
+    "threading.py",
+    "queue.py",
+    "selectors.py",
+)
+
+
+# Shared tracemalloc session of the profilers, see the module docstring.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+# Number of stages that joined the tracing session, used to detect overlapping stages.
+_tracemalloc_joins = 0
+
+
+def _start_tracing():
+    """Join the shared tracing session and return (joins so far, whether tracing was started for this stage)."""
+    global _tracemalloc_users, _tracemalloc_started, _tracemalloc_joins
+    with _tracemalloc_lock:
+        started = False
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = started = True
+        _tracemalloc_users += 1
+        _tracemalloc_joins += 1
+        return _tracemalloc_joins, started
+
+
+def _stop_tracing():
+    """Leave the shared tracing session, stopping it if it was started by the profilers and this was the last stage."""
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+def _frame_label(code) -> str:
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="storm-stage-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.num_samples = 0
+        self.idle_samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.num_samples += 1
+                if frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                # Threads of a pool are merged, e.g., "ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor-0".
+                thread_name = re.sub(
+                    r"_\d+$", "", thread_names.get(thread_id, str(thread_id))
+                )
+                self.stacks[(thread_name,) + tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class StageProfiler:
+    """Profile the CPU time and the peak memory of pipeline stages and write the profiles to `output_dir`."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        interval: float = 0.005,
+        trace_memory: bool = True,
+        top_n: int = 30,
+    ):
+        """
+        Args:
+            output_dir: Directory of the profiles.
+            interval: Seconds between two samples.
+            trace_memory: Whether to record the peak memory and the top allocation sites with `tracemalloc`. Tracing
+                the allocations slows the stage down.
+            top_n: Number of functions and allocation sites in the summaries.
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.top_n = top_n
+        self.summaries: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _file_stem(stage: str) -> str:
+        return re.sub(r"[^\w.-]+", "_", stage).strip("_") or "stage"
+
+    def _top_functions(self, stacks: Counter) -> List[Dict]:
+        self_samples, total_samples = Counter(), Counter()
+        for stack, count in stacks.items():
+            codes = stack[1:]
+            self_samples[codes[-1]] += count
+            for code in set(codes):
+                total_samples[code] += count
+        return [
+            {
+                "function": code.co_name,
+                "file": code.co_filename,
+                "line": code.co_firstlineno,
+                "self_samples": self_samples[code],
+                "total_samples": total_samples[code],
+            }
+            for code, _ in self_samples.most_common(self.top_n)
+        ]
+
+    def _write_folded(self, path: str, stacks: Counter):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                labels = [stack[0]] + [_frame_label(code) for code in stack[1:]]
+                f.write(
+                    f"{';'.join(label.replace(';', ',') for label in labels)} {count}\n"
+                )
+
+    @contextmanager
+    def _trace_memory(self, summary: Dict):
+        if not self.trace_memory:
+            yield
+            return
+        # The peak is never reset here, resetting it would corrupt the peaks of the other stages being traced.
+        joins, started = _start_tracing()
+        start_size, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            try:
+                end_size, peak_size = tracemalloc.get_traced_memory()
+                summary["memory"] = {
+                    "start_bytes": start_size,
+                    "end_bytes": end_size,
+                    "peak_bytes": peak_size,
+                    "peak_exclusive": started and _tracemalloc_joins == joins,
+                    # Allocation sites of the memory still in use at the end of the stage.
+                    "top_allocations": [
+                        {
+                            "location": str(stat.traceback),
+                            "size_bytes": stat.size,
+                            "count": stat.count,
+                        }
+                        for stat in tracemalloc.take_snapshot()
+                        .filter_traces(
+                            [tracemalloc.Filter(False, tracemalloc.__file__)]
+                        )
+                        .statistics("lineno")[: self.top_n]
+                    ],
+                }
+            except Exception as e:
+                # E.g., the tracing was stopped by other code. The memory profile must not fail the stage.
+                logging.warning(
+                    f"Failed to record the memory profile of {summary['stage']}: {e}"
+                )
+            finally:
+                _stop_tracing()
+
+    @contextmanager
+    def profile(self, stage: str):
+        """Profile the enclosed block as `stage`."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(self.output_dir, self._file_stem(stage))
+        summary = {"stage": stage}
+        sampler, profiler = None, None
+        if hasattr(sys, "_current_frames"):
+            sampler = _Sampler(self.interval)
+        else:
+            profiler = cProfile.Profile()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            with self._trace_memory(summary):
+                if sampler is not None:
+                    sampler.start()
+                else:
+                    profiler.enable()
+                try:
+                    yield
+                finally:
+                    if sampler is not None:
+                        sampler.stop()
+                    else:
+                        profiler.disable()
+                    summary["wall_seconds"] = time.perf_counter() - start_wall
+                    summary["process_cpu_seconds"] = time.process_time() - start_cpu
+        finally:
+            self._write(stem, summary, sampler, profiler)
+
+    def _write(self, stem, summary, sampler, profiler):
+        if sampler is not None:
+            self._write_folded(f"{stem}.folded", sampler.stacks)
+            summary.update(
+                profiler="sampling",
+                interval_seconds=self.interval,
+                samples=sampler.num_samples,
+                idle_samples=sampler.idle_samples,
+                top_functions=self._top_functions(sampler.stacks),
+            )
+        else:
+            profiler.dump_stats(f"{stem}.pstats")
+            summary["profiler"] = "cProfile"
+        with open(f"{stem}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        self.summaries[summary["stage"]] = summary
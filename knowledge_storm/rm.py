@@ -1,16 +1,14 @@
+import asyncio
 import logging
 import os
 from typing import Callable, Union, List
 
 import backoff
 import dspy
+import httpx
 import requests
 from dsp import backoff_hdlr, giveup_hdlr
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import Qdrant
-from qdrant_client import QdrantClient
-
 from .utils import WebPageHelper
 
 
@@ -77,6 +75,39 @@ class YouRM(dspy.Retrieve):
 
         return collected_results
 
+    async def aforward(
+        self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []
+    ):
+        """Asyncio counterpart of `forward()`. Queries are sent concurrently."""
+        queries = (
+            [query_or_queries]
+            if isinstance(query_or_queries, str)
+            else query_or_queries
+        )
+        self.usage += len(queries)
+        headers = {"X-API-Key": self.ydc_api_key}
+
+        async def search(client, query):
+            try:
+                response = await client.get(
+                    "https://api.ydc-index.io/search",
+                    headers=headers,
+                    params={"query": query},
+                )
+                results = response.json()
+                authoritative_results = []
+                for r in results["hits"]:
+                    if self.is_valid_source(r["url"]) and r["url"] not in exclude_urls:
+                        authoritative_results.append(r)
+                return authoritative_results[: self.k]
+            except Exception as e:
+                logging.error(f"Error occurs when searching query {query}: {e}")
+                return []
+
+        async with httpx.AsyncClient() as client:
+            results = await asyncio.gather(*[search(client, q) for q in queries])
+        return [r for query_results in results for r in query_results]
+
 
 class BingSearch(dspy.Retrieve):
     def __init__(
@@ -180,6 +211,52 @@ class BingSearch(dspy.Retrieve):
 
         return collected_results
 
+    async def aforward(
+        self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []
+    ):
+        """Asyncio counterpart of `forward()`. Queries and page downloads are sent concurrently."""
+        queries = (
+            [query_or_queries]
+            if isinstance(query_or_queries, str)
+            else query_or_queries
+        )
+        self.usage += len(queries)
+        headers = {"Ocp-Apim-Subscription-Key": self.bing_api_key}
+
+        async def search(client, query):
+            try:
+                response = await client.get(
+                    self.endpoint, headers=headers, params={**self.params, "q": query}
+                )
+                return response.json()["webPages"]["value"]
+            except Exception as e:
+                logging.error(f"Error occurs when searching query {query}: {e}")
+                return []
+
+        async with httpx.AsyncClient() as client:
+            results = await asyncio.gather(*[search(client, q) for q in queries])
+
+        url_to_results = {}
+        for query_results in results:
+            for d in query_results:
+                if self.is_valid_source(d["url"]) and d["url"] not in exclude_urls:
+                    url_to_results[d["url"]] = {
+                        "url": d["url"],
+                        "title": d["name"],
+                        "description": d["snippet"],
+                    }
+
+        valid_url_to_snippets = await self.webpage_helper.aurls_to_snippets(
+            list(url_to_results.keys())
+        )
+        collected_results = []
+        for url in valid_url_to_snippets:
+            r = url_to_results[url]
+            r["snippets"] = valid_url_to_snippets[url]["snippets"]
+            collected_results.append(r)
+
+        return collected_results
+
 
 class VectorRM(dspy.Retrieve):
     """Retrieve information from custom documents using Qdrant.
@@ -216,6 +293,8 @@ class VectorRM(dspy.Retrieve):
         if not embedding_model:
             raise ValueError("Please provide an embedding model.")
 
+        from langchain_huggingface import HuggingFaceEmbeddings
+
         model_kwargs = {"device": device}
         encode_kwargs = {"normalize_embeddings": True}
         self.model = HuggingFaceEmbeddings(
@@ -232,6 +311,8 @@ class VectorRM(dspy.Retrieve):
         """
         Check if the Qdrant collection exists and create it if it does not.
         """
+        from langchain_qdrant import Qdrant
+
         if self.client is None:
             raise ValueError("Qdrant client is not initialized.")
         if self.client.collection_exists(collection_name=f"{self.collection_name}"):
@@ -263,6 +344,8 @@ class VectorRM(dspy.Retrieve):
         if url is None:
             raise ValueError("Please provide a url for the Qdrant server.")
 
+        from qdrant_client import QdrantClient
+
         try:
             self.client = QdrantClient(url=url, api_key=api_key)
             self._check_collection()
@@ -279,6 +362,8 @@ class VectorRM(dspy.Retrieve):
         if vector_store_path is None:
             raise ValueError("Please provide a folder path.")
 
+        from qdrant_client import QdrantClient
+
         try:
             self.client = QdrantClient(path=vector_store_path)
             self._check_collection()
@@ -1229,3 +1314,27 @@ class AzureAISearch(dspy.Retrieve):
                 logging.error(f"Error occurs when searching query {query}: {e}")
 
         return collected_results
+
+
+class BudgetedRM(dspy.Retrieve):
+    """Wrapper that runs each search of `rm` in a slot of a `FairConcurrencyBudget` on behalf of `owner`.
+
+    Several wrappers (one per owner) can share the same retrieval model and its usage counter.
+    """
+
+    def __init__(self, rm: dspy.Retrieve, budget, owner):
+        super().__init__(k=getattr(rm, "k", 3))
+        self.rm = rm
+        self.budget = budget
+        self.owner = owner
+
+    def get_usage_and_reset(self):
+        if hasattr(self.rm, "get_usage_and_reset"):
+            return self.rm.get_usage_and_reset()
+        return {}
+
+    def forward(
+        self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []
+    ):
+        with self.budget.slot(self.owner):
+            return self.rm(query_or_queries=query_or_queries, exclude_urls=exclude_urls)
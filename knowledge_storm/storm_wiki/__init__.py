@@ -1,2 +1,59 @@
-from .engine import *
-from .modules import *
+from ..lazy_loader import attach
+
+# Submodules are imported on first access to one of their attributes, see `lazy_loader.attach`.
+_import_structure = {
+    "engine": [
+        "StormArticleGenerationModule",
+        "StormArticlePolishingModule",
+        "StormOutlineGenerationModule",
+        "Engine",
+        "LMConfigs",
+        "pipeline_event_loop",
+        "OpenAIModel",
+        "AzureOpenAIModel",
+        "TogetherClient",
+        "makeStringRed",
+        "truncate_filename",
+        "STORMWikiLMConfigs",
+        "STORMWikiRunnerArguments",
+        "STORMWikiRunner",
+    ],
+    "batch_runner": ["STORMWikiBatchRunner"],
+    "stage_cache": ["StageCache"],
+    "artifact_store": ["ArtifactStore"],
+    "modules": [
+        "BaseCallbackHandler",
+        "KnowledgeCurationModule",
+        "MindmapGraph",
+        "script_dir",
+        "ConvSimulator",
+        "WikiWriter",
+        "AskQuestion",
+        "AskQuestionWithPersona",
+        "QuestionToQuery",
+        "AnswerQuestion",
+        "TopicExpert",
+        "StormKnowledgeCurationModule",
+        "get_wiki_page_title_and_toc",
+        "FindRelatedTopic",
+        "GenPersona",
+        "CreateWriterWithPersona",
+        "StormPersonaGenerator",
+        "Retriever",
+        "GENERALLY_UNRELIABLE",
+        "DEPRECATED",
+        "BLACKLISTED",
+        "is_valid_wikipedia_source",
+        "Information",
+        "InformationTable",
+        "Article",
+        "ArticleSectionNode",
+        "ArticleTextProcessing",
+        "FileIOHelper",
+        "DialogueTurn",
+        "StormInformationTable",
+        "StormArticle",
+    ],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _import_structure)
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from argparse import ArgumentParser
+from typing import Dict, List, Optional
+
+
+class ArtifactStore:
+    """Deduplicated, compressed storage of the JSON artifacts of an article output directory.
+
+    In the JSON artifacts the same search results are repeated many times: `conversation_log.json` repeats them for
+    every dialogue turn that found them, and `raw_search_results.json` and `url_to_info.json` store them again. The
+    store keeps each snippet and each information record (an `Information.to_dict()` whose snippets are replaced by
+    snippet ids) once in a content-addressed table, and the artifacts only refer to them by id.
+
+    Everything lives in one zip file with a compressed member per table and per artifact, so reading an artifact only
+    decompresses that artifact and the tables, and the members are loaded on first use.
+
+    Artifacts are read and written in the same format as the JSON files, `import_json_dir()` and `export_json_dir()`
+    convert an output directory between the two layouts.
+    """
+
+    FILE_NAME = "storm_artifacts.zip"
+    SNIPPETS_MEMBER = "snippets.json"
+    INFORMATION_MEMBER = "information.json"
+    # Where the information records are in each artifact, see `_encode()`.
+    ARTIFACTS = ("conversation_log.json", "raw_search_results.json", "url_to_info.json")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._members: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_article_dir(cls, article_dir: str):
+        return cls(os.path.join(article_dir, cls.FILE_NAME))
+
+    @staticmethod
+    def _content_id(obj) -> str:
+        payload = json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:20]
+
+    def _member_names(self) -> List[str]:
+        names = set(self._members)
+        if os.path.exists(self.path):
+            with zipfile.ZipFile(self.path) as zf:
+                names.update(zf.namelist())
+        return sorted(names)
+
+    def _read_member(self, name: str, default=None):
+        if name not in self._members:
+            if not os.path.exists(self.path):
+                return default
+            with zipfile.ZipFile(self.path) as zf:
+                if name not in zf.namelist():
+                    return default
+                self._members[name] = json.loads(zf.read(name).decode("utf-8"))
+        return self._members[name]
+
+    def __contains__(self, name: str) -> bool:
+        return (
+            name
+            not in (
+                self.SNIPPETS_MEMBER,
+                self.INFORMATION_MEMBER,
+            )
+            and name in self._member_names()
+        )
+
+    def names(self) -> List[str]:
+        """Names of the stored artifacts."""
+        return [name for name in self._member_names() if name in self]
+
+    def _encode_information(self, info: Dict, snippets: Dict, information: Dict) -> str:
+        record = dict(info)
+        snippet_ids = []
+        for snippet in info.get("snippets", []):
+            snippet_id = self._content_id(snippet)
+            snippets[snippet_id] = snippet
+            snippet_ids.append(snippet_id)
+        record["snippets"] = snippet_ids
+        info_id = self._content_id(record)
+        information[info_id] = record
+        return info_id
+
+    def _decode_information(self, info_id: str) -> Dict:
+        snippets = self._read_member(self.SNIPPETS_MEMBER, {})
+        record = dict(self._read_member(self.INFORMATION_MEMBER, {})[info_id])
+        record["snippets"] = [snippets[snippet_id] for snippet_id in record["snippets"]]
+        return record
+
+    def _encode(self, name: str, data, snippets: Dict, information: Dict):
+        encode = lambda info: self._encode_information(info, snippets, information)
+        if name == "conversation_log.json":
+            return [
+                {
+                    **conversation,
+                    "dlg_turns": [
+                        {
+                            **turn,
+                            "search_results": [
+                                encode(info) for info in turn["search_results"]
+                            ],
+                        }
+                        for turn in conversation["dlg_turns"]
+                    ],
+                }
+                for conversation in data
+            ]
+        if name == "raw_search_results.json":
+            return {url: encode(info) for url, info in data.items()}
+        if name == "url_to_info.json":
+            return {
+                **data,
+                "url_to_info": {
+                    url: encode(info) for url, info in data["url_to_info"].items()
+                },
+            }
+        return data
+
+    def _decode(self, name: str, data):
+        decode = self._decode_information
+        if name == "conversation_log.json":
+            return [
+                {
+                    **conversation,
+                    "dlg_turns": [
+                        {
+                            **turn,
+                            "search_results": [
+                                decode(info_id) for info_id in turn["search_results"]
+                            ],
+                        }
+                        for turn in conversation["dlg_turns"]
+                    ],
+                }
+                for conversation in data
+            ]
+        if name == "raw_search_results.json":
+            return {url: decode(info_id) for url, info_id in data.items()}
+        if name == "url_to_info.json":
+            return {
+                **data,
+                "url_to_info": {
+                    url: decode(info_id) for url, info_id in data["url_to_info"].items()
+                },
+            }
+        return data
+
+    def load(self, name: str):
+        """Load an artifact in the format of its JSON file."""
+        with self._lock:
+            data = self._read_member(name)
+            if data is None:
+                raise KeyError(f"{name} is not in {self.path}")
+            return self._decode(name, data)
+
+    def member_hash(self, name: str) -> Optional[str]:
+        """Hash of a stored artifact; it only changes if the content of the artifact changes."""
+        with self._lock:
+            data = self._read_member(name)
+            return None if data is None else self._content_id(data)
+
+    def save(self, name: str, data):
+        """Store an artifact given in the format of its JSON file, replacing the previous version if any."""
+        self.save_many({name: data})
+
+    def save_many(self, artifacts: Dict[str, object]):
+        with self._lock:
+            for name in self._member_names():
+                self._read_member(name)
+            snippets, information = {}, {}
+            for name, data in artifacts.items():
+                self._members[name] = self._encode(name, data, snippets, information)
+            # Rebuild the tables from the artifacts so that the records only used by replaced artifacts are dropped.
+            old_snippets = self._members.get(self.SNIPPETS_MEMBER, {})
+            old_information = self._members.get(self.INFORMATION_MEMBER, {})
+            for name, data in self._members.items():
+                if name in artifacts or name not in self.ARTIFACTS:
+                    continue
+                for info_id in self._iter_information_ids(name, data):
+                    record = old_information[info_id]
+                    information[info_id] = record
+                    for snippet_id in record["snippets"]:
+                        snippets[snippet_id] = old_snippets[snippet_id]
+            self._members[self.SNIPPETS_MEMBER] = snippets
+            self._members[self.INFORMATION_MEMBER] = information
+            self._write()
+
+    @staticmethod
+    def _iter_information_ids(name: str, data):
+        if name == "conversation_log.json":
+            for conversation in data:
+                for turn in conversation["dlg_turns"]:
+                    yield from turn["search_results"]
+        elif name == "raw_search_results.json":
+            yield from data.values()
+        elif name == "url_to_info.json":
+            yield from data["url_to_info"].values()
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with zipfile.ZipFile(
+            tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9
+        ) as zf:
+            for name, data in sorted(self._members.items()):
+                zf.writestr(
+                    name,
+                    json.dumps(data, ensure_ascii=False, separators=(",", ":")),
+                )
+        os.replace(tmp_path, self.path)
+
+    def import_json_dir(self, article_dir: str, remove_json: bool = False):
+        """Move the JSON artifacts of an article output directory into the store."""
+        artifacts = {}
+        for name in self.ARTIFACTS:
+            path = os.path.join(article_dir, name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    artifacts[name] = json.load(f)
+        if artifacts:
+            self.save_many(artifacts)
+        if remove_json:
+            for name in artifacts:
+                os.remove(os.path.join(article_dir, name))
+        return list(artifacts)
+
+    def export_json_dir(self, article_dir: str):
+        """Write the stored artifacts back as the JSON files of an article output directory."""
+        names = self.names()
+        for name in names:
+            with open(os.path.join(article_dir, name), "w", encoding="utf-8") as f:
+                json.dump(self.load(name), f)
+        return names
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Convert the article output directories under a directory between the JSON artifacts and "
+        f"{ArtifactStore.FILE_NAME}."
+    )
+    parser.add_argument("direction", choices=["import", "export"])
+    parser.add_argument(
+        "output_dir", help="An article output directory or a directory of them."
+    )
+    parser.add_argument(
+        "--remove-json",
+        action="store_true",
+        help="When importing, remove the JSON files once they are in the store.",
+    )
+    args = parser.parse_args()
+    for root, _, file_names in os.walk(args.output_dir):
+        store = ArtifactStore.for_article_dir(root)
+        if args.direction == "import":
+            converted = store.import_json_dir(root, remove_json=args.remove_json)
+        elif ArtifactStore.FILE_NAME in file_names:
+            converted = store.export_json_dir(root)
+        else:
+            converted = []
+        if converted:
+            print(f"{root}: {', '.join(converted)}")
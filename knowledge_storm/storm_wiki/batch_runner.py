@@ -0,0 +1,217 @@
+import concurrent.futures
+import copy
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Union
+
+import dspy
+
+from .engine import STORMWikiLMConfigs, STORMWikiRunner, STORMWikiRunnerArguments
+from ..lm import BudgetedLM, FairConcurrencyBudget
+from ..lm_history import LMHistorySink
+from ..rm import BudgetedRM
+from ..utils import FileIOHelper
+
+
+class STORMWikiBatchRunner:
+    """Run the STORM Wiki pipeline on many topics concurrently in one process.
+
+    All topics share the LM clients of `lm_configs` and the retrieval model `rm` (and therefore their connections,
+    rate limiters and caches) as well as the encoder models. Every LM call and search of every topic goes through a
+    single `FairConcurrencyBudget`, so the whole batch never has more than `max_concurrent_calls` calls in flight
+    and a busy topic cannot starve the others.
+
+    The token usage and query counts are tracked by the shared clients, so the split between the topics of the
+    per-topic numbers in the report is approximate; the batch totals are exact. For the same reason, the LM calls of
+    all topics are streamed to a single llm_call_history.jsonl in `args.output_dir`.
+    """
+
+    def __init__(
+        self,
+        args: STORMWikiRunnerArguments,
+        lm_configs: STORMWikiLMConfigs,
+        rm: dspy.Retrieve,
+        max_concurrent_topics: int = 4,
+        max_concurrent_calls: Optional[int] = None,
+    ):
+        """
+        Args:
+            args: Arguments shared by the runners of all topics.
+            lm_configs: LM configurations shared by all topics.
+            rm: Retrieval model shared by all topics.
+            max_concurrent_topics: Number of topics processed at the same time.
+            max_concurrent_calls: Maximum number of LM calls and searches in flight across all topics. Defaults to
+                `args.max_thread_num * max_concurrent_topics`.
+        """
+        self.args = args
+        self.lm_configs = lm_configs
+        self.rm = rm
+        self.max_concurrent_topics = max_concurrent_topics
+        self.budget = FairConcurrencyBudget(
+            max_concurrent_calls or max(args.max_thread_num, 1) * max_concurrent_topics
+        )
+
+    @staticmethod
+    def load_topics(topics_path: str) -> List[Dict]:
+        """Load a JSONL file with one {"topic": ..., "ground_truth_url": ...} object (or JSON string) per line."""
+        topics = []
+        with open(topics_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if isinstance(item, str):
+                    item = {"topic": item}
+                topics.append(item)
+        return topics
+
+    def _topic_lm_configs(self, owner) -> STORMWikiLMConfigs:
+        """Copy of the LM configurations whose clients are shared but account calls against `owner`."""
+        topic_lm_configs = copy.copy(self.lm_configs)
+        topic_lm_configs._wrap_lms(lambda lm: BudgetedLM(lm, self.budget, owner))
+        return topic_lm_configs
+
+    def _run_topic(self, index: int, item: Dict, run_kwargs: Dict) -> Dict:
+        topic = item["topic"]
+        runner = STORMWikiRunner(
+            self.args,
+            self._topic_lm_configs(owner=index),
+            BudgetedRM(self.rm, self.budget, owner=index),
+        )
+        start_time = time.time()
+        result = {"topic": topic}
+        try:
+            runner.run(
+                topic=topic,
+                ground_truth_url=item.get("ground_truth_url", ""),
+                **run_kwargs,
+            )
+            FileIOHelper.dump_json(
+                self.lm_configs.log(),
+                os.path.join(runner.article_output_dir, "run_config.json"),
+            )
+            result["status"] = "succeeded"
+        except Exception as e:
+            logging.exception(f"Error occurs when processing topic {topic}: {e}")
+            result["status"] = "failed"
+            result["error"] = repr(e)
+        result["seconds"] = time.time() - start_time
+        result["article_output_dir"] = getattr(runner, "article_output_dir", None)
+        result["time"] = runner.time
+        result["lm_cost"] = runner.lm_cost
+        result["rm_cost"] = runner.rm_cost
+        return result
+
+    def run(
+        self,
+        topics: Union[str, List[Union[str, Dict]]],
+        do_research: Optional[bool] = None,
+        do_generate_outline: Optional[bool] = None,
+        do_generate_article: Optional[bool] = None,
+        do_polish_article: Optional[bool] = None,
+        remove_duplicate: bool = False,
+    ) -> Dict:
+        """
+        Run the pipeline on all topics and write `batch_report.json` to `args.output_dir`.
+
+        The outputs of each topic are written to its own directory as with `STORMWikiRunner.run()`. A failing topic
+        is reported and does not stop the batch.
+
+        Args:
+            topics: Path of a JSONL file of topics (see `load_topics()`), or a list of topics or topic objects.
+            do_research, do_generate_outline, do_generate_article, do_polish_article, remove_duplicate: Same as in
+                `STORMWikiRunner.run()`, applied to every topic.
+
+        Returns:
+            The batch report.
+        """
+        if isinstance(topics, str):
+            topics = self.load_topics(topics)
+        topics = [{"topic": t} if isinstance(t, str) else t for t in topics]
+        os.makedirs(self.args.output_dir, exist_ok=True)
+        if getattr(self.lm_configs, "history_sink", None) is None:
+            self.lm_configs.set_history_sink(
+                LMHistorySink(
+                    os.path.join(self.args.output_dir, "llm_call_history.jsonl"),
+                    max_bytes=self.args.lm_history_max_mb * 1024 * 1024,
+                    compress=self.args.lm_history_compress,
+                    max_text_chars=self.args.lm_history_max_text_chars,
+                    redact_prompts=self.args.lm_history_redact_prompts,
+                )
+            )
+        run_kwargs = dict(
+            do_research=do_research,
+            do_generate_outline=do_generate_outline,
+            do_generate_article=do_generate_article,
+            do_polish_article=do_polish_article,
+            remove_duplicate=remove_duplicate,
+        )
+
+        start_time = time.time()
+        results = [None] * len(topics)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(min(self.max_concurrent_topics, len(topics)), 1)
+        ) as executor:
+            future_to_index = {
+                executor.submit(self._run_topic, i, item, run_kwargs): i
+                for i, item in enumerate(topics)
+            }
+            for future in concurrent.futures.as_completed(future_to_index):
+                i = future_to_index[future]
+                results[i] = future.result()
+                logging.info(
+                    f"[{sum(r is not None for r in results)}/{len(topics)}] "
+                    f"{results[i]['topic']}: {results[i]['status']} in {results[i]['seconds']:.1f}s"
+                )
+        wall_time = time.time() - start_time
+        self.lm_configs.collect_and_reset_lm_history()
+        self.lm_configs.history_sink.close()
+
+        lm_usage, rm_usage = {}, {}
+        for result in results:
+            for stage_usage in result["lm_cost"].values():
+                for model_name, tokens in stage_usage.items():
+                    usage = lm_usage.setdefault(
+                        model_name, {"prompt_tokens": 0, "completion_tokens": 0}
+                    )
+                    usage["prompt_tokens"] += tokens["prompt_tokens"]
+                    usage["completion_tokens"] += tokens["completion_tokens"]
+            for stage_usage in result["rm_cost"].values():
+                for rm_name, query_cnt in stage_usage.items():
+                    rm_usage[rm_name] = rm_usage.get(rm_name, 0) + query_cnt
+        succeeded = sum(r["status"] == "succeeded" for r in results)
+        report = {
+            "num_topics": len(topics),
+            "succeeded": succeeded,
+            "failed": len(topics) - succeeded,
+            "wall_time_seconds": wall_time,
+            "topics_per_hour": succeeded / wall_time * 3600 if wall_time > 0 else 0,
+            "max_concurrent_topics": self.max_concurrent_topics,
+            "max_concurrent_calls": self.budget.capacity,
+            "lm_usage": lm_usage,
+            "rm_usage": rm_usage,
+            "topics": results,
+        }
+        FileIOHelper.dump_json(
+            report, os.path.join(self.args.output_dir, "batch_report.json")
+        )
+        return report
+
+    @staticmethod
+    def summary(report: Dict):
+        print("***** Batch *****")
+        print(
+            f"{report['succeeded']}/{report['num_topics']} topics succeeded in {report['wall_time_seconds']:.1f} "
+            f"seconds ({report['topics_per_hour']:.1f} topics per hour)"
+        )
+        print("***** Token usage of language models: *****")
+        for model_name, tokens in report["lm_usage"].items():
+            print(f"    {model_name}: {tokens}")
+        print("***** Number of queries of retrieval models: *****")
+        for rm_name, query_cnt in report["rm_usage"].items():
+            print(f"    {rm_name}: {query_cnt}")
+        for result in report["topics"]:
+            if result["status"] == "failed":
+                print(f"Failed: {result['topic']}: {result['error']}")
@@ -1,6 +1,7 @@
-import json
+import asyncio
 import logging
 import os
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from typing import Union, Literal, Optional
 
@@ -9,12 +10,18 @@ import dspy
 from .modules.article_generation import StormArticleGenerationModule
 from .modules.article_polish import StormArticlePolishingModule
 from .modules.callback import BaseCallbackHandler
+from .modules.graph import MindmapGraph
 from .modules.knowledge_curation import StormKnowledgeCurationModule
 from .modules.outline_generation import StormOutlineGenerationModule
 from .modules.persona_generator import StormPersonaGenerator
 from .modules.storm_dataclass import StormInformationTable, StormArticle
-from ..interface import Engine, LMConfigs, Retriever
-from ..lm import OpenAIModel, AzureOpenAIModel, TogetherClient
+from .artifact_store import ArtifactStore
+from .stage_cache import StageCache
+from ..interface import Engine, LMConfigs, Retriever, pipeline_event_loop
+from ..lm import OpenAIModel, AzureOpenAIModel, TogetherClient, HedgedLM
+from ..lm_history import LMHistorySink
+from ..profiling import StageProfiler
+from ..tracing import Tracer, span
 from ..utils import FileIOHelper, makeStringRed, truncate_filename
 
 
@@ -34,6 +41,8 @@ class STORMWikiLMConfigs(LMConfigs):
         self.outline_gen_lm = None  # LLM used in outline generation.
         self.article_gen_lm = None  # LLM used in article generation.
         self.article_polish_lm = None  # LLM used in article polishing.
+        # LLM used to summarize passages (and score topics) in the mindmap.
+        self.mindmap_lm = None
 
     def init_openai_model(
         self,
@@ -70,6 +79,7 @@ class STORMWikiLMConfigs(LMConfigs):
             self.article_polish_lm = OpenAIModel(
                 model="gpt-4o-2024-05-13", max_tokens=4000, **openai_kwargs
             )
+            self.mindmap_lm = self.conv_simulator_lm
         elif lm_type and lm_type == "azure":
             azure_kwargs = {
                 "api_key": azure_api_key,
@@ -103,6 +113,7 @@ class STORMWikiLMConfigs(LMConfigs):
                 **azure_kwargs,
                 model_type="chat",
             )
+            self.mindmap_lm = self.conv_simulator_lm
         # elif lm_type and lm_type == "together":
         #     together_kwargs = {
         #         "api_key": os.getenv("TOGETHER_API_KEY"),
@@ -147,6 +158,21 @@ class STORMWikiLMConfigs(LMConfigs):
     def set_article_polish_lm(self, model: Union[dspy.dsp.LM, dspy.dsp.HFModel]):
         self.article_polish_lm = model
 
+    def set_mindmap_lm(self, model: Union[dspy.dsp.LM, dspy.dsp.HFModel]):
+        self.mindmap_lm = model
+
+    def enable_hedging(self, **hedge_kwargs):
+        """Hedge the calls on the critical path of the information-seeking conversation.
+
+        Each turn of `ConvSimulator` waits on one question (`question_asker_lm`) and one answer
+        (`conv_simulator_lm`), so a single slow call delays the whole conversation. See `HedgedLM` for
+        `hedge_kwargs`.
+        """
+        self._wrap_lms(
+            lambda lm: HedgedLM(lm, **hedge_kwargs),
+            ["question_asker_lm", "conv_simulator_lm"],
+        )
+
 
 @dataclass
 class STORMWikiRunnerArguments:
@@ -190,27 +216,156 @@ class STORMWikiRunnerArguments:
             "Consider reducing it if keep getting 'Exceed rate limit' error when calling LM API."
         },
     )
+    min_information_gain: float = field(
+        default=0.0,
+        metadata={
+            "help": "End a persona conversation before max_conv_turn when a turn brings less information than this "
+            "(0 to 1, average of the fractions of new URLs, new snippets and new mindmap nodes). 0 disables it."
+        },
+    )
+    novelty_similarity_threshold: float = field(
+        default=0.9,
+        metadata={
+            "help": "A snippet more similar than this to a previous snippet of the conversation is not new."
+        },
+    )
+    page_cache_dir: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "If set, cache the outlines of the related Wikipedia pages fetched for persona generation in this "
+            "directory (e.g., persona_generator.DEFAULT_PAGE_CACHE_DIR). Cached outlines are never refreshed."
+        },
+    )
+    questions_per_round: int = field(
+        default=1,
+        metadata={
+            "help": "Number of questions asked at once in each round of a persona conversation. The questions are "
+            "answered concurrently, so max_conv_turn questions take about max_conv_turn / questions_per_round rounds."
+        },
+    )
+    lm_history_max_mb: int = field(
+        default=64,
+        metadata={
+            "help": "llm_call_history.jsonl is rotated when it reaches this size in MB. 0 disables the rotation."
+        },
+    )
+    lm_history_compress: bool = field(
+        default=False,
+        metadata={"help": "If True, gzip the rotated LM call history files."},
+    )
+    lm_history_max_text_chars: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Truncate the prompts and completions in the LM call history to this many characters."
+        },
+    )
+    lm_history_redact_prompts: bool = field(
+        default=False,
+        metadata={
+            "help": "If True, only keep the hash and length of the prompts in the LM call history."
+        },
+    )
+    artifact_format: Literal["json", "compact"] = field(
+        default="json",
+        metadata={
+            "help": "'json' writes conversation_log.json, raw_search_results.json and url_to_info.json as JSON files. "
+            "'compact' keeps them in a deduplicated, compressed storm_artifacts.zip instead (see ArtifactStore)."
+        },
+    )
+    trace_format: Optional[Literal["chrome", "otlp"]] = field(
+        default=None,
+        metadata={
+            "help": "If set, trace the LM, search, embedding and download calls of each run and write them to "
+            "trace.json ('chrome', open in chrome://tracing or Perfetto) or trace.otlp.json ('otlp') in the "
+            "article output directory."
+        },
+    )
+    profile: bool = field(
+        default=False,
+        metadata={
+            "help": "If True, profile the CPU time (with a sampling profiler) and the peak memory (with tracemalloc) "
+            "of each stage and write the profiles to the profile/ folder of the article output directory."
+        },
+    )
 
 
 class STORMWikiRunner(Engine):
     """STORM Wiki pipeline runner."""
 
+    # What the outputs of each stage depend on, see `StageCache`. "module" is the attribute holding the stage module
+    # whose prompts are part of the key; with "rm", the retrieval model is part of the key too.
+    STAGES = {
+        "research": {
+            "outputs": [
+                "conversation_log.json",
+                "raw_search_results.json",
+                "graph_mindmap.txt",
+                "graph_mindmap.json",
+            ],
+            "upstream": [],
+            "lms": ["conv_simulator_lm", "question_asker_lm", "mindmap_lm"],
+            "args": [
+                "max_conv_turn",
+                "max_perspective",
+                "max_search_queries_per_turn",
+                "search_top_k",
+                "min_information_gain",
+                "novelty_similarity_threshold",
+                "questions_per_round",
+            ],
+            "module": "storm_knowledge_curation_module",
+            "rm": True,
+        },
+        "outline": {
+            "outputs": ["storm_gen_outline.txt", "direct_gen_outline.txt"],
+            "upstream": ["conversation_log.json", "graph_mindmap.txt"],
+            "lms": ["outline_gen_lm"],
+            "args": [],
+            "module": "storm_outline_generation_module",
+        },
+        "article": {
+            "outputs": ["storm_gen_article.txt", "url_to_info.json"],
+            "upstream": [
+                "conversation_log.json",
+                "graph_mindmap.txt",
+                "storm_gen_outline.txt",
+            ],
+            "lms": ["article_gen_lm"],
+            "args": ["retrieve_top_k"],
+            "module": "storm_article_generation",
+        },
+        "polish": {
+            "outputs": ["storm_gen_article_polished.txt"],
+            "upstream": ["storm_gen_article.txt", "url_to_info.json"],
+            "lms": ["article_gen_lm", "article_polish_lm"],
+            "args": [],
+            "module": "storm_article_polishing_module",
+        },
+    }
+
     def __init__(
         self, args: STORMWikiRunnerArguments, lm_configs: STORMWikiLMConfigs, rm
     ):
         super().__init__(lm_configs=lm_configs)
         self.args = args
         self.lm_configs = lm_configs
+        if self.args.trace_format is not None:
+            # Before the modules are created since they keep a reference to their LM.
+            self.lm_configs.enable_tracing()
 
         self.retriever = Retriever(rm=rm, max_thread=self.args.max_thread_num)
         storm_persona_generator = StormPersonaGenerator(
-            self.lm_configs.question_asker_lm
+            self.lm_configs.question_asker_lm, page_cache_dir=self.args.page_cache_dir
         )
         self.storm_knowledge_curation_module = StormKnowledgeCurationModule(
             retriever=self.retriever,
             persona_generator=storm_persona_generator,
             conv_simulator_lm=self.lm_configs.conv_simulator_lm,
             question_asker_lm=self.lm_configs.question_asker_lm,
+            mindmap_lm=self.lm_configs.mindmap_lm,
+            min_information_gain=self.args.min_information_gain,
+            novelty_similarity_threshold=self.args.novelty_similarity_threshold,
+            questions_per_round=self.args.questions_per_round,
             max_search_queries_per_turn=self.args.max_search_queries_per_turn,
             search_top_k=self.args.search_top_k,
             max_conv_turn=self.args.max_conv_turn,
@@ -233,6 +388,9 @@ class STORMWikiRunner(Engine):
         self.apply_decorators()
 
         self.graph_mindmap = {}
+        # Merged mindmap of the research stage, see `render_mindmap()`.
+        self.mindmap: Optional[MindmapGraph] = None
+        self._owns_history_sink = False
 
     def run_knowledge_curation_module(
         self,
@@ -240,7 +398,7 @@ class STORMWikiRunner(Engine):
         callback_handler: BaseCallbackHandler = None,
     ) -> StormInformationTable:
 
-        information_table, conversation_log, self.graph_mindmap = (
+        information_table, conversation_log, self.mindmap = (
             self.storm_knowledge_curation_module.research(
                 topic=self.topic,
                 ground_truth_url=ground_truth_url,
@@ -248,16 +406,71 @@ class STORMWikiRunner(Engine):
                 max_perspective=self.args.max_perspective,
                 disable_perspective=False,
                 return_conversation_log=True,
+                journal_path=self._journal_path(),
             )
         )
+        return self._dump_research_results(information_table, conversation_log)
 
-        FileIOHelper.dump_json(
-            conversation_log,
-            os.path.join(self.article_output_dir, "conversation_log.json"),
+    async def arun_knowledge_curation_module(
+        self,
+        ground_truth_url: str = "None",
+        callback_handler: BaseCallbackHandler = None,
+    ) -> StormInformationTable:
+        information_table, conversation_log, self.mindmap = (
+            await self.storm_knowledge_curation_module.aresearch(
+                topic=self.topic,
+                ground_truth_url=ground_truth_url,
+                callback_handler=callback_handler,
+                max_perspective=self.args.max_perspective,
+                disable_perspective=False,
+                return_conversation_log=True,
+                journal_path=self._journal_path(),
+            )
         )
-        information_table.dump_url_to_info(
-            os.path.join(self.article_output_dir, "raw_search_results.json")
+        return self._dump_research_results(information_table, conversation_log)
+
+    def _journal_path(self):
+        # Per-turn journal of the research stage, an interrupted run resumes from it.
+        return os.path.join(self.article_output_dir, "conversation_journal.jsonl")
+
+    def _dump_json_artifacts(self, artifacts):
+        if self.args.artifact_format == "compact":
+            self.artifact_store.save_many(artifacts)
+            for file_name in artifacts:
+                # A JSON file left by an earlier run would be loaded instead of the store.
+                if os.path.exists(os.path.join(self.article_output_dir, file_name)):
+                    os.remove(os.path.join(self.article_output_dir, file_name))
+        else:
+            for file_name, obj in artifacts.items():
+                FileIOHelper.dump_json(
+                    obj, os.path.join(self.article_output_dir, file_name)
+                )
+
+    def _load_json_artifact(self, file_name):
+        """Load an artifact from its JSON file, or from the artifact store; None if it is in neither."""
+        path = os.path.join(self.article_output_dir, file_name)
+        if os.path.exists(path):
+            return FileIOHelper.load_json(path)
+        if file_name in self.artifact_store:
+            return self.artifact_store.load(file_name)
+        return None
+
+    def _dump_research_results(self, information_table, conversation_log):
+        self.graph_mindmap = self.mindmap.to_prompt()
+        self._dump_json_artifacts(
+            {
+                "conversation_log.json": conversation_log,
+                "raw_search_results.json": information_table.log_url_to_info(),
+                "graph_mindmap.json": self.mindmap.to_dict(),
+            }
         )
+        FileIOHelper.write_str(
+            self.graph_mindmap,
+            os.path.join(self.article_output_dir, "graph_mindmap.txt"),
+        )
+        # The research results are complete, a later run with do_research=True starts over.
+        if os.path.exists(self._journal_path()):
+            os.remove(self._journal_path())
         return information_table
 
     def run_outline_generation_module(
@@ -293,27 +506,48 @@ class STORMWikiRunner(Engine):
             information_table=information_table,
             article_with_outline=outline,
             callback_handler=callback_handler,
-            graph_mindmap=self.graph_mindmap
+            graph_mindmap=self.graph_mindmap,
+        )
+        return self._dump_draft_article(draft_article)
+
+    async def arun_article_generation_module(
+        self,
+        outline: StormArticle,
+        information_table: StormInformationTable,
+        callback_handler: BaseCallbackHandler = None,
+    ) -> StormArticle:
+        draft_article = await self.storm_article_generation.agenerate_article(
+            topic=self.topic,
+            information_table=information_table,
+            article_with_outline=outline,
+            callback_handler=callback_handler,
+            graph_mindmap=self.graph_mindmap,
         )
+        return self._dump_draft_article(draft_article)
+
+    def _dump_draft_article(self, draft_article):
         draft_article.dump_article_as_plain_text(
             os.path.join(self.article_output_dir, "storm_gen_article.txt")
         )
-        draft_article.dump_reference_to_file(
-            os.path.join(self.article_output_dir, "url_to_info.json")
-        )
+        self._dump_json_artifacts({"url_to_info.json": draft_article.log_reference()})
         return draft_article
 
     def run_article_polishing_module(
-        self, draft_article: StormArticle, remove_duplicate: bool = False
+        self,
+        draft_article: StormArticle,
+        remove_duplicate: bool = False,
+        callback_handler: BaseCallbackHandler = None,
     ) -> str:
 
         polished_article = self.storm_article_polishing_module.polish_article(
             topic=self.topic,
             draft_article=draft_article,
             remove_duplicate=remove_duplicate,
+            callback_handler=callback_handler,
         )
         final_article = self.storm_article_polishing_module.edit_article(
             polished_article=polished_article,
+            callback_handler=callback_handler,
         )
         FileIOHelper.write_str(
             final_article,
@@ -321,35 +555,111 @@ class STORMWikiRunner(Engine):
         )
         return final_article
 
+    def _set_history_sink(self):
+        """Stream the LM calls of the topic to llm_call_history.jsonl in its output directory.
+
+        A sink set on `lm_configs` by the caller (e.g., one for a whole batch of topics) is left in place.
+        """
+        if (
+            getattr(self.lm_configs, "history_sink", None) is not None
+            and not self._owns_history_sink
+        ):
+            return
+        if self._owns_history_sink:
+            self.lm_configs.history_sink.close()
+        self.lm_configs.set_history_sink(
+            LMHistorySink(
+                os.path.join(self.article_output_dir, "llm_call_history.jsonl"),
+                max_bytes=self.args.lm_history_max_mb * 1024 * 1024,
+                compress=self.args.lm_history_compress,
+                max_text_chars=self.args.lm_history_max_text_chars,
+                redact_prompts=self.args.lm_history_redact_prompts,
+            )
+        )
+        self._owns_history_sink = True
+
     def post_run(self):
         """
         Post-run operations, including:
         1. Dumping the run configuration.
-        2. Dumping the LLM call history.
+        2. Closing the LLM call history, which is written to llm_call_history.jsonl during the run.
         """
         config_log = self.lm_configs.log()
         FileIOHelper.dump_json(
             config_log, os.path.join(self.article_output_dir, "run_config.json")
         )
+        # The calls are already in the sink, only the most recent ones are still in memory.
+        self.lm_configs.collect_and_reset_lm_history()
+        if self._owns_history_sink:
+            self.lm_configs.history_sink.close()
+
+    def _stage_key(self, stage: str, **stage_inputs) -> str:
+        spec = self.STAGES[stage]
+        if spec.get("rm"):
+            stage_inputs["rm"] = StageCache.rm_fingerprint(self.retriever.rm)
+        return StageCache.make_key(
+            stage,
+            topic=self.topic,
+            upstream=self.stage_cache.hash_files(spec["upstream"]),
+            lms={
+                lm_name: StageCache.lm_fingerprint(getattr(self.lm_configs, lm_name))
+                for lm_name in spec["lms"]
+            },
+            prompts=StageCache.prompt_fingerprint(getattr(self, spec["module"])),
+            args={arg_name: getattr(self.args, arg_name) for arg_name in spec["args"]},
+            **stage_inputs,
+        )
+
+    def _should_run_stage(self, stage: str, do_stage: Optional[bool], **stage_inputs):
+        """Resolve a do_* flag; None means running the stage only if its recorded outputs are stale."""
+        if do_stage is not None:
+            return do_stage
+        if self.stage_cache.is_fresh(stage, self._stage_key(stage, **stage_inputs)):
+            logging.info(
+                f"Reusing the {stage} results of {self.topic}, its inputs are unchanged."
+            )
+            return False
+        return True
+
+    def _record_stage(self, stage: str, **stage_inputs):
+        self.stage_cache.record(
+            stage,
+            self._stage_key(stage, **stage_inputs),
+            self.STAGES[stage]["outputs"],
+        )
+
+    def _load_graph_mindmap_from_local_fs(self):
+        # Outputs of an earlier version may not have the mindmap, the later stages then go without it.
+        graph_mindmap_path = os.path.join(self.article_output_dir, "graph_mindmap.txt")
+        if os.path.exists(graph_mindmap_path):
+            self.graph_mindmap = FileIOHelper.load_str(graph_mindmap_path)
+
+    def render_mindmap(self, path: Optional[str] = None) -> Optional[str]:
+        """Draw the mindmap of the research stage of the current topic.
 
-        llm_call_history = self.lm_configs.collect_and_reset_lm_history()
-        with open(
-            os.path.join(self.article_output_dir, "llm_call_history.jsonl"), "w"
-        ) as f:
-            for call in llm_call_history:
-                if "kwargs" in call:
-                    call.pop(
-                        "kwargs"
-                    )  # All kwargs are dumped together to run_config.json.
-                f.write(json.dumps(call) + "\n")
+        Args:
+            path: Image path; defaults to graph_mindmap.png in the article output directory.
+
+        Returns:
+            The path of the image, or None if the topic has no saved mindmap (e.g., outputs of an earlier version).
+        """
+        if self.mindmap is None:
+            mindmap_data = self._load_json_artifact("graph_mindmap.json")
+            if mindmap_data is None:
+                return None
+            self.mindmap = MindmapGraph.from_dict(mindmap_data)
+        return self.mindmap.render(
+            path or os.path.join(self.article_output_dir, "graph_mindmap.png")
+        )
 
     def _load_information_table_from_local_fs(self, information_table_local_path):
-        assert os.path.exists(information_table_local_path), makeStringRed(
-            f"{information_table_local_path} not exists. Please set --do-research argument to prepare the conversation_log.json for this topic."
+        conversation_log = self._load_json_artifact(
+            os.path.basename(information_table_local_path)
         )
-        return StormInformationTable.from_conversation_log_file(
-            information_table_local_path
+        assert conversation_log is not None, makeStringRed(
+            f"{information_table_local_path} not exists. Please set --do-research argument to prepare the conversation_log.json for this topic."
         )
+        return StormInformationTable.from_conversation_log(conversation_log)
 
     def _load_outline_from_local_fs(self, topic, outline_local_path):
         assert os.path.exists(outline_local_path), makeStringRed(
@@ -363,48 +673,31 @@ class STORMWikiRunner(Engine):
         assert os.path.exists(draft_article_path), makeStringRed(
             f"{draft_article_path} not exists. Please set --do-generate-article argument to prepare the storm_gen_article.txt for this topic."
         )
-        assert os.path.exists(url_to_info_path), makeStringRed(
+        references = self._load_json_artifact(os.path.basename(url_to_info_path))
+        assert references is not None, makeStringRed(
             f"{url_to_info_path} not exists. Please set --do-generate-article argument to prepare the url_to_info.json for this topic."
         )
         article_text = FileIOHelper.load_str(draft_article_path)
-        references = FileIOHelper.load_json(url_to_info_path)
         return StormArticle.from_string(
             topic_name=topic, article_text=article_text, references=references
         )
 
-    def run(
+    def _prepare_run(
         self,
         topic: str,
-        ground_truth_url: str = "",
-        do_research: bool = True,
-        do_generate_outline: bool = True,
-        do_generate_article: bool = True,
-        do_polish_article: bool = True,
-        remove_duplicate: bool = False,
-        callback_handler: BaseCallbackHandler = BaseCallbackHandler(),
+        do_research: bool,
+        do_generate_outline: bool,
+        do_generate_article: bool,
+        do_polish_article: bool,
     ):
-        """
-        Run the STORM pipeline.
-
-        Args:
-            topic: The topic to research.
-            ground_truth_url: A ground truth URL including a curated article about the topic. The URL will be excluded.
-            do_research: If True, research the topic through information-seeking conversation;
-             if False, expect conversation_log.json and raw_search_results.json to exist in the output directory.
-            do_generate_outline: If True, generate an outline for the topic;
-             if False, expect storm_gen_outline.txt to exist in the output directory.
-            do_generate_article: If True, generate a curated article for the topic;
-             if False, expect storm_gen_article.txt to exist in the output directory.
-            do_polish_article: If True, polish the article by adding a summarization section and (optionally) removing
-             duplicated content.
-            remove_duplicate: If True, remove duplicated content.
-            callback_handler: A callback handler to handle the intermediate results.
-        """
-        assert (
-            do_research
-            or do_generate_outline
-            or do_generate_article
-            or do_polish_article
+        assert any(
+            do_stage is not False
+            for do_stage in (
+                do_research,
+                do_generate_outline,
+                do_generate_article,
+                do_polish_article,
+            )
         ), makeStringRed(
             "No action is specified. Please set at least one of --do-research, --do-generate-outline, --do-generate-article, --do-polish-article"
         )
@@ -417,59 +710,230 @@ class STORMWikiRunner(Engine):
             self.args.output_dir, self.article_dir_name
         )
         os.makedirs(self.article_output_dir, exist_ok=True)
+        self.artifact_store = ArtifactStore.for_article_dir(self.article_output_dir)
+        # The mindmap of another topic; the one of this topic is loaded when needed.
+        self.mindmap = None
+        self.stage_cache = StageCache(
+            self.article_output_dir, artifact_store=self.artifact_store
+        )
+        self._set_history_sink()
+        self.stage_profiler = (
+            StageProfiler(os.path.join(self.article_output_dir, "profile"))
+            if self.args.profile
+            else None
+        )
+
+    @contextmanager
+    def _trace_run(self):
+        """Trace the enclosed run if `trace_format` is set and export the trace to the article output directory."""
+        if self.args.trace_format is None:
+            yield None
+            return
+        tracer = Tracer()
+        try:
+            with tracer.activate(), span("run", "pipeline", topic=self.topic):
+                yield tracer
+        finally:
+            file_name = (
+                "trace.json"
+                if self.args.trace_format == "chrome"
+                else "trace.otlp.json"
+            )
+            tracer.export(
+                os.path.join(self.article_output_dir, file_name), self.args.trace_format
+            )
+            logging.info(f"Trace summary: {tracer.summary()}")
 
+    def _stage_steps(
+        self,
+        ground_truth_url: str,
+        do_research: Optional[bool],
+        do_generate_outline: Optional[bool],
+        do_generate_article: Optional[bool],
+        do_polish_article: Optional[bool],
+        remove_duplicate: bool,
+        callback_handler: BaseCallbackHandler,
+    ):
+        """The stages of a run in order, shared by `run()` and `arun()`.
+
+        Yields the (method name, kwargs) of each call that runs a stage or loads the outputs of a skipped one; the
+        caller makes the call, synchronously or with the asyncio counterpart of the method, and sends back its result.
+        """
         # research module
         information_table: StormInformationTable = None
-        if do_research:
-            information_table = self.run_knowledge_curation_module(
+        if self._should_run_stage(
+            "research", do_research, ground_truth_url=ground_truth_url
+        ):
+            information_table = yield "run_knowledge_curation_module", dict(
                 ground_truth_url=ground_truth_url, callback_handler=callback_handler
             )
+            self._record_stage("research", ground_truth_url=ground_truth_url)
+        else:
+            self._load_graph_mindmap_from_local_fs()
         # outline generation module
         outline: StormArticle = None
-        if do_generate_outline:
+        if self._should_run_stage("outline", do_generate_outline):
             # load information table if it's not initialized
             if information_table is None:
-                information_table = self._load_information_table_from_local_fs(
-                    os.path.join(self.article_output_dir, "conversation_log.json")
+                information_table = yield "_load_information_table_from_local_fs", dict(
+                    information_table_local_path=os.path.join(
+                        self.article_output_dir, "conversation_log.json"
+                    )
                 )
-            outline = self.run_outline_generation_module(
+            outline = yield "run_outline_generation_module", dict(
                 information_table=information_table, callback_handler=callback_handler
             )
+            self._record_stage("outline")
 
         # article generation module
         draft_article: StormArticle = None
-        if do_generate_article:
+        if self._should_run_stage("article", do_generate_article):
             if information_table is None:
-                information_table = self._load_information_table_from_local_fs(
-                    os.path.join(self.article_output_dir, "conversation_log.json")
+                information_table = yield "_load_information_table_from_local_fs", dict(
+                    information_table_local_path=os.path.join(
+                        self.article_output_dir, "conversation_log.json"
+                    )
                 )
             if outline is None:
-                outline = self._load_outline_from_local_fs(
-                    topic=topic,
+                outline = yield "_load_outline_from_local_fs", dict(
+                    topic=self.topic,
                     outline_local_path=os.path.join(
                         self.article_output_dir, "storm_gen_outline.txt"
                     ),
                 )
-            draft_article = self.run_article_generation_module(
+            draft_article = yield "run_article_generation_module", dict(
                 outline=outline,
                 information_table=information_table,
                 callback_handler=callback_handler,
             )
+            self._record_stage("article")
 
         # article polishing module
-        if do_polish_article:
+        if self._should_run_stage(
+            "polish", do_polish_article, remove_duplicate=remove_duplicate
+        ):
             if draft_article is None:
-                draft_article_path = os.path.join(
-                    self.article_output_dir, "storm_gen_article.txt"
-                )
-                url_to_info_path = os.path.join(
-                    self.article_output_dir, "url_to_info.json"
-                )
-                draft_article = self._load_draft_article_from_local_fs(
-                    topic=topic,
-                    draft_article_path=draft_article_path,
-                    url_to_info_path=url_to_info_path,
+                draft_article = yield "_load_draft_article_from_local_fs", dict(
+                    topic=self.topic,
+                    draft_article_path=os.path.join(
+                        self.article_output_dir, "storm_gen_article.txt"
+                    ),
+                    url_to_info_path=os.path.join(
+                        self.article_output_dir, "url_to_info.json"
+                    ),
                 )
-            self.run_article_polishing_module(
-                draft_article=draft_article, remove_duplicate=remove_duplicate
+            yield "run_article_polishing_module", dict(
+                draft_article=draft_article,
+                remove_duplicate=remove_duplicate,
+                callback_handler=callback_handler,
+            )
+            self._record_stage("polish", remove_duplicate=remove_duplicate)
+
+    def run(
+        self,
+        topic: str,
+        ground_truth_url: str = "",
+        do_research: Optional[bool] = None,
+        do_generate_outline: Optional[bool] = None,
+        do_generate_article: Optional[bool] = None,
+        do_polish_article: Optional[bool] = None,
+        remove_duplicate: bool = False,
+        callback_handler: BaseCallbackHandler = BaseCallbackHandler(),
+    ):
+        """
+        Run the STORM pipeline.
+
+        Args:
+            topic: The topic to research.
+            ground_truth_url: A ground truth URL including a curated article about the topic. The URL will be excluded.
+            do_research: If True, research the topic through information-seeking conversation;
+             if False, expect conversation_log.json and raw_search_results.json to exist in the output directory.
+            do_generate_outline: If True, generate an outline for the topic;
+             if False, expect storm_gen_outline.txt to exist in the output directory.
+            do_generate_article: If True, generate a curated article for the topic;
+             if False, expect storm_gen_article.txt to exist in the output directory.
+            do_polish_article: If True, polish the article by adding a summarization section and (optionally) removing
+             duplicated content.
+            For each do_* flag, None (the default) runs the stage only if the topic, the outputs of the previous
+             stages, the LMs, the prompts or the arguments it depends on changed since its outputs in the output
+             directory were generated (see `StageCache`); otherwise the outputs are loaded.
+            remove_duplicate: If True, remove duplicated content.
+            callback_handler: A callback handler to handle the intermediate results.
+        """
+        self._prepare_run(
+            topic,
+            do_research,
+            do_generate_outline,
+            do_generate_article,
+            do_polish_article,
+        )
+        with self._trace_run():
+            steps = self._stage_steps(
+                ground_truth_url=ground_truth_url,
+                do_research=do_research,
+                do_generate_outline=do_generate_outline,
+                do_generate_article=do_generate_article,
+                do_polish_article=do_polish_article,
+                remove_duplicate=remove_duplicate,
+                callback_handler=callback_handler,
             )
+            result = None
+            while True:
+                try:
+                    method_name, kwargs = steps.send(result)
+                except StopIteration:
+                    break
+                result = getattr(self, method_name)(**kwargs)
+
+    async def arun(
+        self,
+        topic: str,
+        ground_truth_url: str = "",
+        do_research: Optional[bool] = None,
+        do_generate_outline: Optional[bool] = None,
+        do_generate_article: Optional[bool] = None,
+        do_polish_article: Optional[bool] = None,
+        remove_duplicate: bool = False,
+        callback_handler: BaseCallbackHandler = BaseCallbackHandler(),
+    ):
+        """
+        Asyncio counterpart of `run()`; takes the same arguments.
+
+        Search requests and webpage downloads run on the event loop, while the dspy modules, which are synchronous,
+        run in worker threads bounded by `max_thread_num`. Use it as `asyncio.run(runner.arun(topic=...))`.
+        """
+        self._prepare_run(
+            topic,
+            do_research,
+            do_generate_outline,
+            do_generate_article,
+            do_polish_article,
+        )
+        with self._trace_run():
+            loop_token = pipeline_event_loop.set(asyncio.get_running_loop())
+            try:
+                steps = self._stage_steps(
+                    ground_truth_url=ground_truth_url,
+                    do_research=do_research,
+                    do_generate_outline=do_generate_outline,
+                    do_generate_article=do_generate_article,
+                    do_polish_article=do_polish_article,
+                    remove_duplicate=remove_duplicate,
+                    callback_handler=callback_handler,
+                )
+                result = None
+                while True:
+                    try:
+                        method_name, kwargs = steps.send(result)
+                    except StopIteration:
+                        break
+                    # Use the asyncio counterpart of the method if there is one, e.g., arun_knowledge_curation_module.
+                    async_method = getattr(self, f"a{method_name}", None)
+                    if async_method is not None:
+                        result = await async_method(**kwargs)
+                    else:
+                        result = await asyncio.to_thread(
+                            getattr(self, method_name), **kwargs
+                        )
+            finally:
+                pipeline_event_loop.reset(loop_token)
@@ -1,4 +1,46 @@
-from .knowledge_curation import *
-from .persona_generator import *
-from .retriever import *
-from .storm_dataclass import *
+from ...lazy_loader import attach
+
+# Submodules are imported on first access to one of their attributes, see `lazy_loader.attach`.
+_import_structure = {
+    "knowledge_curation": [
+        "BaseCallbackHandler",
+        "KnowledgeCurationModule",
+        "MindmapGraph",
+        "script_dir",
+        "ConvSimulator",
+        "WikiWriter",
+        "AskQuestion",
+        "AskQuestionWithPersona",
+        "QuestionToQuery",
+        "AnswerQuestion",
+        "TopicExpert",
+        "StormKnowledgeCurationModule",
+    ],
+    "persona_generator": [
+        "get_wiki_page_title_and_toc",
+        "FindRelatedTopic",
+        "GenPersona",
+        "CreateWriterWithPersona",
+        "StormPersonaGenerator",
+    ],
+    "retriever": [
+        "Retriever",
+        "GENERALLY_UNRELIABLE",
+        "DEPRECATED",
+        "BLACKLISTED",
+        "is_valid_wikipedia_source",
+    ],
+    "storm_dataclass": [
+        "Information",
+        "InformationTable",
+        "Article",
+        "ArticleSectionNode",
+        "ArticleTextProcessing",
+        "FileIOHelper",
+        "DialogueTurn",
+        "StormInformationTable",
+        "StormArticle",
+    ],
+}
+
+__getattr__, __dir__, __all__ = attach(__name__, _import_structure)
@@ -1,3 +1,4 @@
+import asyncio
 import concurrent.futures
 import copy
 import logging
@@ -6,11 +7,19 @@ from typing import List, Union
 
 import dspy
 
-from .callback import BaseCallbackHandler
+from .callback import BaseCallbackHandler, stream_section
 from .storm_dataclass import StormInformationTable, StormArticle
 from ...interface import ArticleGenerationModule, Information
+from ...tracing import propagate_context
 from ...utils import ArticleTextProcessing
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+    streamlit_connection = True
+except ImportError as err:
+    streamlit_connection = False
+
 
 class StormArticleGenerationModule(ArticleGenerationModule):
     """
@@ -31,20 +40,37 @@ class StormArticleGenerationModule(ArticleGenerationModule):
         self.section_gen = ConvToSection(engine=self.article_gen_lm)
 
     def generate_section(
-        self, topic, section_name, information_table, section_outline, section_query, graph_mindmap
+        self,
+        topic,
+        section_name,
+        information_table,
+        section_outline,
+        section_query,
+        graph_mindmap,
+        callback_handler: BaseCallbackHandler = None,
+        article: StormArticle = None,
     ):
         collected_info: List[Information] = []
         if information_table is not None:
             collected_info = information_table.retrieve_information(
                 queries=section_query, search_top_k=self.retrieve_top_k
             )
-        output = self.section_gen(
-            topic=topic,
-            outline=section_outline,
-            section=section_name,
-            collected_info=collected_info,
-            graph_mindmap=graph_mindmap
-        )
+
+        on_partial = None
+        if article is not None:
+
+            def on_partial(partial_content):
+                article.set_section_draft(section_name, partial_content)
+                return {"article": article}
+
+        with stream_section(callback_handler, section_name, on_partial=on_partial):
+            output = self.section_gen(
+                topic=topic,
+                outline=section_outline,
+                section=section_name,
+                collected_info=collected_info,
+                graph_mindmap=graph_mindmap,
+            )
         return {
             "section_name": section_name,
             "section_content": output.section,
@@ -68,11 +94,15 @@ class StormArticleGenerationModule(ArticleGenerationModule):
             article_with_outline (StormArticle): The article with specified outline.
             callback_handler (BaseCallbackHandler): An optional callback handler that can be used to trigger
                 custom callbacks at various stages of the article generation process. Defaults to None.
+                If it sets `stream_section_tokens`, sections are streamed through `on_section_token` and
+                `on_section_partial` while they are being written.
         """
         information_table.prepare_table_for_retrieval()
 
         if article_with_outline is None:
             article_with_outline = StormArticle(topic_name=topic)
+        # The article is filled with partial section content while the sections are streamed.
+        article = copy.deepcopy(article_with_outline)
 
         sections_to_write = article_with_outline.get_first_level_section_names()
 
@@ -87,7 +117,8 @@ class StormArticleGenerationModule(ArticleGenerationModule):
                 information_table=information_table,
                 section_outline="",
                 section_query=[topic],
-                graph_mindmap=graph_mindmap
+                graph_mindmap=graph_mindmap,
+                callback_handler=callback_handler,
             )
             section_output_dict_collection = [section_output_dict]
         else:
@@ -96,39 +127,109 @@ class StormArticleGenerationModule(ArticleGenerationModule):
                 max_workers=self.max_thread_num
             ) as executor:
                 future_to_sec_title = {}
-                for section_title in sections_to_write:
-                    # We don't want to write a separate introduction section.
-                    if section_title.lower().strip() == "introduction":
-                        continue
-                        # We don't want to write a separate conclusion section.
-                    if section_title.lower().strip().startswith(
-                        "conclusion"
-                    ) or section_title.lower().strip().startswith("summary"):
-                        continue
-                    section_query = article_with_outline.get_outline_as_list(
-                        root_section_name=section_title, add_hashtags=False
-                    )
-                    queries_with_hashtags = article_with_outline.get_outline_as_list(
-                        root_section_name=section_title, add_hashtags=True
-                    )
-                    section_outline = "\n".join(queries_with_hashtags)
+                for (
+                    section_title,
+                    section_outline,
+                    section_query,
+                ) in self._get_section_tasks(article_with_outline):
                     future_to_sec_title[
                         executor.submit(
-                            self.generate_section,
+                            propagate_context(self.generate_section),
                             topic,
                             section_title,
                             information_table,
                             section_outline,
                             section_query,
-                            graph_mindmap
+                            graph_mindmap,
+                            callback_handler,
+                            article,
                         )
                     ] = section_title
 
+                if streamlit_connection:
+                    # Ensure the streamed sections can be displayed when connecting with Streamlit frontend.
+                    for t in executor._threads:
+                        add_script_run_ctx(t)
+
                 for future in as_completed(future_to_sec_title):
                     section_output_dict_collection.append(future.result())
 
+        return self._assemble_article(topic, article, section_output_dict_collection)
+
+    async def agenerate_article(
+        self,
+        topic: str,
+        information_table: StormInformationTable,
+        article_with_outline: StormArticle,
+        graph_mindmap: str,
+        callback_handler: BaseCallbackHandler = None,
+    ) -> StormArticle:
+        """Asyncio counterpart of `generate_article()`.
+
+        Sections are written in worker threads, at most `max_thread_num` at once.
+        """
+        await asyncio.to_thread(information_table.prepare_table_for_retrieval)
+
+        if article_with_outline is None:
+            article_with_outline = StormArticle(topic_name=topic)
         article = copy.deepcopy(article_with_outline)
+
+        section_tasks = self._get_section_tasks(article_with_outline)
+        if len(article_with_outline.get_first_level_section_names()) == 0:
+            logging.error(
+                f"No outline for {topic}. Will directly search with the topic."
+            )
+            section_tasks = [(topic, "", [topic])]
+
+        semaphore = asyncio.Semaphore(max(self.max_thread_num, 1))
+
+        async def write_section(section_title, section_outline, section_query):
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self.generate_section,
+                    topic,
+                    section_title,
+                    information_table,
+                    section_outline,
+                    section_query,
+                    graph_mindmap,
+                    callback_handler,
+                    article,
+                )
+
+        section_output_dict_collection = await asyncio.gather(
+            *[write_section(*task) for task in section_tasks]
+        )
+        return self._assemble_article(topic, article, section_output_dict_collection)
+
+    @staticmethod
+    def _get_section_tasks(article_with_outline: StormArticle):
+        """Return (section title, section outline, section queries) for each first-level section to write."""
+        section_tasks = []
+        for section_title in article_with_outline.get_first_level_section_names():
+            # We don't want to write a separate introduction section.
+            if section_title.lower().strip() == "introduction":
+                continue
+                # We don't want to write a separate conclusion section.
+            if section_title.lower().strip().startswith(
+                "conclusion"
+            ) or section_title.lower().strip().startswith("summary"):
+                continue
+            section_query = article_with_outline.get_outline_as_list(
+                root_section_name=section_title, add_hashtags=False
+            )
+            queries_with_hashtags = article_with_outline.get_outline_as_list(
+                root_section_name=section_title, add_hashtags=True
+            )
+            section_outline = "\n".join(queries_with_hashtags)
+            section_tasks.append((section_title, section_outline, section_query))
+        return section_tasks
+
+    @staticmethod
+    def _assemble_article(topic, article, section_output_dict_collection):
         for section_output_dict in section_output_dict_collection:
+            # Drop the streamed draft so that it is replaced by the processed section below.
+            article.set_section_draft(section_output_dict["section_name"], "")
             article.update_section(
                 parent_section_name=topic,
                 current_section_content=section_output_dict["section_content"],
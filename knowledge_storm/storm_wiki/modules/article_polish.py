@@ -3,6 +3,7 @@ from typing import Union
 
 import dspy
 
+from .callback import BaseCallbackHandler, stream_section
 from .storm_dataclass import StormArticle
 from ...interface import ArticlePolishingModule
 from ...utils import ArticleTextProcessing
@@ -31,7 +32,11 @@ class StormArticlePolishingModule(ArticlePolishingModule):
         )
 
     def polish_article(
-        self, topic: str, draft_article: StormArticle, remove_duplicate: bool = True
+        self,
+        topic: str,
+        draft_article: StormArticle,
+        remove_duplicate: bool = True,
+        callback_handler: BaseCallbackHandler = None,
     ) -> StormArticle:
         """
         Polish article.
@@ -40,11 +45,16 @@ class StormArticlePolishingModule(ArticlePolishingModule):
             topic (str): The topic of the article.
             draft_article (StormArticle): The draft article.
             remove_duplicate (bool): Whether to use one additional LM call to remove duplicates from the article.
+            callback_handler (BaseCallbackHandler): An optional callback handler. If it sets
+                `stream_section_tokens`, the lead section and the polished page are streamed to it.
         """
 
         article_text = draft_article.to_string()
         polish_result = self.polish_page(
-            topic=topic, draft_page=article_text, polish_whole_page=remove_duplicate
+            topic=topic,
+            draft_page=article_text,
+            polish_whole_page=remove_duplicate,
+            callback_handler=callback_handler,
         )
         polished_article = polish_result.page
         polished_article_dict = ArticleTextProcessing.parse_article_into_dict(
@@ -56,10 +66,11 @@ class StormArticlePolishingModule(ArticlePolishingModule):
         return polished_article
     
     def edit_article(
-        self, polished_article
+        self, polished_article, callback_handler: BaseCallbackHandler = None
     ) -> str:
         edit_result = self.edit_page(
-            polished_page=polished_article.to_string()
+            polished_page=polished_article.to_string(),
+            callback_handler=callback_handler,
         )
         final_article = edit_result.page
         return final_article
@@ -101,9 +112,17 @@ class PolishPageModule(dspy.Module):
         self.write_lead = dspy.Predict(WriteLeadSection)
         self.polish_page = dspy.Predict(PolishPage)
 
-    def forward(self, topic: str, draft_page: str, polish_whole_page: bool = True):
+    def forward(
+        self,
+        topic: str,
+        draft_page: str,
+        polish_whole_page: bool = True,
+        callback_handler: BaseCallbackHandler = None,
+    ):
         # NOTE: Change show_guidelines to false to make the generation more robust to different LM families.
-        with dspy.settings.context(lm=self.write_lead_engine, show_guidelines=False):
+        with dspy.settings.context(
+            lm=self.write_lead_engine, show_guidelines=False
+        ), stream_section(callback_handler, "lead section"):
             lead_section = self.write_lead(
                 topic=topic, draft_page=draft_page
             ).lead_section
@@ -111,7 +130,9 @@ class PolishPageModule(dspy.Module):
                 lead_section = lead_section.split("The lead section:")[1].strip()
         if polish_whole_page:
             # NOTE: Change show_guidelines to false to make the generation more robust to different LM families.
-            with dspy.settings.context(lm=self.polish_engine, show_guidelines=False):
+            with dspy.settings.context(
+                lm=self.polish_engine, show_guidelines=False
+            ), stream_section(callback_handler, "polished article"):
                 page = self.polish_page(draft_page=draft_page).page
         else:
             page = draft_page
@@ -127,7 +148,11 @@ class EditPageModule(dspy.Module):
         self.edit_engine = edit_engine
         self.edit_page = dspy.Predict(EditPage)
 
-    def forward(self, polished_page: str):
-        with dspy.settings.context(lm=self.edit_engine, show_guidelines=False):
+    def forward(
+        self, polished_page: str, callback_handler: BaseCallbackHandler = None
+    ):
+        with dspy.settings.context(
+            lm=self.edit_engine, show_guidelines=False
+        ), stream_section(callback_handler, "edited article"):
             page = self.edit_page(polished_page=polished_page).page
         return dspy.Prediction(page=page)
\ No newline at end of file
@@ -1,6 +1,17 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from ...lm import stream_tokens
+
+
 class BaseCallbackHandler:
     """Base callback handler that can be used to handle callbacks from the STORM pipeline."""
 
+    # If True, the article generation and polishing LMs stream their output and report it through
+    # `on_section_token` / `on_section_partial` (only for LM clients that support streaming).
+    stream_section_tokens = False
+
     def on_identify_perspective_start(self, **kwargs):
         """Run when the perspective identification starts."""
         pass
@@ -32,3 +43,99 @@ class BaseCallbackHandler:
     def on_outline_refinement_end(self, outline: str, **kwargs):
         """Run when the outline refinement finishes."""
         pass
+
+    def on_section_token(self, section_name: str, token: str, **kwargs):
+        """Run when a new piece of text is streamed for a section (or the lead / polished / edited page)."""
+        pass
+
+    def on_section_partial(self, section_name: str, partial_content: str, **kwargs):
+        """Run periodically with the text generated so far for a section. `kwargs` may include the `article`
+        being generated, which already contains the partial content."""
+        pass
+
+
+class SectionTokenStreamer:
+    """Forward the streamed LM output of one section to a callback handler.
+
+    Every piece of text is reported through `on_section_token`. The accumulated text is reported through
+    `on_section_partial` at most once every `min_interval` seconds and once more on `flush()`, so that slow
+    consumers (e.g., a Streamlit page) are not redrawn on every token.
+    """
+
+    def __init__(
+        self,
+        callback_handler: BaseCallbackHandler,
+        section_name: str,
+        min_interval: float = 0.5,
+        on_partial=None,
+    ):
+        """
+        Args:
+            callback_handler: The handler to report to.
+            section_name: The name of the section being generated.
+            min_interval: Minimum number of seconds between two `on_section_partial` calls.
+            on_partial: Optional function called with the partial content before the handler is notified,
+                e.g., to update the article. Its return value is passed to the handler as extra kwargs.
+        """
+        self.callback_handler = callback_handler
+        self.section_name = section_name
+        self.min_interval = min_interval
+        self.on_partial = on_partial
+        self.content = ""
+        self._last_partial_time = 0.0
+        self._reported_length = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, token: str):
+        with self._lock:
+            self.content += token
+            content = self.content
+            should_report = time.time() - self._last_partial_time >= self.min_interval
+            if should_report:
+                self._last_partial_time = time.time()
+                self._reported_length = len(content)
+        self.callback_handler.on_section_token(
+            section_name=self.section_name, token=token
+        )
+        if should_report:
+            self._report(content)
+
+    def flush(self):
+        """Report the final partial content if it has not been reported yet."""
+        with self._lock:
+            content = self.content
+            if len(content) == self._reported_length:
+                return
+            self._reported_length = len(content)
+        self._report(content)
+
+    def _report(self, content: str):
+        extra_kwargs = {}
+        if self.on_partial is not None:
+            extra_kwargs = self.on_partial(content) or {}
+        self.callback_handler.on_section_partial(
+            section_name=self.section_name, partial_content=content, **extra_kwargs
+        )
+
+
+@contextmanager
+def stream_section(
+    callback_handler: BaseCallbackHandler, section_name: str, on_partial=None
+):
+    """Stream the LM calls made in this context to `callback_handler` as the content of `section_name`.
+
+    Does nothing unless the handler sets `stream_section_tokens`. Yields the `SectionTokenStreamer` or None.
+    """
+    if callback_handler is None or not getattr(
+        callback_handler, "stream_section_tokens", False
+    ):
+        yield None
+        return
+    streamer = SectionTokenStreamer(
+        callback_handler=callback_handler,
+        section_name=section_name,
+        on_partial=on_partial,
+    )
+    with stream_tokens(streamer):
+        yield streamer
+    streamer.flush()
@@ -1,99 +1,372 @@
+import hashlib
+import re
 import sys
 import json
-import networkx as nx
-from together import Together
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import threading
+from typing import Dict, List, Optional, Union
+
+import dspy
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from pydantic import Field, BaseModel
 
-class WeightOutput(BaseModel):
-    score: float = Field(description="A score from 0 to 1, 0 meaning the topics are not correlated at all and 1 being the topics are tightly correlated")
+from ...metrics import record_cache_lookup
+from ...tracing import add_to_current_span, span
+
+# networkx, sklearn, scipy, matplotlib and sentence_transformers are slow to import, so they are imported where they
+# are used.
+
+
+class SummarizePassage(dspy.Signature):
+    """Summarize the passage into a key topic or concept."""
+
+    passage = dspy.InputField(prefix="Passage:\n", format=str)
+    topic = dspy.OutputField(prefix="Key topic or concept:", format=str)
+
+
+class ScoreTopicRelatedness(dspy.Signature):
+    """Evaluate how related the new topic is to each of the existing topics on a scale of 0 to 1, 0 meaning the topics are not correlated at all and 1 being the topics are tightly correlated.
+    Give one line per existing topic in the following format:
+    [1]: score
+    [2]: score
+    ...
+    """
+
+    topic = dspy.InputField(prefix="New topic: ", format=str)
+    candidates = dspy.InputField(prefix="Existing topics:\n", format=str)
+    scores = dspy.OutputField(format=str)
+
+
+_sentence_transformers = {}
+_sentence_transformers_lock = threading.Lock()
+
+
+def load_sentence_transformer(model_name):
+    """Load a sentence transformer once per process, it is shared by all the mindmaps and information tables."""
+    with _sentence_transformers_lock:
+        if model_name not in _sentence_transformers:
+            from sentence_transformers import SentenceTransformer
+
+            _sentence_transformers[model_name] = SentenceTransformer(model_name)
+        return _sentence_transformers[model_name]
+
+
+class TopicIndex:
+    """Incremental similarity index over the topics of a mindmap.
+
+    Adding a topic only encodes that topic:
+    - "tfidf": topics are tokenized with a HashingVectorizer (same tokenization as TfidfVectorizer) and the document
+      frequencies are updated in place. The TF-IDF weighted matrix is rebuilt lazily, at most once per query after
+      new topics were added, in time linear in the number of stored terms.
+    - "embedding": the normalized float32 embedding of the new topic is appended to a preallocated matrix.
+    The similarities against all topics are computed with one matrix-vector product.
+    """
+
+    N_FEATURES = 2**18
+
+    def __init__(self, method="tfidf", embedding_model_name="paraphrase-MiniLM-L6-v2"):
+        self.method = method
+        self.embedding_model_name = embedding_model_name
+        self.embedding_model = None
+        self.topics = []
+        self.positions = {}
+        # "tfidf" state.
+        self._vectorizer = None
+        self._df = np.zeros(self.N_FEATURES, dtype=np.int32)
+        self._term_indices = []
+        self._term_counts = []
+        self._tfidf_matrix = None
+        # "embedding" state.
+        self._embeddings = None
+
+    def __len__(self):
+        return len(self.topics)
+
+    def __contains__(self, topic):
+        return topic in self.positions
+
+    def _get_vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            self._vectorizer = HashingVectorizer(
+                n_features=self.N_FEATURES, alternate_sign=False, norm=None
+            )
+        return self._vectorizer
+
+    def _get_embedding_model(self):
+        if self.embedding_model is None:
+            self.embedding_model = load_sentence_transformer(self.embedding_model_name)
+        return self.embedding_model
+
+    def encode(self, texts):
+        """Encode texts into L2-normalized float32 embeddings."""
+        with span("encode", "embedding", num_texts=len(texts)):
+            embeddings = np.asarray(
+                self._get_embedding_model().encode(texts, show_progress_bar=False),
+                dtype=np.float32,
+            )
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def add(self, topic, embedding=None):
+        """Add a topic; with the "embedding" method, `embedding` (from `encode()`) avoids encoding it again."""
+        if topic in self.positions:
+            return
+        self.positions[topic] = len(self.topics)
+        self.topics.append(topic)
+        if self.method == "tfidf":
+            counts = self._get_vectorizer().transform([topic])
+            self._term_indices.append(counts.indices.astype(np.int32))
+            self._term_counts.append(counts.data.astype(np.float32))
+            self._df[counts.indices] += 1
+            self._tfidf_matrix = None
+        else:
+            self._append_embedding(
+                self.encode([topic])[0] if embedding is None else embedding
+            )
+
+    def _append_embedding(self, embedding):
+        n = len(self.topics)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((16, embedding.shape[0]), dtype=np.float32)
+        elif n > self._embeddings.shape[0]:
+            # Grow geometrically so that appending stays amortized O(1).
+            grown = np.zeros(
+                (2 * self._embeddings.shape[0], self._embeddings.shape[1]),
+                dtype=np.float32,
+            )
+            grown[: self._embeddings.shape[0]] = self._embeddings
+            self._embeddings = grown
+        self._embeddings[n - 1] = embedding
+
+    def _idf(self):
+        # Same smoothing as TfidfVectorizer(smooth_idf=True).
+        n = len(self.topics)
+        return (np.log((1 + n) / (1 + self._df)) + 1).astype(np.float32)
+
+    def _get_tfidf_matrix(self, idf):
+        if self._tfidf_matrix is None:
+            from scipy.sparse import csr_matrix
+
+            indptr = np.zeros(len(self.topics) + 1, dtype=np.int64)
+            np.cumsum([len(i) for i in self._term_indices], out=indptr[1:])
+            indices = np.concatenate(self._term_indices)
+            data = np.concatenate(self._term_counts) * idf[indices]
+            # Topics without any token have an empty row, reduceat must not be given their offsets.
+            row_norms = np.zeros(len(self.topics), dtype=np.float32)
+            non_empty = np.diff(indptr) > 0
+            row_norms[non_empty] = np.sqrt(
+                np.add.reduceat(data**2, indptr[:-1][non_empty])
+            )
+            data /= np.repeat(np.maximum(row_norms, 1e-12), np.diff(indptr))
+            self._tfidf_matrix = csr_matrix(
+                (data, indices, indptr), shape=(len(self.topics), self.N_FEATURES)
+            )
+        return self._tfidf_matrix
+
+    def similarities(self, text, embedding=None):
+        """Return the cosine similarities between `text` and all topics, in insertion order."""
+        if not self.topics:
+            return np.zeros(0, dtype=np.float32)
+        if self.method != "tfidf":
+            if embedding is None:
+                embedding = self.encode([text])[0]
+            return self._embeddings[: len(self.topics)] @ embedding
+        idf = self._idf()
+        query = self._get_vectorizer().transform([text])
+        # Like a TfidfVectorizer fitted on the topics, ignore the terms that no topic contains.
+        known = self._df[query.indices] > 0
+        indices = query.indices[known]
+        values = query.data[known].astype(np.float32) * idf[indices]
+        norm = np.linalg.norm(values)
+        if norm == 0:
+            return np.zeros(len(self.topics), dtype=np.float32)
+        query_vector = np.zeros(self.N_FEATURES, dtype=np.float32)
+        query_vector[indices] = values / norm
+        return np.asarray(self._get_tfidf_matrix(idf) @ query_vector).ravel()
+
 
 class MindmapGraph:
-    def __init__(self, method="tfidf"):
-        # Initialize Together API
-        self.together = Together()
+    """Mindmap of the information collected in one conversation.
+
+    A MindmapGraph is not thread-safe: each persona conversation builds its own and `MindmapGraph.merge()` combines
+    them once the conversations are over.
+    """
+
+    def __init__(
+        self,
+        method="tfidf",
+        lm: Optional[Union[dspy.dsp.LM, dspy.dsp.HFModel]] = None,
+        summary_cache: Optional[Dict[str, str]] = None,
+        max_llm_candidates: int = 10,
+    ):
+        """
+        Args:
+            method: How to weight the edges between topics: "tfidf" or "embedding" similarity, or "llm" scores.
+            lm: LM used to summarize passages and, with the "llm" method, to score the topics. Defaults to the LM
+                configured in dspy.settings.
+            summary_cache: Cache of passage summaries keyed by the hash of the passage. Can be shared by several
+                mindmaps (e.g., one per persona conversation) since the same passage gets the same summary.
+            max_llm_candidates: With the "llm" method, number of most similar topics (by embedding) scored by the LM
+                for each new topic.
+        """
+        import networkx as nx
+
+        self.lm = lm
+        self.summary_cache = summary_cache if summary_cache is not None else {}
+        self.max_llm_candidates = max_llm_candidates
+        self.summarize = dspy.Predict(SummarizePassage)
+        self.score_topics = dspy.Predict(ScoreTopicRelatedness)
 
         # Initialize two empty graphs
         self.G = nx.Graph()  # Complete graph with full passages
         self.G_summaries = nx.Graph()  # Graph for LLM with summaries
 
-        # Initialize an empty list for topics and an empty TfidfVectorizer
-        self.topics_list = []
-        self.vectorizer = TfidfVectorizer()
-        self.embedding_model = SentenceTransformer('paraphrase-MiniLM-L6-v2')  # Load sentence transformer for embeddings
-
-        # Cache for tf-idf vectors of topics and embeddings
-        self.tfidf_cache = {}
-        self.embedding_cache = {}
+        # Topics are indexed incrementally, so adding a topic doesn't re-encode the previous ones.
+        # With the "llm" method, the embeddings prefilter the topics worth scoring with the LM.
+        self.index = TopicIndex(method="tfidf" if method == "tfidf" else "embedding")
 
         # Method for weight computation
         self.method = method
 
-    def refit_vectorizer(self):
-        if self.topics_list:
-            self.vectorizer.fit(self.topics_list)
-            self.tfidf_cache = {topic: self.vectorizer.transform([topic]) for topic in self.topics_list}
+        # Incremented on every change of the graphs, used to invalidate the cached JSON and rendering.
+        self.version = 0
+        self._json = None
+        self._json_version = -1
+        self._prompt_cache = {}
+        self._prompt_cache_version = -1
+        self._layout = {}
+        self._layout_version = -1
+        self._rendered = {}
+        self._render_lock = threading.Lock()
+
+    @property
+    def topics_list(self):
+        return self.index.topics
 
-    def update_embedding_cache(self):
-        if self.topics_list:
-            self.embedding_cache = {topic: self.embedding_model.encode([topic])[0] for topic in self.topics_list}
+    @staticmethod
+    def _add_weighted_edge(graph, u, v, weight):
+        if graph.has_edge(u, v):
+            weight = max(weight, graph[u][v]["weight"])
+        graph.add_edge(u, v, weight=weight)
+
+    @classmethod
+    def merge(cls, mindmaps, threshold=0.3):
+        """Merge the mindmaps of several conversations into a new mindmap.
+
+        Nodes with the same topic are combined (their passages are concatenated) and parallel edges keep the largest
+        weight. With the "tfidf" and "embedding" methods, the topics of each mindmap are also related to the topics of
+        the previously merged mindmaps, as if all passages had been added to a single mindmap. With the "llm" method,
+        only the existing edges are kept since relating the topics would take one LM call per topic.
+
+        Args:
+            mindmaps: The mindmaps to merge, in a deterministic order (e.g., the order of the personas).
+            threshold: Minimum weight of the edges added between topics of different mindmaps.
+
+        Returns:
+            The merged MindmapGraph; the input mindmaps are not modified.
+        """
+        method = mindmaps[0].method if mindmaps else "tfidf"
+        merged = (
+            cls(
+                method=method,
+                lm=mindmaps[0].lm,
+                summary_cache=mindmaps[0].summary_cache,
+                max_llm_candidates=mindmaps[0].max_llm_candidates,
+            )
+            if mindmaps
+            else cls(method=method)
+        )
+        for mindmap in mindmaps:
+            new_topics = [t for t in mindmap.topics_list if t not in merged.index]
+            # Relate the new topics before indexing them so that only topics from other mindmaps are candidates;
+            # edges within a mindmap are copied below.
+            cross_connections = {
+                topic: (
+                    merged.relate_passage_to_topics(topic, threshold=threshold)
+                    if method in ("tfidf", "embedding")
+                    else []
+                )
+                for topic in new_topics
+            }
+            for target, source in (
+                (merged.G, mindmap.G),
+                (merged.G_summaries, mindmap.G_summaries),
+            ):
+                for node, data in source.nodes(data=True):
+                    if node not in target:
+                        target.add_node(node, passages=[])
+                    target.nodes[node]["passages"].extend(data.get("passages", []))
+                for u, v, data in source.edges(data=True):
+                    cls._add_weighted_edge(target, u, v, data["weight"])
+                for topic, connections in cross_connections.items():
+                    for conn in connections:
+                        cls._add_weighted_edge(
+                            target, topic, conn["topic"], conn["weight"]
+                        )
+            for topic in new_topics:
+                merged.index.add(topic)
+        merged.version += 1
+        return merged
 
     def add_to_graph(self, graph, topic_summary, connections, full_passage=None):
-        if topic_summary not in self.tfidf_cache:
+        if topic_summary not in graph:
             graph.add_node(topic_summary, passages=[])
-            self.topics_list.append(topic_summary)
-            self.refit_vectorizer()
-            self.update_embedding_cache()
+        self.index.add(topic_summary)
 
         for conn in connections:
-            graph.add_edge(topic_summary, conn['topic'], weight=conn['weight'])
+            graph.add_edge(topic_summary, conn["topic"], weight=conn["weight"])
 
         if full_passage:
-            graph.nodes[topic_summary]['passages'].append(full_passage)
+            graph.nodes[topic_summary]["passages"].append(full_passage)
+        self.version += 1
+
+    def _lm_context(self):
+        return dspy.settings.context(lm=self.lm or dspy.settings.lm)
+
+    @staticmethod
+    def passage_key(passage):
+        """Key of a passage in `summary_cache`."""
+        return hashlib.sha256(passage.encode("utf-8")).hexdigest()
 
     def summarize_passage(self, passage):
-        summary_response = self.together.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "Summarize the passage into a key topic or concept."},
-                {"role": "user", "content": passage},
-            ],
-            model="meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
-        )
-        return summary_response.choices[0].message.content.strip() if summary_response.choices else None
+        key = self.passage_key(passage)
+        record_cache_lookup("passage_summary", hit=key in self.summary_cache)
+        if key in self.summary_cache:
+            add_to_current_span(cache_hits=1)
+        else:
+            with self._lm_context():
+                summary = self.summarize(passage=passage).topic.strip()
+            if not summary:
+                return None
+            self.summary_cache[key] = summary
+        return self.summary_cache[key]
 
-    def compute_weight(self, passage_summary, topic):
-        if self.method == "tfidf":
-            passage_vector = self.vectorizer.transform([passage_summary])
-            weight = float(cosine_similarity(passage_vector, self.tfidf_cache[topic])[0][0])
+    def score_with_lm(self, passage_summary, topics: List[str]) -> List[float]:
+        """Score the relatedness of `passage_summary` to all `topics` with a single LM call.
 
-        elif self.method == "embedding":
-            passage_embedding = self.embedding_model.encode([passage_summary])[0]
-            topic_embedding = self.embedding_cache[topic]
-            weight = float(np.dot(passage_embedding, topic_embedding) / (np.linalg.norm(passage_embedding) * np.linalg.norm(topic_embedding)))
+        Topics the LM did not score get -1 so that they are never connected.
+        """
+        if not topics:
+            return []
+        candidates = "\n".join(f"[{i + 1}]: {topic}" for i, topic in enumerate(topics))
+        with self._lm_context():
+            output = self.score_topics(
+                topic=passage_summary, candidates=candidates
+            ).scores
+        scores = [-1.0] * len(topics)
+        for index, score in re.findall(r"\[(\d+)\]\s*:?\s*([01](?:\.\d+)?)", output):
+            if 0 < int(index) <= len(topics):
+                scores[int(index) - 1] = float(score)
+        return scores
 
+    def compute_weight(self, passage_summary, topic):
+        if self.method in ("tfidf", "embedding"):
+            if topic not in self.index:
+                return -1
+            similarities = self.index.similarities(passage_summary)
+            weight = float(similarities[self.index.positions[topic]])
         elif self.method == "llm":
-            score_response = self.together.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "Evaluate how related the two topics are on a scale of 0 to 1."},
-                    {"role": "user", "content": f"Topic 1: {passage_summary}\nTopic 2: {topic}"},
-                ],
-                model="meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo",
-                response_format={
-                    "type": "json_object",
-                    "schema": WeightOutput.model_json_schema(),
-                },
-            )
-            if score_response.choices:
-                response_data = json.loads(score_response.choices[0].message.content.strip())
-                weight = float(response_data["score"])
-            else:
-                weight = -1
+            weight = self.score_with_lm(passage_summary, [topic])[0]
         else:
             weight = -1
         return weight
@@ -101,12 +374,240 @@ class MindmapGraph:
     def relate_passage_to_topics(self, passage_summary, threshold=0.3):
         if not self.topics_list:
             return []
-        related_topics = []
-        for topic in self.topics_list:
-            weight = self.compute_weight(passage_summary, topic)
-            if weight >= threshold:
-                related_topics.append({"topic": topic, "weight": weight})
-        return related_topics
+        # One vectorized pass over all topics instead of a similarity computation per topic.
+        similarities = self.index.similarities(passage_summary)
+        if self.method == "llm":
+            # Only the most similar topics are scored by the LM, all in the same call.
+            candidates = [
+                i
+                for i in np.argsort(-similarities)[: self.max_llm_candidates + 1]
+                if self.topics_list[i] != passage_summary
+            ][: self.max_llm_candidates]
+            weights = np.full(len(self.topics_list), -1.0)
+            weights[candidates] = self.score_with_lm(
+                passage_summary, [self.topics_list[i] for i in candidates]
+            )
+        elif self.method in ("tfidf", "embedding"):
+            weights = similarities
+        else:
+            weights = np.full(len(self.topics_list), -1.0)
+        return [
+            {"topic": topic, "weight": float(weight)}
+            for topic, weight in zip(self.topics_list, weights)
+            # A passage summarized into an existing topic is not related to itself.
+            if weight >= threshold and topic != passage_summary
+        ]
+
+    def to_json(self):
+        """Return the summary graph in node-link JSON format, cached until the graph changes."""
+        import networkx as nx
+
+        if self._json_version != self.version:
+            graph_data = nx.readwrite.json_graph.node_link_data(
+                self.G_summaries, edges="edges"
+            )
+            self._json = json.dumps(graph_data, indent=2)
+            self._json_version = self.version
+        return self._json
+
+    def to_dict(self):
+        """Return both graphs, with their passages, in node-link format; `from_dict()` restores the mindmap."""
+        import networkx as nx
+
+        return {
+            "method": self.method,
+            "graph": nx.readwrite.json_graph.node_link_data(self.G, edges="edges"),
+            "summary_graph": nx.readwrite.json_graph.node_link_data(
+                self.G_summaries, edges="edges"
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data, lm=None, summary_cache=None):
+        """Restore a mindmap saved with `to_dict()`."""
+        import networkx as nx
+
+        mindmap = cls(method=data["method"], lm=lm, summary_cache=summary_cache)
+        mindmap.G = nx.readwrite.json_graph.node_link_graph(data["graph"], edges="edges")
+        mindmap.G_summaries = nx.readwrite.json_graph.node_link_graph(
+            data["summary_graph"], edges="edges"
+        )
+        for topic in mindmap.G_summaries.nodes:
+            mindmap.index.add(topic)
+        mindmap.version += 1
+        return mindmap
+
+    @staticmethod
+    def _estimate_tokens(text):
+        # About 4 characters per token for English text; avoids loading a tokenizer for every prompt.
+        return len(text) // 4 + 1
+
+    def to_prompt(self, max_tokens=1000, top_k=5, min_weight=0.3, max_topic_words=20):
+        """Serialize the summary graph into a compact adjacency list to be used in prompts.
+
+        Unlike `to_json()`, the output stays within a token budget as the graph grows:
+        - Topics are numbered once and edges refer to the numbers, each edge is listed once.
+        - Only the `top_k` heaviest edges of each topic with a weight of at least `min_weight` are kept.
+        - Topics are sorted by weighted degree and the least connected ones are dropped when the budget is reached.
+        The result is cached until the graph changes.
+
+        Args:
+            max_tokens: Approximate maximum number of tokens of the output.
+            top_k: Maximum number of edges kept per topic.
+            min_weight: Edges with a lower weight are dropped.
+            max_topic_words: Topics are truncated to this number of words.
+
+        Returns:
+            The serialized mindmap, e.g.,
+                Topics:
+                [1] Topic A
+                [2] Topic B
+                Related topics ([topic]: [related topic] weight):
+                [1]: [2] 0.72
+        """
+        key = (max_tokens, top_k, min_weight, max_topic_words)
+        if self._prompt_cache_version != self.version:
+            self._prompt_cache = {}
+            self._prompt_cache_version = self.version
+        if key in self._prompt_cache:
+            return self._prompt_cache[key]
+
+        graph = self.G_summaries
+        kept_edges = {}
+        for node in graph.nodes:
+            neighbors = sorted(
+                (
+                    (data["weight"], neighbor)
+                    for neighbor, data in graph[node].items()
+                    if data["weight"] >= min_weight
+                ),
+                key=lambda x: -x[0],
+            )[:top_k]
+            for weight, neighbor in neighbors:
+                kept_edges[frozenset((node, neighbor))] = weight
+        strength = {node: 0.0 for node in graph.nodes}
+        for edge, weight in kept_edges.items():
+            for node in edge:
+                strength[node] += weight
+        ranked = sorted(graph.nodes, key=lambda n: -strength[n])
+
+        topic_lines, budget = [], max_tokens - self._estimate_tokens("Topics:")
+        numbers = {}
+        for node in ranked:
+            words = str(node).split()
+            topic = " ".join(words[:max_topic_words]) + (
+                " ..." if len(words) > max_topic_words else ""
+            )
+            line = f"[{len(numbers) + 1}] {topic}"
+            if self._estimate_tokens(line) > budget:
+                break
+            budget -= self._estimate_tokens(line)
+            numbers[node] = len(numbers) + 1
+            topic_lines.append(line)
+
+        header = "Related topics ([topic]: [related topic] weight):"
+        budget -= self._estimate_tokens(header)
+        edge_lines = []
+        for node in ranked:
+            if node not in numbers:
+                break
+            related = [
+                (kept_edges[frozenset((node, neighbor))], numbers[neighbor])
+                for neighbor in graph[node]
+                # List each edge once, at the topic with the smaller number.
+                if frozenset((node, neighbor)) in kept_edges
+                and numbers.get(neighbor, 0) > numbers[node]
+            ]
+            if not related:
+                continue
+            line = f"[{numbers[node]}]: " + ", ".join(
+                f"[{number}] {weight:.2f}"
+                for weight, number in sorted(related, key=lambda x: -x[0])
+            )
+            if self._estimate_tokens(line) > budget:
+                break
+            budget -= self._estimate_tokens(line)
+            edge_lines.append(line)
+
+        if not topic_lines:
+            prompt = "N/A"
+        else:
+            prompt = "\n".join(
+                ["Topics:"]
+                + topic_lines
+                + ([header] + edge_lines if edge_lines else [])
+            )
+        self._prompt_cache[key] = prompt
+        return prompt
+
+    def render(self, path, layout_iterations=50):
+        """Draw the complete graph with its edge weights and save it to `path`.
+
+        Rendering is not part of passage processing; call this when the picture is actually needed (e.g., from the
+        frontend). The layout of the previous call is reused as the starting point, so nodes keep their positions
+        and only a few layout iterations are needed for the nodes added in between. Rendering the same graph version
+        to the same path again is a no-op.
+
+        Args:
+            path: Image path, the format is inferred from the extension by matplotlib.
+            layout_iterations: Number of spring layout iterations when there is no previous layout to start from.
+
+        Returns:
+            The path of the image.
+        """
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
+        with self._render_lock:
+            if self._rendered.get(path) == self.version:
+                return path
+            if self._layout_version != self.version:
+                initial_pos = {n: p for n, p in self._layout.items() if n in self.G}
+                self._layout = (
+                    nx.spring_layout(
+                        self.G,
+                        pos=initial_pos or None,
+                        iterations=(
+                            max(5, layout_iterations // 5)
+                            if initial_pos
+                            else layout_iterations
+                        ),
+                        seed=0,
+                    )
+                    if len(self.G)
+                    else {}
+                )
+                self._layout_version = self.version
+            fig, ax = plt.subplots(figsize=(12, 12))
+            try:
+                nx.draw(
+                    self.G,
+                    self._layout,
+                    ax=ax,
+                    with_labels=True,
+                    node_color="lightblue",
+                    edge_color="gray",
+                    font_size=10,
+                )
+                edge_labels = {
+                    edge: f"{weight:.2f}"
+                    for edge, weight in nx.get_edge_attributes(self.G, "weight").items()
+                }
+                nx.draw_networkx_edge_labels(
+                    self.G,
+                    self._layout,
+                    edge_labels=edge_labels,
+                    font_color="red",
+                    ax=ax,
+                )
+                fig.savefig(path, bbox_inches="tight")
+            finally:
+                plt.close(fig)
+            self._rendered[path] = self.version
+        return path
 
     def process_passage(self, passage):
         topic_summary = self.summarize_passage(passage)
@@ -114,11 +615,4 @@ class MindmapGraph:
             connections = self.relate_passage_to_topics(topic_summary)
             self.add_to_graph(self.G, topic_summary, connections, full_passage=passage)
             self.add_to_graph(self.G_summaries, topic_summary, connections)
-        pos = nx.spring_layout(self.G)
-        nx.draw(self.G, pos, with_labels=True, node_color="lightblue", edge_color="gray", font_size=10)
-        edge_labels = nx.get_edge_attributes(self.G, 'weight')
-        nx.draw_networkx_edge_labels(self.G, pos, edge_labels=edge_labels, font_color="red")
-        plt.close()
-        graph_data = nx.readwrite.json_graph.node_link_data(self.G_summaries, edges="edges")
-        graph_mindmap = json.dumps(graph_data, indent=2)
-        return graph_mindmap
\ No newline at end of file
+        return self.to_prompt()
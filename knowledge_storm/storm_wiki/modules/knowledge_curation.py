@@ -1,8 +1,13 @@
+import asyncio
 import concurrent.futures
+import copy
+import json
 import logging
 import os
+import re
+import threading
 from concurrent.futures import as_completed
-from typing import Union, List, Tuple, Optional, Dict
+from typing import Union, List, Tuple, Optional, Dict, Iterator
 
 import dspy
 
@@ -10,8 +15,9 @@ from .callback import BaseCallbackHandler
 from .persona_generator import StormPersonaGenerator
 from .storm_dataclass import DialogueTurn, StormInformationTable
 from ...interface import KnowledgeCurationModule, Retriever, Information
+from ...tracing import propagate_context
 from ...utils import ArticleTextProcessing
-from .graph import MindmapGraph
+from .graph import MindmapGraph, TopicIndex
 
 try:
     from streamlit.runtime.scriptrunner import add_script_run_ctx
@@ -23,6 +29,208 @@ except ImportError as err:
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
 
+class ConversationJournal:
+    """Append-only JSONL journal of the knowledge curation stage, used to resume it after a crash.
+
+    Each line is one of the following records:
+    - {"topic": ..., "run_args": {...}}: the first line; a journal of another topic or of a run with other
+      arguments (e.g., another number of turns or other models) is discarded.
+    - {"persona": ...}: a considered persona, journaled before its conversation starts. The personas are in the
+      order in which they were produced.
+    - {"personas_end": true}: all the considered personas were produced.
+    - {"opening_turn": ...}: the first turn shared by all the conversations.
+    - {"perspective": ..., "dlg_turn": ..., "summary": ...}: a completed turn of a conversation with the mindmap
+      summary of its answer.
+    - {"perspective": ..., "finished": true}: the conversation is over.
+    A line truncated by a crash is ignored.
+    """
+
+    def __init__(self, path: str, topic: str, run_args: Optional[Dict] = None):
+        self.path = path
+        self.topic = topic
+        # Compared with the JSON of the journal, so tuples and lists are the same.
+        self.run_args = json.loads(json.dumps(run_args or {}))
+        self._lock = threading.Lock()
+        self.personas: List[str] = []
+        self.personas_complete = False
+        self.opening_turn: Optional[Dict] = None
+        self.turns: Dict[str, List[Dict]] = {}
+        self.finished = set()
+        self.summaries: Dict[str, str] = {}
+
+        records = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        if (
+            not records
+            or records[0].get("topic") != topic
+            or records[0].get("run_args", {}) != self.run_args
+        ):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"topic": topic, "run_args": self.run_args}) + "\n")
+            return
+        for record in records[1:]:
+            if "persona" in record:
+                self.personas.append(record["persona"])
+            elif record.get("personas_end"):
+                self.personas_complete = True
+            elif "opening_turn" in record:
+                self.opening_turn = record["opening_turn"]
+            elif record.get("finished"):
+                self.finished.add(record["perspective"])
+            elif "dlg_turn" in record:
+                self.turns.setdefault(record["perspective"], []).append(
+                    record["dlg_turn"]
+                )
+                if record.get("summary"):
+                    key = MindmapGraph.passage_key(
+                        record["dlg_turn"]["agent_utterance"]
+                    )
+                    self.summaries[key] = record["summary"]
+        # Start the next record on a new line if the last one was truncated.
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        logging.info(
+            f"Resuming knowledge curation from {path}: "
+            f"{sum(len(t) for t in self.turns.values())} turns, {len(self.finished)} finished conversations."
+        )
+
+    def _append(self, record: Dict):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_persona(self, persona: str):
+        self.personas.append(persona)
+        self._append({"persona": persona})
+
+    def record_personas_end(self):
+        self.personas_complete = True
+        self._append({"personas_end": True})
+
+    def record_opening_turn(self, dlg_turn: DialogueTurn):
+        self.opening_turn = dlg_turn.log()
+        self._append({"opening_turn": self.opening_turn})
+
+    def record_turn(self, persona: str, dlg_turn: DialogueTurn, summary: Optional[str]):
+        self._append(
+            {"perspective": persona, "dlg_turn": dlg_turn.log(), "summary": summary}
+        )
+
+    def record_finished(self, persona: str):
+        self._append({"perspective": persona, "finished": True})
+
+    def get_opening_turn(self) -> Optional[DialogueTurn]:
+        return (
+            DialogueTurn(**copy.deepcopy(self.opening_turn))
+            if self.opening_turn
+            else None
+        )
+
+    def get_turns(self, persona: str) -> List[DialogueTurn]:
+        """Return new DialogueTurn objects for the completed turns of `persona`."""
+        return [DialogueTurn(**copy.deepcopy(t)) for t in self.turns.get(persona, [])]
+
+
+class _DeferredCallbackHandler:
+    """Hold back the callbacks of the conversations until `release()`.
+
+    The conversations start while the personas are still being produced, but the callback handler expects
+    `on_identify_perspective_end` and `on_information_gathering_start` before the first dialogue turn.
+    """
+
+    def __init__(self, callback_handler: BaseCallbackHandler):
+        self._callback_handler = callback_handler
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._callback_handler, name)
+        if not name.startswith("on_"):
+            return attr
+
+        def callback(*args, **kwargs):
+            with self._lock:
+                if self._pending is not None:
+                    self._pending.append((attr, args, kwargs))
+                    return
+            attr(*args, **kwargs)
+
+        return callback
+
+    def release(self):
+        """Run the held back callbacks in order; later callbacks are run immediately."""
+        with self._lock:
+            for attr, args, kwargs in self._pending:
+                attr(*args, **kwargs)
+            self._pending = None
+
+
+class NoveltyTracker:
+    """Measure how much new information each turn of a conversation brings.
+
+    The information gain of a turn is the average of:
+    - the fraction of its search results with a URL not seen in the previous turns,
+    - the fraction of its snippets whose cosine similarity to every previous snippet is below `similarity_threshold`,
+    - 1 if it added a node to the mindmap, 0 otherwise.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.9):
+        self.similarity_threshold = similarity_threshold
+        self.seen_urls = set()
+        self.snippet_index = TopicIndex(method="embedding")
+        self.num_mindmap_nodes = 0
+
+    def update(self, dlg_turn: DialogueTurn, mindmap: MindmapGraph) -> Dict:
+        """Record a turn and return its novelty statistics."""
+        results = dlg_turn.search_results or []
+        urls = {r.url for r in results}
+        new_urls = urls - self.seen_urls
+        self.seen_urls |= urls
+
+        snippets = list(dict.fromkeys(s for r in results for s in r.snippets))
+        new_snippets = 0
+        if snippets:
+            for snippet, embedding in zip(
+                snippets, self.snippet_index.encode(snippets)
+            ):
+                similarities = self.snippet_index.similarities(
+                    snippet, embedding=embedding
+                )
+                if (
+                    len(similarities) == 0
+                    or similarities.max() < self.similarity_threshold
+                ):
+                    new_snippets += 1
+                self.snippet_index.add(snippet, embedding=embedding)
+
+        new_nodes = len(mindmap.topics_list) - self.num_mindmap_nodes
+        self.num_mindmap_nodes = len(mindmap.topics_list)
+
+        gain = (
+            len(new_urls) / max(len(urls), 1)
+            + new_snippets / max(len(snippets), 1)
+            + min(new_nodes, 1)
+        ) / 3
+        return {
+            "new_urls": len(new_urls),
+            "urls": len(urls),
+            "new_snippets": new_snippets,
+            "snippets": len(snippets),
+            "new_mindmap_nodes": new_nodes,
+            "information_gain": gain,
+        }
+
+
 class ConvSimulator(dspy.Module):
     """Simulate a conversation between a recent news article writer with specific persona and an expert."""
 
@@ -34,9 +242,33 @@ class ConvSimulator(dspy.Module):
         max_search_queries_per_turn: int,
         search_top_k: int,
         max_turn: int,
+        mindmap_method: str = "tfidf",
+        mindmap_lm: Optional[Union[dspy.dsp.LM, dspy.dsp.HFModel]] = None,
+        min_information_gain: float = 0.0,
+        novelty_similarity_threshold: float = 0.9,
+        questions_per_round: int = 1,
+        max_thread_num: int = 10,
     ):
         super().__init__()
-        self.graph_processor = MindmapGraph(method="tfidf")
+        # With more than one question per round, the question asker proposes several questions at once and the
+        # expert answers them concurrently, so the conversation takes fewer sequential rounds. The answers of all
+        # rounds and personas share one pool of `max_thread_num` threads.
+        self.questions_per_round = max(questions_per_round, 1)
+        self.expert_executor = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(max_thread_num, 1), thread_name_prefix="topic-expert"
+            )
+            if self.questions_per_round > 1
+            else None
+        )
+        # A conversation ends when a turn brings less information than this (see NoveltyTracker); 0 disables it.
+        self.min_information_gain = min_information_gain
+        self.novelty_similarity_threshold = novelty_similarity_threshold
+        # The same ConvSimulator runs the conversations of all personas concurrently, so the mindmap is not an
+        # attribute: each call to forward() builds its own. The passage summaries are shared.
+        self.mindmap_method = mindmap_method
+        self.mindmap_lm = mindmap_lm or topic_expert_engine
+        self.mindmap_summary_cache = {}
         self.wiki_writer = WikiWriter(engine=question_asker_engine)
         self.topic_expert = TopicExpert(
             engine=topic_expert_engine,
@@ -45,7 +277,50 @@ class ConvSimulator(dspy.Module):
             retriever=retriever,
         )
         self.max_turn = max_turn
-        self.graph_mindmap = {}
+
+    def opening_turn(self, topic: str, ground_truth_url: str) -> DialogueTurn:
+        """Ask the fixed first question of every conversation. It doesn't depend on the persona, so
+        `StormKnowledgeCurationModule` computes it once per topic and shares it with all the persona conversations.
+        """
+        # Topics are formatted as "Recent News about X" (see storm_use.py).
+        subject = topic.split("Recent News about ")[-1].strip()
+        user_utterance = f"What are the most recent and relevant news or controversies about {subject}?"
+        expert_output = self.topic_expert(
+            topic=topic, question=user_utterance, ground_truth_url=ground_truth_url
+        )
+        return DialogueTurn(
+            agent_utterance=expert_output.answer,
+            user_utterance=user_utterance,
+            search_queries=expert_output.queries,
+            search_results=expert_output.searched_results,
+        )
+
+    def _ask_topic_expert(
+        self, topic: str, questions: List[str], ground_truth_url: str
+    ) -> List[dspy.Prediction]:
+        """Answer the questions of a round concurrently, the answers are in the order of the questions."""
+        if len(questions) == 1:
+            return [
+                self.topic_expert(
+                    topic=topic,
+                    question=questions[0],
+                    ground_truth_url=ground_truth_url,
+                )
+            ]
+        futures = [
+            self.expert_executor.submit(
+                propagate_context(self.topic_expert),
+                topic=topic,
+                question=question,
+                ground_truth_url=ground_truth_url,
+            )
+            for question in questions
+        ]
+        if streamlit_connection:
+            # Ensure the logging context is correct when connecting with Streamlit frontend.
+            for t in self.expert_executor._threads:
+                add_script_run_ctx(t)
+        return [future.result() for future in futures]
 
     def forward(
         self,
@@ -53,45 +328,93 @@ class ConvSimulator(dspy.Module):
         persona: str,
         ground_truth_url: str,
         callback_handler: BaseCallbackHandler,
+        opening_turn: Optional[DialogueTurn] = None,
+        journal: Optional[ConversationJournal] = None,
     ):
         """
         topic: The topic to research.
         persona: The persona of the recent news article writer.
         ground_truth_url: The ground_truth_url will be excluded from search to avoid ground truth leakage in evaluation.
+        opening_turn: The result of `opening_turn()` if it was already computed; it is copied, not modified.
+        journal: If given, each completed turn is recorded in it and the conversation resumes from the turns it
+            already contains for this persona.
+
+        Returns a prediction with the dialogue history (`dlg_history`) and the mindmap built from the expert answers
+        of this conversation (`mindmap`).
         """
         dlg_history: List[DialogueTurn] = []
-        for iter in range(self.max_turn):
-            if iter == 0:
-                def extract_topic(text):
-                    return text.split("Recent News about ")[1].strip()
-                user_utterance = f"What are the most recent and relevant news or controversies about {extract_topic(topic)}?"
-                expert_output = self.topic_expert(
-                    topic=topic, question=user_utterance, ground_truth_url=ground_truth_url
-                )
-                dlg_turn = DialogueTurn(
-                    agent_utterance=expert_output.answer,
-                    user_utterance=user_utterance,
-                    search_queries=expert_output.queries,
-                    search_results=expert_output.searched_results,
-                )
-                passage = expert_output.answer
-                self.graph_mindmap = self.graph_processor.process_passage(passage)
-                dlg_history.append(dlg_turn)
+        mindmap = MindmapGraph(
+            method=self.mindmap_method,
+            lm=self.mindmap_lm,
+            summary_cache=self.mindmap_summary_cache,
+        )
+        graph_mindmap = mindmap.to_prompt()
+        novelty_tracker = (
+            NoveltyTracker(similarity_threshold=self.novelty_similarity_threshold)
+            if self.min_information_gain > 0
+            else None
+        )
 
+        def record_turn(dlg_turn):
+            if journal is not None:
+                summary = mindmap.summary_cache.get(
+                    MindmapGraph.passage_key(dlg_turn.agent_utterance)
+                )
+                journal.record_turn(persona, dlg_turn, summary)
 
+        if journal is not None:
+            # Replay the completed turns; their summaries are in the journal, so this doesn't call the LM.
+            for dlg_turn in journal.get_turns(persona):
+                graph_mindmap = mindmap.process_passage(dlg_turn.agent_utterance)
+                dlg_history.append(dlg_turn)
+                if novelty_tracker is not None:
+                    novelty_tracker.update(dlg_turn, mindmap)
+            if persona in journal.finished:
+                return dspy.Prediction(dlg_history=dlg_history, mindmap=mindmap)
 
+        if self.max_turn > 0 and len(dlg_history) == 0:
+            if opening_turn is None:
+                dlg_turn = self.opening_turn(
+                    topic=topic, ground_truth_url=ground_truth_url
+                )
             else:
-                user_utterance = self.wiki_writer(
-                    topic=topic, persona=persona, dialogue_turns=dlg_history, graph_mindmap=self.graph_mindmap
-                ).question
-                if user_utterance == "":
+                # The dialogue history is cleaned up in place later on.
+                dlg_turn = copy.deepcopy(opening_turn)
+            graph_mindmap = mindmap.process_passage(dlg_turn.agent_utterance)
+            dlg_history.append(dlg_turn)
+            record_turn(dlg_turn)
+            if novelty_tracker is not None:
+                novelty_tracker.update(dlg_turn, mindmap)
+
+        while len(dlg_history) < self.max_turn:
+            num_questions = min(
+                self.questions_per_round, self.max_turn - len(dlg_history)
+            )
+            questions = self.wiki_writer(
+                topic=topic,
+                persona=persona,
+                dialogue_turns=dlg_history,
+                graph_mindmap=graph_mindmap,
+                num_questions=num_questions,
+            ).questions
+            # The writer ends the conversation by thanking the expert; the other questions of the round are still
+            # answered.
+            is_last_round = any(
+                q.startswith("Thank you so much for your help!") for q in questions
+            )
+            questions = [
+                q
+                for q in questions
+                if not q.startswith("Thank you so much for your help!")
+            ]
+            if len(questions) == 0:
+                if not is_last_round:
                     logging.error("Simulated article writer utterance is empty.")
-                    break
-                if user_utterance.startswith("Thank you so much for your help!"):
-                    break
-                expert_output = self.topic_expert(
-                    topic=topic, question=user_utterance, ground_truth_url=ground_truth_url
-                )
+                break
+            round_gains = []
+            for user_utterance, expert_output in zip(
+                questions, self._ask_topic_expert(topic, questions, ground_truth_url)
+            ):
                 dlg_turn = DialogueTurn(
                     agent_utterance=expert_output.answer,
                     user_utterance=user_utterance,
@@ -99,12 +422,34 @@ class ConvSimulator(dspy.Module):
                     search_results=expert_output.searched_results,
                 )
                 passage = expert_output.answer
-                self.graph_mindmap = self.graph_processor.process_passage(passage)
+                graph_mindmap = mindmap.process_passage(passage)
 
                 dlg_history.append(dlg_turn)
+                record_turn(dlg_turn)
                 callback_handler.on_dialogue_turn_end(dlg_turn=dlg_turn)
 
-        return dspy.Prediction(dlg_history=dlg_history)
+                if novelty_tracker is not None:
+                    stats = novelty_tracker.update(dlg_turn, mindmap)
+                    logging.info(
+                        f"Persona {persona!r}, turn {len(dlg_history) - 1} novelty: {json.dumps(stats)}"
+                    )
+                    round_gains.append(stats["information_gain"])
+
+            if is_last_round:
+                break
+            if (
+                round_gains
+                and sum(round_gains) / len(round_gains) < self.min_information_gain
+            ):
+                logging.info(
+                    f"Persona {persona!r}: information gain {sum(round_gains) / len(round_gains):.2f} is below "
+                    f"{self.min_information_gain}, ending the conversation."
+                )
+                break
+
+        if journal is not None:
+            journal.record_finished(persona)
+        return dspy.Prediction(dlg_history=dlg_history, mindmap=mindmap)
 
 
 class WikiWriter(dspy.Module):
@@ -116,8 +461,21 @@ class WikiWriter(dspy.Module):
         super().__init__()
         self.ask_question_with_persona = dspy.ChainOfThought(AskQuestionWithPersona)
         self.ask_question = dspy.ChainOfThought(AskQuestion)
+        self.ask_questions_with_persona = dspy.ChainOfThought(AskQuestionsWithPersona)
+        self.ask_questions = dspy.ChainOfThought(AskQuestions)
         self.engine = engine
 
+    @staticmethod
+    def _parse_questions(output: str, num_questions: int) -> List[str]:
+        questions = []
+        for line in output.split("\n"):
+            question = re.sub(
+                r"^\s*(?:[-*]|\d+[.)]|question\s*\d+\s*:)\s*", "", line, flags=re.I
+            ).strip()
+            if question and question not in questions:
+                questions.append(question)
+        return questions[:num_questions]
+
     def forward(
         self,
         topic: str,
@@ -125,7 +483,10 @@ class WikiWriter(dspy.Module):
         dialogue_turns: List[DialogueTurn],
         graph_mindmap: str,
         draft_page=None,
+        num_questions: int = 1,
     ):
+        """Return the next question (`question`) or, with `num_questions` > 1, up to `num_questions` diverse
+        questions asked in the same LM call (`questions`)."""
         conv = []
         for turn in dialogue_turns[:-4]:
             conv.append(
@@ -139,6 +500,26 @@ class WikiWriter(dspy.Module):
         conv = conv.strip() or "N/A"
         conv = ArticleTextProcessing.limit_word_count_preserve_newline(conv, 2500)
         with dspy.settings.context(lm=self.engine):
+            if num_questions > 1:
+                if persona is not None and len(persona.strip()) > 0:
+                    output = self.ask_questions_with_persona(
+                        topic=topic,
+                        persona=persona,
+                        conv=conv,
+                        graph_mindmap=graph_mindmap,
+                        num_questions=str(num_questions),
+                    ).questions
+                else:
+                    output = self.ask_questions(
+                        topic=topic,
+                        conv=conv,
+                        graph_mindmap=graph_mindmap,
+                        num_questions=str(num_questions),
+                    ).questions
+                questions = self._parse_questions(output, num_questions)
+                return dspy.Prediction(
+                    question=questions[0] if questions else "", questions=questions
+                )
             if persona is not None and len(persona.strip()) > 0:
                 question = self.ask_question_with_persona(
                     topic=topic, persona=persona, conv=conv, graph_mindmap=graph_mindmap
@@ -147,7 +528,9 @@ class WikiWriter(dspy.Module):
                 question = self.ask_question(
                     topic=topic, persona=persona, conv=conv, graph_mindmap=graph_mindmap
                 ).question
-        return dspy.Prediction(question=question)
+        return dspy.Prediction(
+            question=question, questions=[question] if question else []
+        )
 
 
 class AskQuestion(dspy.Signature):
@@ -184,6 +567,50 @@ class AskQuestionWithPersona(dspy.Signature):
     question = dspy.OutputField(format=str)
 
 
+class AskQuestions(dspy.Signature):
+    """You are an experienced recent news article writer. You are chatting with an expert to get information for the topic you want to write about. Ask good questions to get more useful information relevant to the topic.
+    Focus on recent news about the topic.
+    Do not ask questions about the topic's basic background information. The readers of your news article already knows basic information about your topic.
+    You have also drafted a graph mindmap of your information gathering about the topic so far. Ask questions that will ensure balancedness to the graph to NOT focus too much into a specific topic.
+    When you have no more question to ask, say "Thank you so much for your help!" to end the conversation.
+    Ask the given number of questions at once. The expert will answer them independently, so each question must be self-contained and cover a different aspect of the topic. Don't ask what you have asked before. Your questions should be related to the topic you want to write.
+    Write the questions in the following format:
+    - question 1
+    - question 2
+    ...
+    """
+
+    topic = dspy.InputField(prefix="Topic you want to write: ", format=str)
+    conv = dspy.InputField(prefix="Conversation history:\n", format=str)
+    graph_mindmap = dspy.InputField(prefix="Graph Mindmap:\n", format=str)
+    num_questions = dspy.InputField(prefix="Number of questions to ask: ", format=str)
+    questions = dspy.OutputField(format=str)
+
+
+class AskQuestionsWithPersona(dspy.Signature):
+    """You are an experienced recent news article writer and want to edit a specific page. Besides your identity as a recent news article writer, you have specific focus when researching the topic.
+    Now, you are chatting with an expert to get information. Ask good questions to get more useful information.
+    Focus on recent news about the topic.
+    Do not ask questions about the topic's basic background information. The readers of your news article already knows basic information about your topic.
+    You have also drafted a graph mindmap of your information gathering about the topic so far. Ask questions that will ensure balancedness to the graph to NOT focus too much into a specific topic.
+    When you have no more question to ask, say "Thank you so much for your help!" to end the conversation.
+    Ask the given number of questions at once. The expert will answer them independently, so each question must be self-contained and cover a different aspect of the topic. Don't ask what you have asked before. Your questions should be related to the topic you want to write.
+    Write the questions in the following format:
+    - question 1
+    - question 2
+    ...
+    """
+
+    topic = dspy.InputField(prefix="Topic you want to write: ", format=str)
+    persona = dspy.InputField(
+        prefix="Your persona besides being a recent news article writer: ", format=str
+    )
+    conv = dspy.InputField(prefix="Conversation history:\n", format=str)
+    graph_mindmap = dspy.InputField(prefix="Graph Mindmap:\n", format=str)
+    num_questions = dspy.InputField(prefix="Number of questions to ask: ", format=str)
+    questions = dspy.OutputField(format=str)
+
+
 class QuestionToQuery(dspy.Signature):
     """You want to answer the question using Google search. What do you type in the search box?
     Write the queries you will use in the following format:
@@ -292,9 +719,13 @@ class StormKnowledgeCurationModule(KnowledgeCurationModule):
         search_top_k: int,
         max_conv_turn: int,
         max_thread_num: int,
+        mindmap_lm: Optional[Union[dspy.dsp.LM, dspy.dsp.HFModel]] = None,
+        min_information_gain: float = 0.0,
+        novelty_similarity_threshold: float = 0.9,
+        questions_per_round: int = 1,
     ):
         """
-        Store args and finish initialization.
+        Store args and finish initialization. `mindmap_lm` defaults to `conv_simulator_lm`.
         """
         self.retriever = retriever
         self.persona_generator = persona_generator
@@ -309,6 +740,11 @@ class StormKnowledgeCurationModule(KnowledgeCurationModule):
             max_search_queries_per_turn=max_search_queries_per_turn,
             search_top_k=search_top_k,
             max_turn=max_conv_turn,
+            mindmap_lm=mindmap_lm,
+            min_information_gain=min_information_gain,
+            novelty_similarity_threshold=novelty_similarity_threshold,
+            questions_per_round=questions_per_round,
+            max_thread_num=max_thread_num,
         )
 
     def _get_considered_personas(self, topic: str, max_num_persona) -> List[str]:
@@ -323,7 +759,9 @@ class StormKnowledgeCurationModule(KnowledgeCurationModule):
         ground_truth_url,
         considered_personas,
         callback_handler: BaseCallbackHandler,
-    ) -> List[Tuple[str, List[DialogueTurn]]]:
+        opening_turn: Union[DialogueTurn, concurrent.futures.Future, None] = None,
+        journal: Optional[ConversationJournal] = None,
+    ) -> Tuple[List[Tuple[str, List[DialogueTurn]]], List[MindmapGraph]]:
         """
         Executes multiple conversation simulations concurrently, each with a different persona,
         and collects their dialog histories. The dialog history of each conversation is cleaned
@@ -335,17 +773,24 @@ class StormKnowledgeCurationModule(KnowledgeCurationModule):
                 an object that has a `dlg_history` attribute.
             topic (str): The topic of conversation for the simulations.
             ground_truth_url (str): The URL to the ground truth data related to the conversation topic.
-            considered_personas (list): A list of personas under which the conversation simulations
-                will be conducted. Each persona is passed to `conv_simulator` individually.
+            considered_personas (iterable): The personas under which the conversation simulations
+                will be conducted. Each persona is passed to `conv_simulator` individually. It can be an
+                iterator, e.g., `StormPersonaGenerator.iter_personas()`: a conversation starts as soon as
+                its persona is produced.
             callback_handler (callable): A callback function that is passed to `conv_simulator`. It
                 should handle any callbacks or events during the simulation.
+            opening_turn (DialogueTurn or Future, optional): The first turn shared by all the conversations,
+                or a future of it if it is still being computed.
+            journal (ConversationJournal, optional): Journal to record the turns in and resume from.
 
         Returns:
             list of tuples: A list where each tuple contains a persona and its corresponding cleaned
             dialog history (`dlg_history`) from the conversation simulation.
+            list of MindmapGraph: The mindmap of each conversation, in the order of `considered_personas`.
         """
 
         conversations = []
+        mindmaps = {}
 
         def run_conv(persona):
             return conv_simulator(
@@ -353,29 +798,193 @@ class StormKnowledgeCurationModule(KnowledgeCurationModule):
                 ground_truth_url=ground_truth_url,
                 persona=persona,
                 callback_handler=callback_handler,
+                opening_turn=(
+                    opening_turn.result()
+                    if isinstance(opening_turn, concurrent.futures.Future)
+                    else opening_turn
+                ),
+                journal=journal,
             )
 
-        max_workers = min(self.max_thread_num, len(considered_personas))
+        max_workers = self.max_thread_num
+        if isinstance(considered_personas, list):
+            max_workers = min(max_workers, len(considered_personas))
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_persona = {
-                executor.submit(run_conv, persona): persona
-                for persona in considered_personas
-            }
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(max_workers, 1)
+        ) as executor:
+            future_to_persona = {}
+            for i, persona in enumerate(considered_personas):
+                future_to_persona[
+                    executor.submit(propagate_context(run_conv), persona)
+                ] = (i, persona)
 
-            if streamlit_connection:
-                # Ensure the logging context is correct when connecting with Streamlit frontend.
-                for t in executor._threads:
-                    add_script_run_ctx(t)
+                if streamlit_connection:
+                    # Ensure the logging context is correct when connecting with Streamlit frontend.
+                    for t in executor._threads:
+                        add_script_run_ctx(t)
 
             for future in as_completed(future_to_persona):
-                persona = future_to_persona[future]
+                i, persona = future_to_persona[future]
                 conv = future.result()
                 conversations.append(
                     (persona, ArticleTextProcessing.clean_up_citation(conv).dlg_history)
                 )
+                mindmaps[i] = conv.mindmap
 
-        return conversations
+        return conversations, [mindmaps[i] for i in sorted(mindmaps)]
+
+    async def _arun_conversation(
+        self,
+        conv_simulator,
+        topic,
+        ground_truth_url,
+        considered_personas,
+        callback_handler: BaseCallbackHandler,
+        opening_turn: Union[DialogueTurn, asyncio.Future, None] = None,
+        journal: Optional[ConversationJournal] = None,
+    ) -> Tuple[List[Tuple[str, List[DialogueTurn]]], List[MindmapGraph]]:
+        """Asyncio counterpart of `_run_conversation()`.
+
+        Each conversation runs in a worker thread (dspy modules are synchronous) and at most `max_thread_num`
+        conversations run at once. Searches issued by the conversations are handed back to the event loop by
+        `Retriever.retrieve()`, so they do not hold extra threads. `considered_personas` can be an iterator, it
+        is advanced in a worker thread and a conversation starts as soon as its persona is produced.
+        `opening_turn` can be a future of the opening turn.
+        """
+        semaphore = asyncio.Semaphore(max(self.max_thread_num, 1))
+
+        async def run_conv(persona):
+            async with semaphore:
+                conv = await asyncio.to_thread(
+                    conv_simulator,
+                    topic=topic,
+                    ground_truth_url=ground_truth_url,
+                    persona=persona,
+                    callback_handler=callback_handler,
+                    opening_turn=(
+                        await opening_turn
+                        if isinstance(opening_turn, asyncio.Future)
+                        else opening_turn
+                    ),
+                    journal=journal,
+                )
+            return (
+                persona,
+                ArticleTextProcessing.clean_up_citation(conv).dlg_history,
+            ), conv.mindmap
+
+        personas = iter(considered_personas)
+        tasks = []
+        try:
+            while (
+                persona := await asyncio.to_thread(next, personas, None)
+            ) is not None:
+                tasks.append(asyncio.create_task(run_conv(persona)))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        results = await asyncio.gather(*tasks)
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def _open_journal(
+        self,
+        topic: str,
+        journal_path: Optional[str],
+        max_perspective: int,
+        disable_perspective: bool,
+    ) -> Optional[ConversationJournal]:
+        if journal_path is None:
+            return None
+        lms = {
+            "conv_simulator_lm": self.conv_simulator_lm,
+            "question_asker_lm": self.conv_simulator.wiki_writer.engine,
+            "mindmap_lm": self.conv_simulator.mindmap_lm,
+        }
+        run_args = {
+            "max_conv_turn": self.conv_simulator.max_turn,
+            "max_perspective": max_perspective,
+            "disable_perspective": disable_perspective,
+            "search_top_k": self.search_top_k,
+            "max_search_queries_per_turn": self.conv_simulator.topic_expert.max_search_queries,
+            "questions_per_round": self.conv_simulator.questions_per_round,
+            "models": {
+                name: getattr(lm, "kwargs", {}).get("model")
+                or getattr(lm, "model", None)
+                for name, lm in lms.items()
+            },
+        }
+        journal = ConversationJournal(journal_path, topic, run_args)
+        # Resumed turns don't need to be summarized again for the mindmap.
+        self.conv_simulator.mindmap_summary_cache.update(journal.summaries)
+        return journal
+
+    def _iter_personas(
+        self, topic, max_perspective, disable_perspective, journal
+    ) -> Iterator[str]:
+        """Yield the considered personas as they are produced, each one journaled before it is yielded.
+
+        A resumed run first yields the journaled personas in order, so their conversations resume under the same
+        persona strings, and then only the personas produced after them.
+        """
+        journaled = list(journal.personas) if journal is not None else []
+        yield from journaled
+        if journal is not None and journal.personas_complete:
+            return
+        if disable_perspective:
+            personas = [""]
+        else:
+            personas = self.persona_generator.iter_personas(
+                topic=topic, max_num_persona=max_perspective
+            )
+        for i, persona in enumerate(personas):
+            if i < len(journaled):
+                # Produced again after a crash, the journaled persona was yielded instead.
+                continue
+            if journal is not None:
+                journal.record_persona(persona)
+            yield persona
+        if journal is not None:
+            journal.record_personas_end()
+
+    def _identify_personas(
+        self,
+        topic,
+        max_perspective,
+        disable_perspective,
+        journal,
+        callback_handler: BaseCallbackHandler,
+        conversation_callback_handler: _DeferredCallbackHandler,
+    ) -> Iterator[str]:
+        """Yield the personas of `_iter_personas()` between the perspective identification callbacks.
+
+        The callbacks of the conversations that started meanwhile are released once the information gathering
+        starts.
+        """
+        callback_handler.on_identify_perspective_start()
+        considered_personas = []
+        for persona in self._iter_personas(
+            topic, max_perspective, disable_perspective, journal
+        ):
+            considered_personas.append(persona)
+            yield persona
+        callback_handler.on_identify_perspective_end(perspectives=considered_personas)
+        callback_handler.on_information_gathering_start()
+        conversation_callback_handler.release()
+
+    def _get_opening_turn(self, topic, ground_truth_url, journal):
+        # The first turn is the same for every persona, ask it only once.
+        if self.conv_simulator.max_turn <= 0:
+            return None
+        if journal is not None and journal.opening_turn is not None:
+            return journal.get_opening_turn()
+        opening_turn = self.conv_simulator.opening_turn(
+            topic=topic, ground_truth_url=ground_truth_url
+        )
+        if journal is not None:
+            journal.record_opening_turn(opening_turn)
+        return opening_turn
 
     def research(
         self,
@@ -385,42 +994,122 @@ class StormKnowledgeCurationModule(KnowledgeCurationModule):
         max_perspective: int = 0,
         disable_perspective: bool = True,
         return_conversation_log=False,
-    ) -> Union[StormInformationTable, Tuple[StormInformationTable, Dict, Dict]]:
+        journal_path: Optional[str] = None,
+    ) -> Union[
+        Tuple[StormInformationTable, MindmapGraph],
+        Tuple[StormInformationTable, Dict, MindmapGraph],
+    ]:
         """
         Curate information and knowledge for the given topic
 
         Args:
             topic: topic of interest in natural language.
+            journal_path: If given, every completed conversation turn is appended to this JSONL file and, if it
+                already contains turns for the topic (e.g., after a crash), the research resumes from them.
 
         Returns:
             collected_information: collected information in InformationTable type.
+            conversation_log: the conversations as a JSON-serializable dict, only if `return_conversation_log`.
+            mindmap: the MindmapGraph merged from the mindmaps of the persona conversations.
         """
+        journal = self._open_journal(
+            topic, journal_path, max_perspective, disable_perspective
+        )
 
-        # identify personas
-        callback_handler.on_identify_perspective_start()
-        considered_personas = []
-        if disable_perspective:
-            considered_personas = [""]
-        else:
-            considered_personas = self._get_considered_personas(
-                topic=topic, max_num_persona=max_perspective
+        # The opening turn is computed while the personas are generated.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            opening_turn = executor.submit(
+                propagate_context(self._get_opening_turn),
+                topic,
+                ground_truth_url,
+                journal,
             )
-        callback_handler.on_identify_perspective_end(perspectives=considered_personas)
+            if streamlit_connection:
+                for t in executor._threads:
+                    add_script_run_ctx(t)
 
-        # run conversation
-        callback_handler.on_information_gathering_start()
-        conversations = self._run_conversation(
-            conv_simulator=self.conv_simulator,
-            topic=topic,
-            ground_truth_url=ground_truth_url,
-            considered_personas=considered_personas,
-            callback_handler=callback_handler,
-        )
+            # identify personas and run the conversations; a conversation starts as soon as its persona is
+            # produced, e.g., the default persona doesn't wait for the generation of the others
+            conversation_callback_handler = _DeferredCallbackHandler(callback_handler)
+            conversations, mindmaps = self._run_conversation(
+                conv_simulator=self.conv_simulator,
+                topic=topic,
+                ground_truth_url=ground_truth_url,
+                considered_personas=self._identify_personas(
+                    topic,
+                    max_perspective,
+                    disable_perspective,
+                    journal,
+                    callback_handler,
+                    conversation_callback_handler,
+                ),
+                callback_handler=conversation_callback_handler,
+                opening_turn=opening_turn,
+                journal=journal,
+            )
 
         information_table = StormInformationTable(conversations)
+        # Merge the mindmaps of the persona conversations into the mindmap used by the writing stage.
+        mindmap = MindmapGraph.merge(mindmaps)
         callback_handler.on_information_gathering_end()
         if return_conversation_log:
             return information_table, StormInformationTable.construct_log_dict(
                 conversations
-            ), self.conv_simulator.graph_mindmap
-        return information_table, self.conv_simulator.graph_mindmap
+            ), mindmap
+        return information_table, mindmap
+
+    async def aresearch(
+        self,
+        topic: str,
+        ground_truth_url: str,
+        callback_handler: BaseCallbackHandler,
+        max_perspective: int = 0,
+        disable_perspective: bool = True,
+        return_conversation_log=False,
+        journal_path: Optional[str] = None,
+    ) -> Union[
+        Tuple[StormInformationTable, MindmapGraph],
+        Tuple[StormInformationTable, Dict, MindmapGraph],
+    ]:
+        """Asyncio counterpart of `research()`."""
+        journal = self._open_journal(
+            topic, journal_path, max_perspective, disable_perspective
+        )
+
+        # The opening turn is computed while the personas are generated.
+        opening_turn = asyncio.ensure_future(
+            asyncio.to_thread(self._get_opening_turn, topic, ground_truth_url, journal)
+        )
+        conversation_callback_handler = _DeferredCallbackHandler(callback_handler)
+        try:
+            conversations, mindmaps = await self._arun_conversation(
+                conv_simulator=self.conv_simulator,
+                topic=topic,
+                ground_truth_url=ground_truth_url,
+                considered_personas=self._identify_personas(
+                    topic,
+                    max_perspective,
+                    disable_perspective,
+                    journal,
+                    callback_handler,
+                    conversation_callback_handler,
+                ),
+                callback_handler=conversation_callback_handler,
+                opening_turn=opening_turn,
+                journal=journal,
+            )
+        finally:
+            # Wait for the opening turn even if no conversation used it.
+            await asyncio.gather(opening_turn, return_exceptions=True)
+
+        information_table = StormInformationTable(conversations)
+        # Merge the mindmaps of the persona conversations into the mindmap used by the writing stage.
+        mindmap = MindmapGraph.merge(mindmaps)
+        callback_handler.on_information_gathering_end()
+        if return_conversation_log:
+            return (
+                information_table,
+                StormInformationTable.construct_log_dict(conversations),
+                mindmap,
+            )
+        return information_table, mindmap
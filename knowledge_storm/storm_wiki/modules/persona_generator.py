@@ -1,17 +1,42 @@
+import concurrent.futures
+import functools
+import hashlib
+import json
 import logging
+import os
 import re
-from typing import Union, List
+import threading
+from typing import Iterator, Union, List, Optional
 
 import dspy
 import requests
-from bs4 import BeautifulSoup
 
+from ...metrics import record_cache_lookup
+from ...tracing import propagate_context, span
 
-def get_wiki_page_title_and_toc(url):
-    """Get the main title and table of contents from an url of a Wikipedia page."""
 
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, "html.parser")
+# Suggested location of the page outline cache, which is disabled unless a `page_cache_dir` is given.
+DEFAULT_PAGE_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "knowledge_storm", "page_outlines"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _html_parser() -> str:
+    # lxml is optional; without it BeautifulSoup raises FeatureNotFound for "lxml".
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+def _parse_title_and_toc(html):
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # Only the headers are needed, the rest of the page is not turned into a tree.
+    headers = SoupStrainer(["h1", "h2", "h3", "h4", "h5", "h6"])
+    soup = BeautifulSoup(html, _html_parser(), parse_only=headers)
 
     # Get the main title from the first h1 tag
     main_title = soup.find("h1").text.replace("[edit]", "").strip().replace("\xa0", " ")
@@ -45,6 +70,54 @@ def get_wiki_page_title_and_toc(url):
     return main_title, toc.strip()
 
 
+def get_wiki_page_title_and_toc(
+    url, timeout: float = 10, cache_dir: Optional[str] = None
+):
+    """Get the main title and table of contents from an url of a Wikipedia page.
+
+    Args:
+        url: Url of the page.
+        timeout: Timeout of the request in seconds.
+        cache_dir: If given, directory where the title and table of contents are cached by url (e.g.,
+            `DEFAULT_PAGE_CACHE_DIR`). Cached outlines are never refreshed; delete the directory to clear them.
+    """
+    with span("page_outline", "download", url=url) as s:
+        return _get_wiki_page_title_and_toc(url, timeout, cache_dir, s)
+
+
+def _get_wiki_page_title_and_toc(url, timeout, cache_dir, s):
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(
+            cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json"
+        )
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                s.set(cache_hit=True)
+                record_cache_lookup("page_outline", hit=True)
+                return cached["title"], cached["toc"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+    s.set(cache_hit=False)
+    if cache_dir is not None:
+        record_cache_lookup("page_outline", hit=False)
+    response = requests.get(url, timeout=timeout)
+    s.set(status_code=response.status_code, bytes=len(response.content))
+    main_title, toc = _parse_title_and_toc(response.content)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so that concurrent readers never see a partial file.
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "title": main_title, "toc": toc}, f)
+        os.replace(tmp_path, cache_path)
+    return main_title, toc
+
+
 class FindRelatedTopic(dspy.Signature):
     """I'm writing a news article about a recent event related to the topic mentioned below. Please identify and recommend some relevant news sources or articles that discuss recent developments surrounding this topic. I'm looking for examples that provide insights into key issues, controversies, or impactful updates associated with this topic.
     Please list the urls in separate lines."""
@@ -68,11 +141,41 @@ class GenPersona(dspy.Signature):
 class CreateWriterWithPersona(dspy.Module):
     """Discover different perspectives on the topic by reviewing recent news articles about related subjects."""
 
-    def __init__(self, engine: Union[dspy.dsp.LM, dspy.dsp.HFModel]):
+    def __init__(
+        self,
+        engine: Union[dspy.dsp.LM, dspy.dsp.HFModel],
+        page_cache_dir: Optional[str] = None,
+        fetch_timeout: float = 10,
+        max_fetch_workers: int = 8,
+    ):
         super().__init__()
         self.find_related_topic = dspy.ChainOfThought(FindRelatedTopic)
         self.gen_persona = dspy.ChainOfThought(GenPersona)
         self.engine = engine
+        self.page_cache_dir = page_cache_dir
+        self.fetch_timeout = fetch_timeout
+        self.max_fetch_workers = max_fetch_workers
+
+    def _get_examples(self, urls: List[str]) -> List[str]:
+        """Fetch the outlines of the related pages concurrently, in the order of `urls`."""
+
+        def get_example(url):
+            try:
+                title, toc = get_wiki_page_title_and_toc(
+                    url, timeout=self.fetch_timeout, cache_dir=self.page_cache_dir
+                )
+                return f"Title: {title}\nTable of Contents: {toc}"
+            except Exception as e:
+                logging.error(f"Error occurs when processing {url}: {e}")
+                return None
+
+        if not urls:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(self.max_fetch_workers, len(urls))
+        ) as executor:
+            examples = list(executor.map(propagate_context(get_example), urls))
+        return [example for example in examples if example is not None]
 
     def forward(self, topic: str, draft=None):
         with dspy.settings.context(lm=self.engine):
@@ -82,14 +185,7 @@ class CreateWriterWithPersona(dspy.Module):
             for s in related_topics.split("\n"):
                 if "http" in s:
                     urls.append(s[s.find("http") :])
-            examples = []
-            for url in urls:
-                try:
-                    title, toc = get_wiki_page_title_and_toc(url)
-                    examples.append(f"Title: {title}\nTable of Contents: {toc}")
-                except Exception as e:
-                    logging.error(f"Error occurs when processing {url}: {e}")
-                    continue
+            examples = self._get_examples(urls)
             if len(examples) == 0:
                 examples.append("N/A")
             gen_persona_output = self.gen_persona(
@@ -128,8 +224,24 @@ class StormPersonaGenerator:
             personas. It must be an instance of either `dspy.dsp.LM` or `dspy.dsp.HFModel`.
     """
 
-    def __init__(self, engine: Union[dspy.dsp.LM, dspy.dsp.HFModel]):
-        self.create_writer_with_persona = CreateWriterWithPersona(engine=engine)
+    def __init__(
+        self,
+        engine: Union[dspy.dsp.LM, dspy.dsp.HFModel],
+        page_cache_dir: Optional[str] = None,
+        fetch_timeout: float = 10,
+    ):
+        self.create_writer_with_persona = CreateWriterWithPersona(
+            engine=engine, page_cache_dir=page_cache_dir, fetch_timeout=fetch_timeout
+        )
+
+    def iter_personas(self, topic: str, max_num_persona: int = 3) -> Iterator[str]:
+        """
+        Yield the same personas as `generate_persona()` as soon as they are available: the default persona is
+        yielded before the LM is called, so a conversation can start while the other personas are generated.
+        """
+        yield "Basic fact writer: Basic fact writer focusing on broadly covering the basic facts about the topic."
+        personas = self.create_writer_with_persona(topic=topic)
+        yield from personas.personas[:max_num_persona]
 
     def generate_persona(self, topic: str, max_num_persona: int = 3) -> List[str]:
         """
@@ -148,7 +260,4 @@ class StormPersonaGenerator:
             List[str]: A list of persona descriptions, including the default 'Basic fact writer' persona
                 and up to `max_num_persona` additional personas generated based on the topic.
         """
-        personas = self.create_writer_with_persona(topic=topic)
-        default_persona = "Basic fact writer: Basic fact writer focusing on broadly covering the basic facts about the topic."
-        considered_personas = [default_persona] + personas.personas[:max_num_persona]
-        return considered_personas
+        return list(self.iter_personas(topic=topic, max_num_persona=max_num_persona))
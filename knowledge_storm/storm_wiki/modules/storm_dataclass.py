@@ -4,10 +4,9 @@ from collections import OrderedDict
 from typing import Union, Optional, Any, List, Tuple, Dict
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from ...interface import Information, InformationTable, Article, ArticleSectionNode
+from ...tracing import span
 from ...utils import ArticleTextProcessing, FileIOHelper
 
 
@@ -90,15 +89,18 @@ class StormInformationTable(InformationTable):
             )
         return conversation_log
 
+    def log_url_to_info(self):
+        return {url: info.to_dict() for url, info in self.url_to_info.items()}
+
     def dump_url_to_info(self, path):
-        url_to_info = copy.deepcopy(self.url_to_info)
-        for url in url_to_info:
-            url_to_info[url] = url_to_info[url].to_dict()
-        FileIOHelper.dump_json(url_to_info, path)
+        FileIOHelper.dump_json(self.log_url_to_info(), path)
 
     @classmethod
     def from_conversation_log_file(cls, path):
-        conversation_log_data = FileIOHelper.load_json(path)
+        return cls.from_conversation_log(FileIOHelper.load_json(path))
+
+    @classmethod
+    def from_conversation_log(cls, conversation_log_data):
         conversations = []
         for item in conversation_log_data:
             dialogue_turns = [DialogueTurn(**turn) for turn in item["dlg_turns"]]
@@ -107,26 +109,35 @@ class StormInformationTable(InformationTable):
         return cls(conversations)
 
     def prepare_table_for_retrieval(self):
-        self.encoder = SentenceTransformer("paraphrase-MiniLM-L6-v2")
+        from .graph import load_sentence_transformer
+
+        # Shared with the mindmaps and the other runners of the process.
+        self.encoder = load_sentence_transformer("paraphrase-MiniLM-L6-v2")
         self.collected_urls = []
         self.collected_snippets = []
         for url, information in self.url_to_info.items():
             for snippet in information.snippets:
                 self.collected_urls.append(url)
                 self.collected_snippets.append(snippet)
-        self.encoded_snippets = self.encoder.encode(
-            self.collected_snippets, show_progress_bar=False
-        )
+        with span(
+            "encode_snippets", "embedding", num_texts=len(self.collected_snippets)
+        ):
+            self.encoded_snippets = self.encoder.encode(
+                self.collected_snippets, show_progress_bar=False
+            )
 
     def retrieve_information(
         self, queries: Union[List[str], str], search_top_k
     ) -> List[Information]:
+        from sklearn.metrics.pairwise import cosine_similarity
+
         selected_urls = []
         selected_snippets = []
         if type(queries) is str:
             queries = [queries]
         for query in queries:
-            encoded_query = self.encoder.encode(query, show_progress_bar=False)
+            with span("encode_query", "embedding"):
+                encoded_query = self.encoder.encode(query, show_progress_bar=False)
             sim = cosine_similarity([encoded_query], self.encoded_snippets)[0]
             sorted_indices = np.argsort(sim)
             for i in sorted_indices[-search_top_k:][::-1]:
@@ -300,6 +311,28 @@ class StormArticle(Article):
             trim_children=False,
         )
 
+    def set_section_draft(
+        self, section_name: str, partial_content: str
+    ) -> Optional[ArticleSectionNode]:
+        """
+        Set the content of an existing section while it is still being generated (e.g., streamed).
+
+        The leading heading that repeats the section name is dropped. Citations are kept as generated;
+        they are only unified with the article references by `update_section()` once the section is complete.
+
+        Returns:
+            the ArticleSectionNode of the section, or None if the section does not exist.
+        """
+        node = self.find_section(self.root, section_name)
+        if node is None:
+            return None
+        lines = partial_content.strip().split("\n")
+        if lines and lines[0].startswith("#"):
+            if lines[0].strip("# ").strip().lower() == section_name.lower().strip():
+                lines = lines[1:]
+        node.content = "\n".join(lines).strip()
+        return node
+
     def get_outline_as_list(
         self,
         root_section_name: Optional[str] = None,
@@ -479,11 +512,14 @@ class StormArticle(Article):
         outline = self.get_outline_as_list(add_hashtags=True, include_root=False)
         FileIOHelper.write_str("\n".join(outline), file_path)
 
-    def dump_reference_to_file(self, file_path):
+    def log_reference(self):
         reference = copy.deepcopy(self.reference)
         for url in reference["url_to_info"]:
             reference["url_to_info"][url] = reference["url_to_info"][url].to_dict()
-        FileIOHelper.dump_json(reference, file_path)
+        return reference
+
+    def dump_reference_to_file(self, file_path):
+        FileIOHelper.dump_json(self.log_reference(), file_path)
 
     def dump_article_as_plain_text(self, file_path):
         text = self.to_string()
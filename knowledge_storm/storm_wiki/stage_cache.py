@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import dspy
+
+from ..utils import FileIOHelper
+
+
+class StageCache:
+    """Keep track of which pipeline stage outputs in an article output directory are up to date.
+
+    Each stage is identified by a key, the hash of everything its outputs depend on: the topic, the hashes of the
+    upstream artifacts, the LM configurations, the prompts and the relevant arguments. When a stage finishes, its key
+    and the hashes of its output files are recorded in `stage_manifest.json`. A later run can skip the stage if the
+    key is the same and the output files are unchanged, otherwise the stage (and, since its outputs change, the
+    stages depending on it) are recomputed.
+
+    Outputs kept in an `ArtifactStore` instead of a file are hashed by their content in the store.
+    """
+
+    MANIFEST_FILE_NAME = "stage_manifest.json"
+
+    def __init__(self, output_dir: str, artifact_store=None):
+        self.output_dir = output_dir
+        self.artifact_store = artifact_store
+        self.manifest_path = os.path.join(output_dir, self.MANIFEST_FILE_NAME)
+        self.manifest = (
+            FileIOHelper.load_json(self.manifest_path)
+            if os.path.exists(self.manifest_path)
+            else {}
+        )
+
+    @staticmethod
+    def hash_file(path: str) -> Optional[str]:
+        """SHA-256 of the file content, or None if the file does not exist."""
+        if not os.path.exists(path):
+            return None
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def lm_fingerprint(lm) -> Optional[Dict]:
+        """Model name and generation parameters of an LM; wrappers share the `kwargs` of the LM they wrap."""
+        if lm is None:
+            return None
+        return {
+            "model": getattr(lm, "model", None),
+            "kwargs": {
+                k: v for k, v in getattr(lm, "kwargs", {}).items() if "key" not in k
+            },
+        }
+
+    @staticmethod
+    def rm_fingerprint(rm) -> Optional[Dict]:
+        """Class and configuration of a retrieval model (e.g., `k`, the endpoint or the query parameters).
+
+        The configuration is made of the public attributes holding plain values, except for API keys, the usage
+        counter and the random `stage` id of `dspy.Retrieve`. Wrappers keeping the retrieval model in `rm` (e.g.,
+        `BudgetedRM`) are unwrapped.
+        """
+        if rm is None:
+            return None
+        while isinstance(getattr(rm, "rm", None), dspy.Retrieve):
+            rm = rm.rm
+
+        def is_plain(value):
+            if isinstance(value, (str, int, float, bool, type(None))):
+                return True
+            if isinstance(value, (list, tuple)):
+                return all(is_plain(v) for v in value)
+            if isinstance(value, dict):
+                return all(isinstance(k, str) and is_plain(v) for k, v in value.items())
+            return False
+
+        return {
+            "class": f"{type(rm).__module__}.{type(rm).__qualname__}",
+            "params": {
+                name: value
+                for name, value in vars(rm).items()
+                if not name.startswith("_")
+                and "key" not in name.lower()
+                and name not in ("usage", "stage")
+                and is_plain(value)
+            },
+        }
+
+    @staticmethod
+    def prompt_fingerprint(module, max_depth: int = 3) -> Dict:
+        """Instructions and fields of the signatures of all dspy predictors reachable from `module`."""
+        prompts = {}
+        visited = set()
+
+        def add_predictors(obj, prefix, depth):
+            if id(obj) in visited or depth > max_depth:
+                return
+            visited.add(id(obj))
+            if isinstance(obj, dspy.Module):
+                for name, predictor in obj.named_predictors():
+                    signature = predictor.signature
+                    prompts[f"{prefix}{name}"] = {
+                        "instructions": signature.instructions,
+                        "fields": {
+                            field_name: {
+                                k: str(v)
+                                for k, v in (field.json_schema_extra or {}).items()
+                            }
+                            for field_name, field in signature.fields.items()
+                        },
+                    }
+                return
+            for attr_name, value in getattr(obj, "__dict__", {}).items():
+                if hasattr(value, "__dict__") and not isinstance(value, type):
+                    add_predictors(value, f"{prefix}{attr_name}.", depth + 1)
+
+        add_predictors(module, "", 0)
+        return prompts
+
+    @staticmethod
+    def make_key(stage: str, **inputs) -> str:
+        """Hash of the stage name and its inputs; the inputs should be JSON serializable."""
+        payload = json.dumps(
+            {"stage": stage, **inputs}, sort_keys=True, default=str
+        ).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _hash_output(self, file_name: str) -> Optional[str]:
+        path = os.path.join(self.output_dir, file_name)
+        if not os.path.exists(path) and self.artifact_store is not None:
+            return self.artifact_store.member_hash(file_name)
+        return self.hash_file(path)
+
+    def hash_files(self, file_names: List[str]) -> Dict[str, Optional[str]]:
+        return {file_name: self._hash_output(file_name) for file_name in file_names}
+
+    def is_fresh(self, stage: str, key: str) -> bool:
+        """Whether the recorded outputs of `stage` were produced with `key` and have not been modified since."""
+        entry = self.manifest.get(stage)
+        if entry is None or entry["key"] != key:
+            return False
+        current_hashes = self.hash_files(list(entry["outputs"]))
+        return all(
+            current_hashes[file_name] is not None
+            and current_hashes[file_name] == file_hash
+            for file_name, file_hash in entry["outputs"].items()
+        )
+
+    def record(self, stage: str, key: str, output_file_names: List[str]):
+        self.manifest[stage] = {
+            "key": key,
+            "outputs": self.hash_files(output_file_names),
+        }
+        FileIOHelper.dump_json(self.manifest, self.manifest_path)
@@ -0,0 +1,333 @@
+"""Lightweight tracing of the pipelines.
+
+A `Tracer` collects spans: named, timed sections of work such as an LM request, a search, a webpage download, an
+embedding call or a dspy module call. Spans nest: a span started while another one is open becomes its child, also
+across threads as long as the work submitted to thread pools runs in the submitter's context (see
+`propagate_context()`). The spans can then be exported as a Chrome trace (open it in chrome://tracing or
+https://ui.perfetto.dev) or as OTLP JSON.
+
+Tracing is off unless a tracer is activated, in which case `span()` costs a context variable lookup.
+
+Usage:
+    tracer = Tracer()
+    with tracer.activate():
+        runner.run(...)
+    tracer.export_chrome_trace("trace.json")
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+_active_tracer: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar(
+    "knowledge_storm_tracer", default=None
+)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "knowledge_storm_span", default=None
+)
+
+
+class Span:
+    """A timed section of work with attributes, e.g., the model and the tokens of an LM request."""
+
+    def __init__(
+        self, name: str, category: str, parent: Optional["Span"], attributes: Dict
+    ):
+        self.name = name
+        self.category = category
+        self.trace_id = (
+            parent.trace_id if parent is not None else random.getrandbits(128)
+        )
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counters):
+        """Add to numeric attributes, e.g., `span.add(prompt_tokens=12)`."""
+        for key, value in counters.items():
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.time_ns()) - self.start_ns
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counters):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collect the spans of a run and export them."""
+
+    def __init__(self, service_name: str = "knowledge_storm"):
+        self.service_name = service_name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        """Record the spans started in this context (and the contexts propagated from it) until exit."""
+        instrument_dspy_modules()
+        token = _active_tracer.set(self)
+        try:
+            yield self
+        finally:
+            _active_tracer.reset(token)
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict:
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        thread_ids, events = {}, []
+        for span in spans:
+            if span.thread_id not in thread_ids:
+                thread_ids[span.thread_id] = len(thread_ids)
+                events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": thread_ids[span.thread_id],
+                        "args": {"name": span.thread_name},
+                    }
+                )
+            args = dict(span.attributes)
+            if span.error is not None:
+                args["error"] = span.error
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": span.start_ns / 1000,
+                    "dur": span.duration_ns / 1000,
+                    "pid": pid,
+                    "tid": thread_ids[span.thread_id],
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    @staticmethod
+    def _otlp_value(value):
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def to_otlp_json(self) -> Dict:
+        with self._lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": f"{span.trace_id:032x}",
+                "spanId": f"{span.span_id:016x}",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [
+                    {"key": key, "value": self._otlp_value(value)}
+                    for key, value in {
+                        "category": span.category,
+                        "thread.name": span.thread_name,
+                        **span.attributes,
+                    }.items()
+                ],
+                "status": (
+                    {"code": 2, "message": span.error}
+                    if span.error is not None
+                    else {"code": 1}
+                ),
+            }
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = f"{span.parent_id:016x}"
+            otlp_spans.append(otlp_span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "knowledge_storm.tracing"},
+                            "spans": otlp_spans,
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def export_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def export_otlp_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_otlp_json(), f, default=str)
+
+    def export(self, path: str, trace_format: str = "chrome"):
+        """Export to `path` in the "chrome" or "otlp" format."""
+        if trace_format == "chrome":
+            self.export_chrome_trace(path)
+        elif trace_format == "otlp":
+            self.export_otlp_json(path)
+        else:
+            raise ValueError(f"Unknown trace format: {trace_format}")
+
+    def summary(self) -> Dict[str, Dict]:
+        """Number of spans and total seconds per category, e.g., to compare the time spent in search and in LMs."""
+        result = {}
+        with self._lock:
+            for span in self.spans:
+                stats = result.setdefault(span.category, {"count": 0, "seconds": 0.0})
+                stats["count"] += 1
+                stats["seconds"] += span.duration_ns / 1e9
+        return result
+
+
+@contextmanager
+def span(name: str, category: str = "internal", **attributes):
+    """Trace the enclosed block as a child of the current span; a no-op if no tracer is active."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    current = Span(name, category, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        tracer._record(current)
+
+
+def current_span():
+    """The innermost open span, or a no-op span if there is none."""
+    current = _current_span.get()
+    return (
+        current
+        if current is not None and _active_tracer.get() is not None
+        else _NOOP_SPAN
+    )
+
+
+def add_to_current_span(**counters):
+    """Add to numeric attributes of the innermost open span, e.g., the tokens reported by an LM client."""
+    current_span().add(**counters)
+
+
+def traced(name: Optional[str] = None, category: str = "internal"):
+    """Decorator tracing every call of a function or coroutine function."""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, category):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def propagate_context(func: Callable) -> Callable:
+    """Bind `func` to the caller's context so that it keeps the current span when run in a worker thread.
+
+    Usage: `executor.submit(propagate_context(fn), *args)` or `executor.map(propagate_context(fn), items)`. Each
+    call runs in its own copy of the context, so the function can run in several threads at once.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+_dspy_instrumented = False
+_dspy_instrumented_lock = threading.Lock()
+
+
+def instrument_dspy_modules():
+    """Trace the calls of all dspy modules (including `dspy.Predict` and `dspy.ChainOfThought`).
+
+    `dspy.Module.__call__` is wrapped once per process; the wrapper only opens a span when a tracer is active.
+    """
+    global _dspy_instrumented
+    with _dspy_instrumented_lock:
+        if _dspy_instrumented:
+            return
+        try:
+            import dspy
+        except ImportError:
+            return
+        module_call = dspy.Module.__call__
+
+        @functools.wraps(module_call)
+        def traced_call(self, *args, **kwargs):
+            if _active_tracer.get() is None:
+                return module_call(self, *args, **kwargs)
+            signature = getattr(self, "signature", None)
+            attributes = (
+                {"signature": getattr(signature, "__name__", str(signature))}
+                if signature is not None
+                else {}
+            )
+            with span(type(self).__name__, "dspy", **attributes):
+                return module_call(self, *args, **kwargs)
+
+        dspy.Module.__call__ = traced_call
+        _dspy_instrumented = True
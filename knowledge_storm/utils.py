@@ -1,3 +1,4 @@
+import asyncio
 import concurrent.futures
 import json
 import logging
@@ -7,20 +8,26 @@ import re
 import regex
 import sys
 import time
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 
 import httpx
-import pandas as pd
 import toml
-from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import Qdrant
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from qdrant_client import QdrantClient, models
-from tqdm import tqdm
-from trafilatura import extract
 
 from .lm import OpenAIModel
+from .metrics import (
+    DOWNLOAD_BYTES,
+    DOWNLOAD_SECONDS,
+    DOWNLOADS,
+    DOWNLOADS_IN_FLIGHT,
+    track,
+)
+from .tracing import propagate_context, span
+
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from qdrant_client import QdrantClient
+
+# pandas, langchain, qdrant_client and trafilatura are slow to import, so they are imported where they are used.
 
 logging.getLogger("httpx").setLevel(logging.WARNING)  # Disable INFO logging for httpx.
 
@@ -72,9 +79,12 @@ class QdrantVectorStoreManager:
 
     @staticmethod
     def _check_create_collection(
-        client: QdrantClient, collection_name: str, model: HuggingFaceEmbeddings
+        client: "QdrantClient", collection_name: str, model: "HuggingFaceEmbeddings"
     ):
         """Check if the Qdrant collection exists and create it if it does not."""
+        from langchain_qdrant import Qdrant
+        from qdrant_client import models
+
         if client is None:
             raise ValueError("Qdrant client is not initialized.")
         if client.collection_exists(collection_name=f"{collection_name}"):
@@ -103,7 +113,7 @@ class QdrantVectorStoreManager:
 
     @staticmethod
     def _init_online_vector_db(
-        url: str, api_key: str, collection_name: str, model: HuggingFaceEmbeddings
+        url: str, api_key: str, collection_name: str, model: "HuggingFaceEmbeddings"
     ):
         """Initialize the Qdrant client that is connected to an online vector store with the given URL and API key.
 
@@ -118,6 +128,8 @@ class QdrantVectorStoreManager:
         if url is None:
             raise ValueError("Please provide a url for the Qdrant server.")
 
+        from qdrant_client import QdrantClient
+
         try:
             client = QdrantClient(url=url, api_key=api_key)
             return QdrantVectorStoreManager._check_create_collection(
@@ -128,7 +140,7 @@ class QdrantVectorStoreManager:
 
     @staticmethod
     def _init_offline_vector_db(
-        vector_store_path: str, collection_name: str, model: HuggingFaceEmbeddings
+        vector_store_path: str, collection_name: str, model: "HuggingFaceEmbeddings"
     ):
         """Initialize the Qdrant client that is connected to an offline vector store with the given vector store folder path.
 
@@ -138,6 +150,8 @@ class QdrantVectorStoreManager:
         if vector_store_path is None:
             raise ValueError("Please provide a folder path.")
 
+        from qdrant_client import QdrantClient
+
         try:
             client = QdrantClient(path=vector_store_path)
             return QdrantVectorStoreManager._check_create_collection(
@@ -190,6 +204,11 @@ class QdrantVectorStoreManager:
         if collection_name is None:
             raise ValueError("Please provide a collection name.")
 
+        import pandas as pd
+        from langchain_core.documents import Document
+        from langchain_huggingface import HuggingFaceEmbeddings
+        from tqdm import tqdm
+
         model_kwargs = {"device": device}
         encode_kwargs = {"normalize_embeddings": True}
         model = HuggingFaceEmbeddings(
@@ -640,6 +659,8 @@ class WebPageHelper:
             snippet_chunk_size: Maximum character count for each snippet.
             max_thread_num: Maximum number of threads to use for concurrent requests (e.g., downloading webpages).
         """
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         self.httpx_client = httpx.Client(verify=False)
         self.min_char_count = min_char_count
         self.max_thread_num = max_thread_num
@@ -663,33 +684,83 @@ class WebPageHelper:
             ],
         )
 
+    @staticmethod
+    def _track_download():
+        return track(DOWNLOADS, DOWNLOAD_SECONDS, DOWNLOADS_IN_FLIGHT)
+
     def download_webpage(self, url: str):
-        try:
-            res = self.httpx_client.get(url, timeout=4)
-            if res.status_code >= 400:
-                res.raise_for_status()
-            return res.content
-        except httpx.HTTPError as exc:
-            print(f"Error while requesting {exc.request.url!r} - {exc!r}")
-            return None
+        with span("download", "download", url=url) as s:
+            try:
+                with self._track_download():
+                    res = self.httpx_client.get(url, timeout=4)
+                    s.set(status_code=res.status_code, bytes=len(res.content))
+                    DOWNLOAD_BYTES.inc(len(res.content))
+                    if res.status_code >= 400:
+                        res.raise_for_status()
+                return res.content
+            except httpx.HTTPError as exc:
+                print(f"Error while requesting {exc.request.url!r} - {exc!r}")
+                return None
+
+    async def adownload_webpage(self, client: httpx.AsyncClient, url: str):
+        """Asyncio counterpart of `download_webpage()`."""
+        with span("download", "download", url=url) as s:
+            try:
+                with self._track_download():
+                    res = await client.get(url, timeout=4)
+                    s.set(status_code=res.status_code, bytes=len(res.content))
+                    DOWNLOAD_BYTES.inc(len(res.content))
+                    if res.status_code >= 400:
+                        res.raise_for_status()
+                return res.content
+            except httpx.HTTPError as exc:
+                print(f"Error while requesting {exc.request.url!r} - {exc!r}")
+                return None
 
     def urls_to_articles(self, urls: List[str]) -> Dict:
         with concurrent.futures.ThreadPoolExecutor(
             max_workers=self.max_thread_num
         ) as executor:
-            htmls = list(executor.map(self.download_webpage, urls))
+            htmls = list(executor.map(propagate_context(self.download_webpage), urls))
 
-        articles = {}
+        return self._htmls_to_articles(htmls, urls)
 
-        for h, u in zip(htmls, urls):
-            if h is None:
-                continue
-            article_text = extract(
-                h,
+    async def aurls_to_articles(self, urls: List[str]) -> Dict:
+        """Asyncio counterpart of `urls_to_articles()`.
+
+        At most `max_thread_num` downloads are in flight; text extraction runs in a worker thread so that it does
+        not block the event loop.
+        """
+        semaphore = asyncio.Semaphore(self.max_thread_num)
+        async with httpx.AsyncClient(verify=False) as client:
+
+            async def download(url):
+                async with semaphore:
+                    return await self.adownload_webpage(client, url)
+
+            htmls = await asyncio.gather(*[download(u) for u in urls])
+
+        return await asyncio.to_thread(self._htmls_to_articles, htmls, urls)
+
+    @staticmethod
+    def _extract(html):
+        from trafilatura import extract
+
+        with span("extract", "download", bytes=len(html)):
+            return extract(
+                html,
                 include_tables=False,
                 include_comments=False,
                 output_format="txt",
             )
+
+    def _htmls_to_articles(self, htmls: List, urls: List[str]) -> Dict:
+        articles = {}
+
+        for h, u in zip(htmls, urls):
+            if h is None:
+                continue
+            article_text = self._extract(h)
             if article_text is not None and len(article_text) > self.min_char_count:
                 articles[u] = {"text": article_text}
 
@@ -702,6 +773,14 @@ class WebPageHelper:
 
         return articles
 
+    async def aurls_to_snippets(self, urls: List[str]) -> Dict:
+        """Asyncio counterpart of `urls_to_snippets()`."""
+        articles = await self.aurls_to_articles(urls)
+        for u in articles:
+            articles[u]["snippets"] = self.text_splitter.split_text(articles[u]["text"])
+
+        return articles
+
 
 def user_input_appropriateness_check(user_input):
     my_openai_model = OpenAIModel(
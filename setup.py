@@ -11,7 +11,9 @@ with open("README.md", encoding="utf-8") as f:
 
 # Read the content of the requirements.txt file
 with open("requirements.txt", encoding="utf-8") as f:
-    requirements = f.read().splitlines()
+    requirements = [
+        line for line in f.read().splitlines() if line and not line.startswith("#")
+    ]
 
 
 setup(
@@ -35,4 +37,8 @@ setup(
     ],
     python_requires=">=3.10",
     install_requires=requirements,
+    extras_require={
+        # Faster HTML parsing of the related pages in persona generation.
+        "lxml": ["lxml"],
+    },
 )
@@ -1,7 +1,8 @@
 import os
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
 from knowledge_storm.rm import BingSearch
 from knowledge_storm.lm import TogetherClient
+from knowledge_storm.metrics import start_metrics_server
 from knowledge_storm import STORMWikiRunnerArguments, STORMWikiRunner, STORMWikiLMConfigs
 
 def main(args):
@@ -10,7 +11,11 @@ def main(args):
         'api_key': os.getenv("TOGETHER_API_KEY"),
         'temperature': 1.0,
         'top_p': 0.9,
-        "stop": ('\n\n---',)
+        "stop": ('\n\n---',),
+        # Rate limits are shared by every client of the same model, across all threads.
+        'requests_per_minute': args.requests_per_minute,
+        'tokens_per_minute': args.tokens_per_minute,
+        'max_thread_num': args.max_thread_num,
     }
     # STORM is a LM system so different components can be powered by different models to reach a good balance between cost and quality.
     # For a good practice, choose a cheaper/faster model for `conv_simulator_lm` which is used to split queries, synthesize answers in the conversation.
@@ -22,12 +27,25 @@ def main(args):
     lm_configs.set_outline_gen_lm(llama_8B)
     lm_configs.set_article_gen_lm(llama_8B)
     lm_configs.set_article_polish_lm(llama_8B)
+    lm_configs.set_mindmap_lm(llama_8B)
+    if args.hedge_lm_requests:
+        # Duplicate unusually slow conversation turns; the first response wins.
+        lm_configs.enable_hedging()
+    if args.metrics_port:
+        # Prometheus metrics at http://127.0.0.1:<port>/metrics while the run is in progress.
+        lm_configs.enable_metrics()
+        start_metrics_server(port=args.metrics_port)
     engine_args = STORMWikiRunnerArguments(
         output_dir=args.output_dir,
         max_conv_turn=args.max_conv_turn,
         max_perspective=args.max_perspective,
         search_top_k=args.search_top_k,
         max_thread_num=args.max_thread_num,
+        min_information_gain=args.min_information_gain,
+        questions_per_round=args.questions_per_round,
+        artifact_format=args.artifact_format,
+        trace_format=args.trace_format,
+        profile=args.profile,
     )
     rm = BingSearch(bing_search_api_key=os.getenv("BING_SEARCH_API_KEY")) # replace with Bing APi
     runner = STORMWikiRunner(engine_args, lm_configs, rm)
@@ -36,10 +54,10 @@ def main(args):
     try:
         runner.run(
             topic=topic,
-            do_research=True,
-            do_generate_outline=True,
-            do_generate_article=True,
-            do_polish_article=True,
+            do_research=args.do_research,
+            do_generate_outline=args.do_generate_outline,
+            do_generate_article=args.do_generate_article,
+            do_polish_article=args.do_polish_article,
             remove_duplicate=True
         )
         runner.post_run()
@@ -56,15 +74,22 @@ if __name__ == '__main__':
                         help='Maximum number of threads to use. The information seeking part and the article generation'
                              'part can speed up by using multiple threads. Consider reducing it if keep getting '
                              '"Exceed rate limit" error when calling LM API.')
-    # stage of the pipeline
-    parser.add_argument('--do-research', action='store_true',
-                        help='If True, simulate conversation to research the topic; otherwise, load the results.')
-    parser.add_argument('--do-generate-outline', action='store_true',
-                        help='If True, generate an outline for the topic; otherwise, load the results.')
-    parser.add_argument('--do-generate-article', action='store_true',
-                        help='If True, generate an article for the topic; otherwise, load the results.')
-    parser.add_argument('--do-polish-article', action='store_true',
-                        help='If True, polish the article by adding a summarization section and (optionally) removing '
+    parser.add_argument('--requests-per-minute', type=float, default=None,
+                        help='Maximum number of LM requests per minute per model. No limit if not set.')
+    parser.add_argument('--tokens-per-minute', type=float, default=None,
+                        help='Maximum number of LM tokens (prompt + completion) per minute per model. No limit if not set.')
+    parser.add_argument('--hedge-lm-requests', action='store_true',
+                        help='If True, resend LM calls of the information-seeking conversation that take longer than '
+                             'the observed p90 latency and use the first response.')
+    # stage of the pipeline; a stage whose flag is omitted runs only if its inputs changed since the last run
+    parser.add_argument('--do-research', action=BooleanOptionalAction,
+                        help='If set, simulate conversation to research the topic; with --no-do-research, load the results.')
+    parser.add_argument('--do-generate-outline', action=BooleanOptionalAction,
+                        help='If set, generate an outline for the topic; with --no-do-generate-outline, load the results.')
+    parser.add_argument('--do-generate-article', action=BooleanOptionalAction,
+                        help='If set, generate an article for the topic; with --no-do-generate-article, load the results.')
+    parser.add_argument('--do-polish-article', action=BooleanOptionalAction,
+                        help='If set, polish the article by adding a summarization section and (optionally) removing '
                              'duplicate content.')
     # hyperparameters for the pre-writing stage
     parser.add_argument('--max-conv-turn', type=int, default=2,
@@ -73,6 +98,24 @@ if __name__ == '__main__':
                         help='Maximum number of perspectives to consider in perspective-guided question asking.')
     parser.add_argument('--search-top-k', type=int, default=3,
                         help='Top k search results to consider for each search query.')
+    parser.add_argument('--min-information-gain', type=float, default=0.0,
+                        help='End a perspective\'s conversation early when a turn brings less new information (new '
+                             'URLs, snippets and mindmap nodes, from 0 to 1) than this. 0 disables early stopping.')
+    parser.add_argument('--questions-per-round', type=int, default=1,
+                        help='Number of questions asked at once and answered concurrently in each round of a '
+                             'perspective\'s conversation.')
+    parser.add_argument('--artifact-format', choices=['json', 'compact'], default='json',
+                        help='Write the conversation log and the search results as JSON files, or deduplicated and '
+                             'compressed in storm_artifacts.zip.')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve the throughput and latency metrics of the LM, search, embedding and download calls '
+                             'in the Prometheus text format on this port.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Write a CPU and memory profile of each stage to the profile folder of the article output '
+                             'directory.')
+    parser.add_argument('--trace-format', choices=['chrome', 'otlp'], default=None,
+                        help='Trace the LM, search, embedding and download calls and write the trace to the article '
+                             'output directory as a Chrome trace or OTLP JSON.')
     # hyperparameters for the writing stage
     parser.add_argument('--retrieve-top-k', type=int, default=3,
                         help='Top k collected references for each section title.')
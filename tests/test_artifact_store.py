@@ -0,0 +1,147 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from knowledge_storm.storm_wiki.artifact_store import ArtifactStore
+from knowledge_storm.storm_wiki.engine import (
+    STORMWikiLMConfigs,
+    STORMWikiRunner,
+    STORMWikiRunnerArguments,
+)
+
+
+def information(url, snippets):
+    return {
+        "url": url,
+        "description": f"About {url}",
+        "snippets": snippets,
+        "title": url,
+        "meta": {},
+        "citation_uuid": -1,
+    }
+
+
+def make_artifacts():
+    # The shared snippet is found by both turns and under both URLs.
+    shared = "A snippet found by every search."
+    a = information("https://a.org", [shared, "Only in a."])
+    b = information("https://b.org", [shared])
+    conversation_log = [
+        {
+            "perspective": "Basic fact writer",
+            "dlg_turns": [
+                {
+                    "agent_utterance": "Answer 1",
+                    "user_utterance": "Question 1",
+                    "search_queries": ["query 1"],
+                    "search_results": [a, b],
+                },
+                {
+                    "agent_utterance": "Answer 2",
+                    "user_utterance": "Question 2",
+                    "search_queries": ["query 2"],
+                    "search_results": [a],
+                },
+            ],
+        }
+    ]
+    return {
+        "conversation_log.json": conversation_log,
+        "raw_search_results.json": {"https://a.org": a, "https://b.org": b},
+        "url_to_info.json": {
+            "url_to_info": {"https://a.org": a, "https://b.org": b},
+            "url_to_unified_index": {"https://a.org": 1, "https://b.org": 2},
+        },
+        "graph_mindmap.json": {"nodes": ["topic"], "edges": []},
+    }
+
+
+def read_zip_member(path, name):
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read(name))
+
+
+def test_artifacts_round_trip_with_each_snippet_stored_once(tmp_path):
+    artifacts = make_artifacts()
+    store = ArtifactStore.for_article_dir(str(tmp_path))
+    store.save_many(artifacts)
+
+    reopened = ArtifactStore.for_article_dir(str(tmp_path))
+    assert reopened.names() == sorted(artifacts)
+    for name, data in artifacts.items():
+        assert reopened.load(name) == data
+    snippets = read_zip_member(store.path, ArtifactStore.SNIPPETS_MEMBER)
+    assert sorted(snippets.values()) == [
+        "A snippet found by every search.",
+        "Only in a.",
+    ]
+    assert len(read_zip_member(store.path, ArtifactStore.INFORMATION_MEMBER)) == 2
+
+
+def test_replacing_an_artifact_drops_the_records_only_it_used(tmp_path):
+    artifacts = make_artifacts()
+    store = ArtifactStore.for_article_dir(str(tmp_path))
+    store.save_many(artifacts)
+    hash_before = store.member_hash("raw_search_results.json")
+
+    store.save("conversation_log.json", [])
+    store.save("raw_search_results.json", {})
+    store.save("url_to_info.json", {"url_to_info": {}, "url_to_unified_index": {}})
+
+    assert store.member_hash("raw_search_results.json") != hash_before
+    assert read_zip_member(store.path, ArtifactStore.SNIPPETS_MEMBER) == {}
+    assert read_zip_member(store.path, ArtifactStore.INFORMATION_MEMBER) == {}
+    assert store.load("graph_mindmap.json") == artifacts["graph_mindmap.json"]
+
+
+def test_json_directory_converts_to_the_store_and_back(tmp_path):
+    artifacts = make_artifacts()
+    json_dir, export_dir = tmp_path / "json", tmp_path / "export"
+    json_dir.mkdir()
+    export_dir.mkdir()
+    for name, data in artifacts.items():
+        (json_dir / name).write_text(json.dumps(data, indent=2))
+
+    store = ArtifactStore.for_article_dir(str(json_dir))
+    imported = store.import_json_dir(str(json_dir), remove_json=True)
+    assert sorted(imported) == sorted(ArtifactStore.ARTIFACTS)
+    # Only the known artifacts are moved into the store.
+    assert sorted(os.listdir(json_dir)) == [
+        "graph_mindmap.json",
+        ArtifactStore.FILE_NAME,
+    ]
+
+    assert sorted(store.export_json_dir(str(export_dir))) == sorted(imported)
+    for name in imported:
+        assert json.loads((export_dir / name).read_text()) == artifacts[name]
+
+
+@pytest.mark.parametrize("artifact_format", ["json", "compact"])
+def test_runner_artifacts_round_trip_in_each_format(tmp_path, artifact_format):
+    runner = STORMWikiRunner(
+        STORMWikiRunnerArguments(
+            output_dir=str(tmp_path), artifact_format=artifact_format
+        ),
+        STORMWikiLMConfigs(),
+        rm=None,
+    )
+    runner._prepare_run("Test topic", True, None, None, None)
+    artifacts = make_artifacts()
+    runner._dump_json_artifacts(artifacts)
+
+    json_files = {
+        name
+        for name in artifacts
+        if os.path.exists(os.path.join(runner.article_output_dir, name))
+    }
+    if artifact_format == "json":
+        assert json_files == set(artifacts)
+        assert runner.artifact_store.names() == []
+    else:
+        assert json_files == set()
+        assert runner.artifact_store.names() == sorted(artifacts)
+    for name, data in artifacts.items():
+        assert runner._load_json_artifact(name) == data
+    assert runner._load_json_artifact("missing.json") is None
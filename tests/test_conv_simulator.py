@@ -0,0 +1,100 @@
+import threading
+import time
+
+import dspy
+import pytest
+
+from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
+from knowledge_storm.storm_wiki.modules.graph import MindmapGraph
+from knowledge_storm.storm_wiki.modules.knowledge_curation import ConvSimulator
+from knowledge_storm.storm_wiki.modules.storm_dataclass import DialogueTurn
+
+THANKS = "Thank you so much for your help!"
+
+
+class FakeWriter:
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+
+    def __call__(self, **kwargs):
+        return dspy.Prediction(questions=self.rounds.pop(0))
+
+
+class FakeExpert:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.questions = []
+        self.threads = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, topic, question, ground_truth_url):
+        with self._lock:
+            self.questions.append(question)
+            self.threads.add(threading.current_thread().name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return dspy.Prediction(
+            answer=f"answer to {question}", queries=[], searched_results=[]
+        )
+
+
+@pytest.fixture(autouse=True)
+def no_mindmap_lm(monkeypatch):
+    monkeypatch.setattr(MindmapGraph, "process_passage", lambda self, passage: "")
+
+
+def make_simulator(rounds, expert, max_turn, questions_per_round, max_thread_num=10):
+    simulator = ConvSimulator(
+        topic_expert_engine=None,
+        question_asker_engine=None,
+        retriever=None,
+        max_search_queries_per_turn=1,
+        search_top_k=1,
+        max_turn=max_turn,
+        questions_per_round=questions_per_round,
+        max_thread_num=max_thread_num,
+    )
+    simulator.wiki_writer = FakeWriter(rounds)
+    simulator.topic_expert = expert
+    return simulator
+
+
+def converse(simulator):
+    return simulator(
+        topic="topic",
+        persona="persona",
+        ground_truth_url="",
+        callback_handler=BaseCallbackHandler(),
+        opening_turn=DialogueTurn(agent_utterance="opening", user_utterance="start"),
+    ).dlg_history
+
+
+def test_thank_you_only_drops_that_question():
+    expert = FakeExpert()
+    simulator = make_simulator(
+        [["q1", THANKS, "q2"], ["q3"]], expert, max_turn=10, questions_per_round=3
+    )
+    dlg_history = converse(simulator)
+    assert sorted(expert.questions) == ["q1", "q2"]
+    # The writer said thank you, so there is no further round.
+    assert [turn.user_utterance for turn in dlg_history] == ["start", "q1", "q2"]
+
+
+def test_answers_share_one_bounded_pool():
+    expert = FakeExpert(delay=0.05)
+    simulator = make_simulator(
+        [["a", "b", "c", "d"], ["e", "f", "g", "h"]],
+        expert,
+        max_turn=9,
+        questions_per_round=4,
+        max_thread_num=2,
+    )
+    assert len(converse(simulator)) == 9
+    assert expert.max_in_flight == 2
+    # The threads of the first round are reused by the second one.
+    assert len(expert.threads) == 2
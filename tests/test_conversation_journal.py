@@ -0,0 +1,195 @@
+import asyncio
+import json
+import threading
+
+import dspy
+import pytest
+
+from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
+from knowledge_storm.storm_wiki.modules.graph import MindmapGraph
+from knowledge_storm.storm_wiki.modules.knowledge_curation import (
+    ConversationJournal,
+    StormKnowledgeCurationModule,
+)
+from knowledge_storm.storm_wiki.modules.storm_dataclass import DialogueTurn
+
+RUN_ARGS = {"max_conv_turn": 3, "models": {"conv_simulator_lm": "model-a"}}
+
+
+def test_turns_are_resumed_for_the_same_topic_and_arguments(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ConversationJournal(path, "topic", RUN_ARGS)
+    journal.record_persona("a")
+    journal.record_persona("b")
+    journal.record_personas_end()
+    journal.record_turn(
+        "a",
+        DialogueTurn(
+            agent_utterance="x",
+            user_utterance="q",
+            search_queries=[],
+            search_results=[],
+        ),
+        None,
+    )
+    journal.record_finished("a")
+
+    resumed = ConversationJournal(path, "topic", dict(RUN_ARGS))
+    assert resumed.personas == ["a", "b"]
+    assert resumed.personas_complete
+    assert [turn.user_utterance for turn in resumed.get_turns("a")] == ["q"]
+    assert resumed.finished == {"a"}
+
+
+@pytest.mark.parametrize(
+    "topic, run_args",
+    [
+        ("other topic", RUN_ARGS),
+        ("topic", {**RUN_ARGS, "max_conv_turn": 5}),
+        ("topic", {**RUN_ARGS, "models": {"conv_simulator_lm": "model-b"}}),
+    ],
+)
+def test_journal_of_another_run_is_discarded(tmp_path, topic, run_args):
+    path = str(tmp_path / "journal.jsonl")
+    ConversationJournal(path, "topic", RUN_ARGS).record_persona("a")
+
+    journal = ConversationJournal(path, topic, run_args)
+    assert journal.personas == []
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [
+            {"topic": topic, "run_args": run_args}
+        ]
+
+
+class FakePersonaGenerator:
+    def __init__(self, personas=("Basic fact writer", "Historian")):
+        self.personas = list(personas)
+
+    def iter_personas(self, topic, max_num_persona):
+        yield from self.personas[: max_num_persona + 1]
+
+
+@pytest.fixture
+def curation_module():
+    return StormKnowledgeCurationModule(
+        retriever=None,
+        persona_generator=FakePersonaGenerator(),
+        conv_simulator_lm=None,
+        question_asker_lm=None,
+        max_search_queries_per_turn=1,
+        search_top_k=3,
+        max_conv_turn=0,
+        max_thread_num=2,
+    )
+
+
+def test_personas_of_an_interrupted_generation_are_resumed(curation_module, tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    run_args = {"topic": "topic"}
+    # The run crashed after the first persona was journaled.
+    ConversationJournal(path, "topic", run_args).record_persona("Basic fact writer")
+
+    journal = ConversationJournal(path, "topic", run_args)
+    curation_module.persona_generator = FakePersonaGenerator(
+        ["Basic fact writer, worded differently", "Historian"]
+    )
+    assert list(curation_module._iter_personas("topic", 1, False, journal)) == [
+        "Basic fact writer",
+        "Historian",
+    ]
+    resumed = ConversationJournal(path, "topic", run_args)
+    assert resumed.personas == ["Basic fact writer", "Historian"]
+    assert resumed.personas_complete
+    # A complete list of personas is not generated again.
+    curation_module.persona_generator = None
+    assert list(curation_module._iter_personas("topic", 1, False, resumed)) == [
+        "Basic fact writer",
+        "Historian",
+    ]
+
+
+class RecordingCallbackHandler(BaseCallbackHandler):
+    def __init__(self):
+        self.events = []
+
+    def on_identify_perspective_start(self, **kwargs):
+        self.events.append("identify_perspective_start")
+
+    def on_identify_perspective_end(self, **kwargs):
+        self.events.append("identify_perspective_end")
+
+    def on_information_gathering_start(self, **kwargs):
+        self.events.append("information_gathering_start")
+
+    def on_dialogue_turn_end(self, dlg_turn, **kwargs):
+        self.events.append(f"turn of {dlg_turn}")
+
+    def on_information_gathering_end(self, **kwargs):
+        self.events.append("information_gathering_end")
+
+
+class GatedPersonaGenerator:
+    def __init__(self):
+        self.first_conversation_started = threading.Event()
+
+    def iter_personas(self, topic, max_num_persona):
+        yield "Basic fact writer"
+        # The next persona is only produced once the first conversation has started.
+        assert self.first_conversation_started.wait(5)
+        yield "Historian"
+
+
+@pytest.mark.parametrize("use_asyncio", [False, True])
+def test_conversations_start_as_their_personas_are_journaled(
+    curation_module, tmp_path, monkeypatch, use_asyncio
+):
+    path = str(tmp_path / "journal.jsonl")
+    persona_generator = GatedPersonaGenerator()
+    journaled_at_start = {}
+
+    def conv_simulator(persona, callback_handler, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            journaled_at_start[persona] = [
+                json.loads(line)["persona"] for line in f if '"persona"' in line
+            ]
+        persona_generator.first_conversation_started.set()
+        callback_handler.on_dialogue_turn_end(dlg_turn=persona)
+        return dspy.Prediction(dlg_history=[], mindmap=MindmapGraph())
+
+    curation_module.persona_generator = persona_generator
+    monkeypatch.setattr(curation_module.conv_simulator, "forward", conv_simulator)
+    callback_handler = RecordingCallbackHandler()
+    kwargs = dict(
+        topic="topic",
+        ground_truth_url="",
+        callback_handler=callback_handler,
+        max_perspective=1,
+        disable_perspective=False,
+        journal_path=path,
+    )
+    if use_asyncio:
+        information_table, _ = asyncio.run(curation_module.aresearch(**kwargs))
+    else:
+        information_table, _ = curation_module.research(**kwargs)
+
+    # Each persona is journaled before its own conversation starts, and the first conversation doesn't wait
+    # for the other personas.
+    assert journaled_at_start == {
+        "Basic fact writer": ["Basic fact writer"],
+        "Historian": ["Basic fact writer", "Historian"],
+    }
+    assert sorted(p for p, _ in information_table.conversations) == [
+        "Basic fact writer",
+        "Historian",
+    ]
+    # The dialogue turn callbacks are held back until the information gathering starts.
+    assert callback_handler.events[:3] == [
+        "identify_perspective_start",
+        "identify_perspective_end",
+        "information_gathering_start",
+    ]
+    assert sorted(callback_handler.events[3:5]) == [
+        "turn of Basic fact writer",
+        "turn of Historian",
+    ]
+    assert callback_handler.events[5:] == ["information_gathering_end"]
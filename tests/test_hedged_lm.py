@@ -0,0 +1,75 @@
+import concurrent.futures
+import threading
+import time
+import uuid
+
+from knowledge_storm.lm import HedgedLM
+
+
+class SleepyLM:
+    """Fake client whose i-th call sleeps `delays[i]` seconds (the last delay for later calls)."""
+
+    def __init__(self, delays):
+        self.model = f"sleepy-{uuid.uuid4()}"
+        self.kwargs = {"model": self.model}
+        self.history = []
+        self.delays = delays
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, **kwargs):
+        with self._lock:
+            delay = self.delays[min(self.calls, len(self.delays) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        return [f"{prompt} after {delay}"]
+
+
+def make_hedged_lm(lm, observed_latency, **kwargs):
+    hedged_lm = HedgedLM(
+        lm, min_samples=5, min_hedge_delay=0.01, max_hedge_fraction=1, **kwargs
+    )
+    for _ in range(5):
+        hedged_lm.latency.observe(observed_latency)
+    return hedged_lm
+
+
+def test_slow_request_is_hedged_and_the_first_response_wins():
+    lm = SleepyLM([1.0, 0.0])
+    hedged_lm = make_hedged_lm(lm, observed_latency=0.05)
+    start = time.monotonic()
+    assert hedged_lm("q") == ["q after 0.0"]
+    assert time.monotonic() - start < 0.5
+    stats = hedged_lm.get_hedge_stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_queued_requests_are_timed_from_when_they_start():
+    lm = SleepyLM([0.2])
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    # The hedge delay is well above the latency of a request, so no call should be hedged even though the
+    # requests wait for a thread of the bounded pool.
+    hedged_lm = make_hedged_lm(lm, observed_latency=0.5, executor=executor)
+    latencies = []
+    hedged_lm.latency.observe = latencies.append
+    threads = [threading.Thread(target=hedged_lm, args=("q",)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    executor.shutdown()
+    assert lm.calls == 6
+    assert hedged_lm.get_hedge_stats()["hedged"] == 0
+    # Every observed latency is the latency of a single request, without the time spent in the queue.
+    assert len(latencies) == 6 and max(latencies) < 0.3
+
+
+def test_sync_calls_share_a_bounded_pool():
+    lm = SleepyLM([0.0])
+    first = make_hedged_lm(lm, observed_latency=0.05)
+    second = make_hedged_lm(lm, observed_latency=0.05)
+    first("q")
+    second("q")
+    executor = HedgedLM._get_shared_executor()
+    assert executor is HedgedLM._get_shared_executor()
+    assert executor._max_workers == HedgedLM.SHARED_EXECUTOR_MAX_WORKERS
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from knowledge_storm.lm import LMEndpointPool, OllamaClient, TGIClient, VLLMClient
+
+
+class FakeClient:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.model = "model"
+        self.kwargs = {"model": "model"}
+        self.history = []
+        self.calls = 0
+
+    def __call__(self, prompt, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        return [f"{self.name}: {prompt}"]
+
+
+def make_pool(clients, **kwargs):
+    return LMEndpointPool(clients, health_check_interval=None, **kwargs)
+
+
+def test_requests_go_to_the_endpoint_with_the_fewest_outstanding_requests():
+    pool = make_pool([FakeClient("a"), FakeClient("b")])
+    first = pool._pick_endpoint([])
+    second = pool._pick_endpoint([])
+    assert {first.name, second.name} == {"endpoint-0", "endpoint-1"}
+    pool._release(first, 0.1)
+    assert pool._pick_endpoint([]) is first
+
+
+def test_latency_ewma_routing_prefers_the_faster_endpoint():
+    pool = make_pool([FakeClient("a"), FakeClient("b")], routing="latency_ewma")
+    slow, fast = pool.endpoints
+    slow.latency_ewma, fast.latency_ewma = 2.0, 0.5
+    assert pool._pick_endpoint([]) is fast
+
+
+def test_failed_requests_fail_over_and_eject_the_endpoint():
+    down, up = FakeClient("a", fail=True), FakeClient("b")
+    pool = make_pool([down, up], failure_threshold=2, ejection_time=60)
+    # Force the first requests onto the failing endpoint.
+    pool.endpoints[1].outstanding = 10
+    assert pool("q") == ["b: q"]
+    assert pool("q") == ["b: q"]
+    assert down.calls == 2
+    pool.endpoints[1].outstanding = 0
+    assert pool.endpoints[0].ejected_until > 0
+    for _ in range(3):
+        assert pool("q") == ["b: q"]
+    assert down.calls == 2
+
+
+def test_all_endpoints_failing_raises_the_last_error():
+    pool = make_pool([FakeClient("a", fail=True), FakeClient("b", fail=True)])
+    with pytest.raises(ConnectionError):
+        pool("q")
+
+
+def test_health_check_readmits_and_ejects_endpoints(monkeypatch):
+    pool = make_pool([FakeClient("a"), FakeClient("b")], ejection_time=60)
+    ejected, healthy = pool.endpoints
+    ejected.health_url, healthy.health_url = "http://a/health", "http://b/health"
+    ejected.ejected_until = float("inf")
+    ejected.consecutive_failures = 3
+    status = {"http://a/health": 200, "http://b/health": 503}
+    monkeypatch.setattr(
+        requests,
+        "get",
+        lambda url, timeout: SimpleNamespace(status_code=status[url]),
+    )
+    pool._check_health()
+    assert ejected.ejected_until == 0.0 and ejected.consecutive_failures == 0
+    assert healthy.ejected_until > 0
+    assert pool._pick_endpoint([]) is ejected
+
+
+def test_health_urls_follow_the_client_attributes():
+    ollama = OllamaClient(model="llama3", port=11434, url="localhost")
+    assert ollama.base_url == "http://localhost:11434"
+    assert LMEndpointPool._health_url(ollama) == "http://localhost:11434/api/version"
+    tgi = TGIClient(model="m", port=8080, url="http://tgi")
+    assert LMEndpointPool._health_url(tgi) == "http://tgi:8080/health"
+    vllm = VLLMClient(model="m", port=8000, url="http://vllm")
+    assert LMEndpointPool._health_url(vllm) == "http://vllm:8000/health"
+    assert LMEndpointPool._health_url(FakeClient("a")) is None
@@ -0,0 +1,167 @@
+import copy
+import gzip
+import hashlib
+import json
+import os
+
+from knowledge_storm.lm_history import LMCallHistory, LMHistorySink
+from knowledge_storm.storm_wiki.engine import STORMWikiLMConfigs
+
+
+def call(i, prompt="Tell me about the topic."):
+    return {
+        "prompt": prompt,
+        "response": {"choices": [{"text": f"Answer {i}"}]},
+        "kwargs": {"temperature": 1.0},
+    }
+
+
+def read_jsonl(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def written_answers(paths):
+    return [
+        record["response"]["choices"][0]["text"]
+        for path in paths
+        for record in read_jsonl(path)
+    ]
+
+
+def max_bytes_for(tmp_path, num_records):
+    """A `max_bytes` rotating the file after every `num_records` records of `call()`."""
+    probe = LMHistorySink(str(tmp_path / "probe.jsonl"), max_bytes=0)
+    probe.write(call(0))
+    probe.close()
+    # The records differ in length by a few characters of the timestamp.
+    return int((num_records - 0.5) * os.path.getsize(probe.path))
+
+
+def test_sink_rotates_and_keeps_backup_count_files(tmp_path):
+    max_bytes = max_bytes_for(tmp_path, 2)
+    path = str(tmp_path / "lm_history.jsonl")
+    sink = LMHistorySink(path, max_bytes=max_bytes, backup_count=2)
+    for i in range(7):
+        sink.write(call(i), source="conv_simulator_lm")
+    sink.close()
+
+    assert sink.num_records == 7
+    assert sorted(os.listdir(tmp_path)) == [
+        "lm_history.jsonl",
+        "lm_history.jsonl.1",
+        "lm_history.jsonl.2",
+        "probe.jsonl",
+    ]
+    # The records 0 and 1 were in the backup pruned by the third rotation.
+    assert written_answers([f"{path}.2", f"{path}.1", path]) == [
+        f"Answer {i}" for i in range(2, 7)
+    ]
+    record = read_jsonl(path)[0]
+    assert record["lm"] == "conv_simulator_lm"
+    assert "kwargs" not in record
+
+
+def test_sink_compresses_the_rotated_files(tmp_path):
+    max_bytes = max_bytes_for(tmp_path, 2)
+    path = str(tmp_path / "lm_history.jsonl")
+    sink = LMHistorySink(path, max_bytes=max_bytes, backup_count=3, compress=True)
+    for i in range(6):
+        sink.write(call(i))
+    sink.close()
+
+    # The last write rotated the file, the next write creates it again.
+    assert not os.path.exists(path)
+    backups = [f"{path}.{i}.gz" for i in (3, 2, 1)]
+    assert written_answers(backups) == [f"Answer {i}" for i in range(6)]
+
+
+def test_sink_without_backups_drops_the_rotated_records(tmp_path):
+    max_bytes = max_bytes_for(tmp_path, 2)
+    path = str(tmp_path / "lm_history.jsonl")
+    sink = LMHistorySink(path, max_bytes=max_bytes, backup_count=0)
+    for i in range(5):
+        sink.write(call(i))
+    sink.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["lm_history.jsonl", "probe.jsonl"]
+    assert written_answers([path]) == ["Answer 4"]
+
+
+def test_sink_redacts_prompts(tmp_path):
+    path = str(tmp_path / "lm_history.jsonl")
+    sink = LMHistorySink(path, redact_prompts=True)
+    messages = [{"role": "user", "content": "A private document."}]
+    sink.write({"messages": messages, "response": "A completion"})
+    sink.close()
+
+    [record] = read_jsonl(path)
+    text = json.dumps(messages, default=str)
+    assert record["messages"] == {
+        "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "chars": len(text),
+    }
+    assert record["response"] == "A completion"
+    assert "private" not in open(path).read()
+
+
+def test_sink_truncates_long_strings(tmp_path):
+    path = str(tmp_path / "lm_history.jsonl")
+    sink = LMHistorySink(path, max_text_chars=5)
+    sink.write({"prompt": "Short", "response": {"text": ["A long completion"]}})
+    sink.close()
+
+    [record] = read_jsonl(path)
+    assert record["prompt"] == "Short"
+    assert record["response"] == {"text": ["A lon...[truncated 12 chars]"]}
+
+
+def test_call_history_keeps_the_last_calls_and_streams_all(tmp_path):
+    path = str(tmp_path / "lm_history.jsonl")
+    sink = LMHistorySink(path, max_bytes=0)
+    history = LMCallHistory(sink, source="article_gen_lm", max_size=3)
+    history.append(call(0))
+    history.extend([call(i) for i in range(1, 5)])
+
+    assert [entry["response"]["choices"][0]["text"] for entry in history] == [
+        "Answer 2",
+        "Answer 3",
+        "Answer 4",
+    ]
+    # Copies of the LM share the sink and the size bound.
+    copied = copy.deepcopy(history)
+    assert copied == history and copied is not history
+    copied.append(call(5))
+    assert len(copied) == 3 and len(history) == 3
+    sink.close()
+
+    assert written_answers([path]) == [f"Answer {i}" for i in range(6)]
+    assert {record["lm"] for record in read_jsonl(path)} == {"article_gen_lm"}
+
+
+class FakeLM:
+    def __init__(self):
+        self.history = []
+
+
+def test_lm_configs_stream_the_history_of_each_lm(tmp_path):
+    path = str(tmp_path / "lm_history.jsonl")
+    lm_configs = STORMWikiLMConfigs()
+    lm_configs.set_conv_simulator_lm(FakeLM())
+    lm_configs.set_article_gen_lm(FakeLM())
+    lm_configs.set_history_sink(LMHistorySink(path, max_bytes=0), max_history_size=2)
+    for i in range(3):
+        lm_configs.conv_simulator_lm.history.append(call(i))
+    lm_configs.article_gen_lm.history.append(call(3))
+
+    assert len(lm_configs.collect_and_reset_lm_history()) == 3
+    assert isinstance(lm_configs.conv_simulator_lm.history, LMCallHistory)
+    assert lm_configs.conv_simulator_lm.history == []
+    lm_configs.history_sink.close()
+    assert [record["lm"] for record in read_jsonl(path)] == [
+        "conv_simulator_lm",
+        "conv_simulator_lm",
+        "conv_simulator_lm",
+        "article_gen_lm",
+    ]
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from knowledge_storm.interface import LMConfigs
+from knowledge_storm.lm import (
+    BudgetedLM,
+    FairConcurrencyBudget,
+    HedgedLM,
+    MeteredLM,
+    TracedLM,
+)
+
+
+class FakeLM:
+    def __init__(self, model="fake-model"):
+        self.model = model
+        self.kwargs = {"model": model, "temperature": 0}
+        self.history = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, prompt, **kwargs):
+        self.history.append({"prompt": prompt})
+        return [prompt.upper()]
+
+    async def acall(self, prompt, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self(prompt, **kwargs)
+
+    def get_usage_and_reset(self):
+        return {self.model: {"prompt_tokens": 1, "completion_tokens": 2}}
+
+
+@pytest.mark.parametrize(
+    "make_wrapper",
+    [
+        lambda lm: BudgetedLM(lm, FairConcurrencyBudget(2), owner=0),
+        HedgedLM,
+        MeteredLM,
+        TracedLM,
+    ],
+)
+def test_wrappers_share_the_state_of_the_client(make_wrapper):
+    lm = FakeLM()
+    wrapper = make_wrapper(lm)
+    assert wrapper.model == "fake-model"
+    assert wrapper.kwargs is lm.kwargs
+    assert wrapper("hi") == ["HI"]
+    assert asyncio.run(wrapper.acall("hey")) == ["HEY"]
+    assert wrapper.history is lm.history and len(lm.history) == 2
+    wrapper.history = []
+    assert lm.history == []
+    assert wrapper.get_usage_and_reset() == lm.get_usage_and_reset()
+
+
+def test_budgeted_acall_waits_for_a_slot():
+    lm = FakeLM()
+    budget = FairConcurrencyBudget(1)
+    wrappers = [BudgetedLM(lm, budget, owner=owner) for owner in range(3)]
+
+    async def main():
+        return await asyncio.gather(*[w.acall(f"q{i}") for i, w in enumerate(wrappers)])
+
+    assert asyncio.run(main()) == [["Q0"], ["Q1"], ["Q2"]]
+    assert lm.max_in_flight == 1
+    assert budget.get_stats() == {"capacity": 1, "in_flight": 0, "waiting": 0}
+
+
+class FakeLMConfigs(LMConfigs):
+    def __init__(self):
+        shared_lm = FakeLM("shared")
+        self.question_lm = shared_lm
+        self.answer_lm = shared_lm
+        self.outline_lm = FakeLM("outline")
+        self.unset_lm = None
+
+
+def test_wrap_lms_wraps_each_client_once():
+    lm_configs = FakeLMConfigs()
+    lm_configs._wrap_lms(TracedLM)
+    assert isinstance(lm_configs.question_lm, TracedLM)
+    assert lm_configs.question_lm is lm_configs.answer_lm
+    assert lm_configs.outline_lm.model == "outline"
+    assert lm_configs.unset_lm is None
+
+    traced_lm = lm_configs.outline_lm
+    lm_configs._wrap_lms(TracedLM)
+    # Already traced, not wrapped again.
+    assert lm_configs.outline_lm is traced_lm
+
+
+def test_wrap_lms_only_wraps_the_given_attributes():
+    lm_configs = FakeLMConfigs()
+    lm_configs._wrap_lms(MeteredLM, ["outline_lm"])
+    assert isinstance(lm_configs.outline_lm, MeteredLM)
+    assert isinstance(lm_configs.question_lm, FakeLM)
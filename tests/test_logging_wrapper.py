@@ -0,0 +1,40 @@
+import threading
+import time
+
+from knowledge_storm.logging_wrapper import LoggingWrapper
+
+
+class FakeLMConfigs:
+    def collect_and_reset_lm_usage(self):
+        return {}
+
+    def collect_and_reset_lm_history(self):
+        return []
+
+
+def test_concurrent_events_record_every_call():
+    logging_wrapper = LoggingWrapper(FakeLMConfigs())
+    num_threads = 4
+    barrier = threading.Barrier(num_threads)
+
+    def worker(delay):
+        with logging_wrapper.log_event("search"):
+            barrier.wait()
+            time.sleep(delay)
+
+    with logging_wrapper.log_pipeline_stage("warm start"):
+        threads = [
+            threading.Thread(target=worker, args=(0.05 * (i + 1),))
+            for i in range(num_threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    log = logging_wrapper.dump_logging_and_reset()["warm start"]["time_usage"]["search"]
+    assert log["call_count"] == num_threads
+    # The calls overlapped: they add up to more than the wall time of the event.
+    assert log["call_seconds_total"] >= 0.05 * (1 + 2 + 3 + 4)
+    assert 0.2 <= log["call_seconds_max"] <= log["total_time_seconds"]
+    assert log["total_time_seconds"] < log["call_seconds_total"]
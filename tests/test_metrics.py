@@ -0,0 +1,122 @@
+import threading
+import urllib.request
+from contextlib import nullcontext
+
+import pytest
+
+from knowledge_storm.metrics import (
+    MetricsRegistry,
+    current_stage,
+    stage,
+    start_metrics_server,
+    track,
+)
+
+NUM_THREADS = 8
+NUM_UPDATES = 300
+
+
+def run_threads(target):
+    barrier = threading.Barrier(NUM_THREADS)
+
+    def run(i):
+        barrier.wait()
+        target(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(NUM_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_updates_are_rendered_in_the_prometheus_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["model"])
+    latency = registry.histogram(
+        "latency_seconds", "Latency.", ["model"], buckets=(0.1, 1)
+    )
+
+    def update(i):
+        model = "a" if i % 2 else 'b"\n'
+        for j in range(NUM_UPDATES):
+            requests.inc(model=model)
+            # Powers of two, so that the sums do not depend on the order of the updates.
+            latency.observe((0.0625, 0.5, 4)[j % 3], model=model)
+
+    run_threads(update)
+
+    # Each model is updated by half the threads; the third observation of each cycle falls in +Inf.
+    per_model = NUM_THREADS // 2 * NUM_UPDATES
+    per_bucket = per_model // 3
+    total = per_bucket * (0.0625 + 0.5 + 4)
+    histogram_lines = []
+    for label in ("a", 'b\\"\\n'):
+        histogram_lines += [
+            f'latency_seconds_bucket{{model="{label}",le="0.1"}} {per_bucket}',
+            f'latency_seconds_bucket{{model="{label}",le="1"}} {2 * per_bucket}',
+            f'latency_seconds_bucket{{model="{label}",le="+Inf"}} {per_model}',
+            f'latency_seconds_sum{{model="{label}"}} {total:g}',
+            f'latency_seconds_count{{model="{label}"}} {per_model}',
+        ]
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        *histogram_lines,
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        f'requests_total{{model="a"}} {per_model}',
+        f'requests_total{{model="b\\"\\n"}} {per_model}',
+    ]
+
+
+def test_track_labels_the_calls_with_the_stage_of_their_thread():
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls.", ["stage", "status"])
+    seconds = registry.histogram("call_seconds", "Call latency.", ["stage"])
+    in_flight = registry.gauge("calls_in_flight", "Calls in progress.", ["stage"])
+
+    def call(i):
+        with stage("test", f"stage{i % 2}"):
+            assert current_stage() == f"stage{i % 2}"
+            for j in range(NUM_UPDATES):
+                with pytest.raises(RuntimeError) if j == 0 else nullcontext():
+                    with track(calls, seconds, in_flight):
+                        if j == 0:
+                            raise RuntimeError("failed")
+
+    run_threads(call)
+
+    assert current_stage() == ""
+    per_stage = NUM_THREADS // 2 * NUM_UPDATES
+    for name in ("stage0", "stage1"):
+        assert calls.get(stage=name, status="error") == NUM_THREADS // 2
+        assert calls.get(stage=name, status="ok") == per_stage - NUM_THREADS // 2
+        assert in_flight.get(stage=name) == 0
+    rendered = registry.render()
+    assert f'call_seconds_count{{stage="stage0"}} {per_stage}\n' in rendered
+    assert 'calls_in_flight{stage="stage1"} 0\n' in rendered
+
+
+def test_registry_checks_metric_types_and_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("x_total", "X.", ["kind"])
+    assert registry.counter("x_total", "X.", ["kind"]) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("x_total", "X.")
+    with pytest.raises(ValueError):
+        counter.inc(other="label")
+
+
+def test_metrics_server_serves_the_registry():
+    registry = MetricsRegistry()
+    registry.counter("served_total", "Served.").inc(3)
+    server = start_metrics_server(port=0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode("utf-8") == registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pytest
+
+from knowledge_storm.storm_wiki.modules.graph import MindmapGraph, TopicIndex
+
+
+def make_mindmap(topics, passages):
+    mindmap = MindmapGraph(method="tfidf")
+    for topic, passage in zip(topics, passages):
+        connections = mindmap.relate_passage_to_topics(topic)
+        mindmap.add_to_graph(mindmap.G, topic, connections, full_passage=passage)
+        mindmap.add_to_graph(mindmap.G_summaries, topic, connections)
+    return mindmap
+
+
+@pytest.fixture
+def mindmap():
+    return MindmapGraph.merge(
+        [
+            make_mindmap(
+                ["solar power plants", "solar power storage"],
+                ["Passage on plants.", "Passage on storage."],
+            ),
+            make_mindmap(["solar power storage"], ["Another passage on storage."]),
+        ]
+    )
+
+
+def test_merge_combines_the_passages_of_the_same_topic(mindmap):
+    assert mindmap.topics_list == ["solar power plants", "solar power storage"]
+    assert mindmap.G.nodes["solar power storage"]["passages"] == [
+        "Passage on storage.",
+        "Another passage on storage.",
+    ]
+    assert mindmap.G.has_edge("solar power plants", "solar power storage")
+
+
+def test_dict_round_trip(mindmap):
+    restored = MindmapGraph.from_dict(mindmap.to_dict())
+    assert restored.method == mindmap.method
+    assert restored.topics_list == mindmap.topics_list
+    assert dict(restored.G.nodes(data=True)) == dict(mindmap.G.nodes(data=True))
+    assert list(restored.G.edges(data=True)) == list(mindmap.G.edges(data=True))
+    assert restored.to_prompt() == mindmap.to_prompt()
+
+
+def test_render_writes_the_image_once_per_version(mindmap, tmp_path):
+    path = str(tmp_path / "mindmap.png")
+    assert mindmap.render(path) == path
+    modified = os.path.getmtime(path)
+    os.utime(path, (0, 0))
+    mindmap.render(path)
+    # Same graph version, the image is not drawn again.
+    assert os.path.getmtime(path) == 0 != modified
+
+
+TOPICS = [
+    "solar power plants",
+    "solar power storage",
+    "battery storage costs",
+    "wind power in Europe",
+    "offshore wind farms",
+    "grid storage batteries",
+    "the power grid",
+]
+
+
+def test_incremental_tfidf_matches_a_full_refit():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    index = TopicIndex(method="tfidf")
+    for n, topic in enumerate(TOPICS, start=1):
+        index.add(topic)
+        # Query after each insertion, as the mindmap does, so the lazily rebuilt matrix is exercised.
+        vectorizer = TfidfVectorizer().fit(TOPICS[:n])
+        for query in ["solar storage", "wind power grid", "unrelated words"]:
+            expected = cosine_similarity(
+                vectorizer.transform([query]), vectorizer.transform(TOPICS[:n])
+            ).ravel()
+            np.testing.assert_allclose(
+                index.similarities(query), expected, rtol=1e-5, atol=1e-6
+            )
+
+
+def test_incremental_embeddings_match_a_full_matrix(monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = {}
+
+    def encode(self, texts):
+        for text in texts:
+            if text not in vectors:
+                vector = rng.normal(size=8).astype(np.float32)
+                vectors[text] = vector / np.linalg.norm(vector)
+        return np.stack([vectors[text] for text in texts])
+
+    monkeypatch.setattr(TopicIndex, "encode", encode)
+    index = TopicIndex(method="embedding")
+    # More topics than the initial capacity of the matrix, so it grows twice.
+    topics = [f"topic {i}" for i in range(40)]
+    for n, topic in enumerate(topics, start=1):
+        index.add(topic)
+        expected = np.stack([vectors[t] for t in topics[:n]]) @ encode(index, ["q"])[0]
+        np.testing.assert_allclose(index.similarities("q"), expected, rtol=1e-5)
+    assert index._embeddings.shape[0] == 64
+
+
+def make_dense_mindmap(num_topics):
+    mindmap = MindmapGraph(method="tfidf")
+    topics = [f"topic {i}" for i in range(num_topics)]
+    for i, topic in enumerate(topics):
+        connections = [
+            {"topic": other, "weight": 0.1 if j % 2 else 0.4 + j / (10 * num_topics)}
+            for j, other in enumerate(topics[:i])
+        ]
+        mindmap.add_to_graph(mindmap.G_summaries, topic, connections)
+    return mindmap
+
+
+def test_prompt_stays_within_the_budget_and_keeps_the_heaviest_edges():
+    mindmap = make_dense_mindmap(60)
+    for max_tokens in [100, 300]:
+        prompt = mindmap.to_prompt(max_tokens=max_tokens, top_k=3, min_weight=0.3)
+        assert len(prompt) // 4 + 1 <= max_tokens
+    # The least connected topics are dropped when the topics alone exceed the budget.
+    short_prompt = mindmap.to_prompt(max_tokens=100, top_k=3, min_weight=0.3)
+    assert 0 < short_prompt.count("] topic ") < 60
+
+    def listed_weights(prompt):
+        return [
+            float(edge.split(" ")[1])
+            for line in prompt.splitlines()
+            if line.startswith("[") and "]: " in line
+            for edge in line.split(": ", 1)[1].split(", ")
+        ]
+
+    # Edges below min_weight are dropped, and each topic keeps at most top_k of its edges.
+    weights = listed_weights(mindmap.to_prompt(max_tokens=10000, top_k=3))
+    assert weights and min(weights) >= 0.3
+    assert len(weights) <= 3 * 60
+    assert len(listed_weights(mindmap.to_prompt(max_tokens=10000, top_k=1))) < len(
+        weights
+    )
+    # A smaller budget lists fewer edges.
+    assert len(listed_weights(prompt)) < len(weights)
+
+
+def test_prompt_cache_is_invalidated_when_the_graph_changes():
+    mindmap = make_dense_mindmap(3)
+    prompt = mindmap.to_prompt()
+    assert mindmap.to_prompt() is prompt
+    mindmap.add_to_graph(
+        mindmap.G_summaries,
+        "a new topic",
+        [{"topic": "topic 0", "weight": 0.9}],
+    )
+    updated = mindmap.to_prompt()
+    assert updated != prompt and "a new topic" in updated
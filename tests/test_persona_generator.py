@@ -0,0 +1,66 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from knowledge_storm.storm_wiki.modules import persona_generator
+from knowledge_storm.storm_wiki.modules.persona_generator import (
+    _html_parser,
+    _parse_title_and_toc,
+    get_wiki_page_title_and_toc,
+)
+
+PAGE = b"""<html><body>
+<h1>Solar power</h1><p>Text</p>
+<h2>History</h2><h3>Early days</h3><h2>References</h2><h2>Economics</h2>
+</body></html>"""
+
+
+@pytest.fixture
+def fake_requests(monkeypatch):
+    urls = []
+
+    def get(url, timeout):
+        urls.append(url)
+        return SimpleNamespace(status_code=200, content=PAGE)
+
+    monkeypatch.setattr(persona_generator.requests, "get", get)
+    return urls
+
+
+@pytest.fixture
+def without_lxml(monkeypatch):
+    _html_parser.cache_clear()
+    # A None entry makes the import raise ImportError.
+    monkeypatch.setitem(sys.modules, "lxml", None)
+    yield
+    _html_parser.cache_clear()
+
+
+def test_parse_title_and_toc():
+    assert _parse_title_and_toc(PAGE) == (
+        "Solar power",
+        "History\n  Early days\nEconomics",
+    )
+
+
+def test_parse_falls_back_to_html_parser_without_lxml(without_lxml):
+    assert _html_parser() == "html.parser"
+    assert _parse_title_and_toc(PAGE)[0] == "Solar power"
+
+
+def test_page_outlines_are_not_cached_by_default(fake_requests, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        persona_generator, "DEFAULT_PAGE_CACHE_DIR", str(tmp_path / "cache")
+    )
+    get_wiki_page_title_and_toc("https://en.wikipedia.org/wiki/Solar_power")
+    get_wiki_page_title_and_toc("https://en.wikipedia.org/wiki/Solar_power")
+    assert len(fake_requests) == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_page_outlines_are_cached_in_the_given_directory(fake_requests, tmp_path):
+    url = "https://en.wikipedia.org/wiki/Solar_power"
+    first = get_wiki_page_title_and_toc(url, cache_dir=str(tmp_path))
+    assert get_wiki_page_title_and_toc(url, cache_dir=str(tmp_path)) == first
+    assert fake_requests == [url]
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import tracemalloc
+
+import pytest
+
+from knowledge_storm.collaborative_storm.engine import (
+    CollaborativeStormLMConfigs,
+    CoStormRunner,
+    RunnerArgument,
+)
+from knowledge_storm.lm_history import LMHistorySink
+from knowledge_storm.logging_wrapper import LoggingWrapper
+from knowledge_storm.profiling import StageProfiler
+
+
+def test_overlapping_profilers_share_tracemalloc(tmp_path):
+    assert not tracemalloc.is_tracing()
+    first_started, second_started, first_done = (
+        threading.Event(),
+        threading.Event(),
+        threading.Event(),
+    )
+
+    def first():
+        # Starts the tracing, and ends while the second stage is still running.
+        with StageProfiler(str(tmp_path / "first")).profile("research"):
+            first_started.set()
+            second_started.wait(5)
+        first_done.set()
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    assert first_started.wait(5)
+    with StageProfiler(str(tmp_path / "second")).profile("outline"):
+        second_started.set()
+        assert first_done.wait(5)
+        assert tracemalloc.is_tracing()
+        data = [bytearray(1000) for _ in range(100)]
+        del data
+    thread.join()
+    assert not tracemalloc.is_tracing()
+
+    for stage_dir, stage in [("first", "research"), ("second", "outline")]:
+        with open(tmp_path / stage_dir / f"{stage}.json") as f:
+            memory = json.load(f)["memory"]
+        assert memory["peak_exclusive"] is False
+        assert memory["peak_bytes"] >= memory["end_bytes"]
+
+
+def test_sole_profiler_owns_the_peak(tmp_path):
+    profiler = StageProfiler(str(tmp_path))
+    with profiler.profile("research"):
+        pass
+    assert profiler.summaries["research"]["memory"]["peak_exclusive"] is True
+    assert not tracemalloc.is_tracing()
+
+
+def test_snapshot_failure_does_not_fail_the_stage(tmp_path, monkeypatch):
+    def fail():
+        raise RuntimeError("the tracemalloc module must be tracing memory")
+
+    monkeypatch.setattr(tracemalloc, "take_snapshot", fail)
+    profiler = StageProfiler(str(tmp_path))
+    with profiler.profile("research"):
+        pass
+    assert "memory" not in profiler.summaries["research"]
+    assert not tracemalloc.is_tracing()
+
+    with pytest.raises(ValueError):
+        with profiler.profile("outline"):
+            raise ValueError("stage error")
+    assert not tracemalloc.is_tracing()
+
+
+def costorm_profile_dir(lm_config, **runner_args):
+    runner = CoStormRunner(
+        lm_config=lm_config,
+        runner_argument=RunnerArgument(topic="Test topic", **runner_args),
+        logging_wrapper=LoggingWrapper(lm_config),
+        rm=object(),
+    )
+    profiler = runner.logging_wrapper.stage_profiler
+    assert profiler is None or profiler.output_dir == runner.runner_argument.profile_dir
+    return runner.runner_argument.profile_dir
+
+
+def test_costorm_profiles_are_written_to_the_session_output(tmp_path):
+    lm_config = CollaborativeStormLMConfigs()
+    assert costorm_profile_dir(lm_config) is None
+    explicit = str(tmp_path / "profiles")
+    assert costorm_profile_dir(lm_config, profile=True, profile_dir=explicit) == (
+        explicit
+    )
+
+    # Without a location of the session output, a new directory for each session.
+    first = costorm_profile_dir(lm_config, profile=True)
+    second = costorm_profile_dir(lm_config, profile=True)
+    assert first != second and os.path.isdir(first) and os.listdir(first) == []
+    os.rmdir(first)
+    os.rmdir(second)
+
+    lm_config.set_history_sink(
+        LMHistorySink(str(tmp_path / "session" / "llm_call_history.jsonl"))
+    )
+    assert costorm_profile_dir(lm_config, profile=True) == str(
+        tmp_path / "session" / "profile"
+    )
@@ -0,0 +1,77 @@
+import pytest
+
+from knowledge_storm import lm
+from knowledge_storm.lm import RateLimiter, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(lm.time, "monotonic", clock)
+    return clock
+
+
+def test_token_budget_is_consumed_and_refilled(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+    assert limiter._try_acquire(400) == 0
+    assert limiter._try_acquire(400) == 0
+    # 200 tokens left, the deficit of 200 refills in 12 seconds.
+    assert limiter._try_acquire(400) == pytest.approx(12)
+    clock.now += 12
+    assert limiter._try_acquire(400) == 0
+
+
+def test_request_budget(clock):
+    limiter = RateLimiter(requests_per_minute=2)
+    assert limiter._try_acquire(0) == 0
+    assert limiter._try_acquire(0) == 0
+    assert limiter._try_acquire(0) == pytest.approx(30)
+
+
+def test_request_larger_than_budget_waits_for_full_budget(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    assert limiter._try_acquire(600) == 0
+    # Needs the whole budget (not 5000 tokens, which would never be available).
+    assert limiter._try_acquire(5000) == pytest.approx(36)
+    clock.now += 36
+    assert limiter._try_acquire(5000) == 0
+
+
+def test_reconcile_returns_overestimated_tokens(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    assert limiter._try_acquire(1000) == 0
+    limiter.reconcile(estimated_tokens=1000, actual_tokens=300)
+    assert limiter._try_acquire(700) == 0
+
+
+def test_block_for_pauses_all_callers(clock):
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter.block_for(5)
+    assert limiter._try_acquire(0) == pytest.approx(5)
+    clock.now += 5
+    assert limiter._try_acquire(0) == 0
+
+
+def test_for_model_shares_and_tightens_limiter():
+    first = RateLimiter.for_model("test-shared-model", requests_per_minute=100)
+    second = RateLimiter.for_model("test-shared-model", requests_per_minute=50)
+    assert first is second
+    assert first.requests_per_minute == 50
+    RateLimiter.for_model("test-shared-model", requests_per_minute=200)
+    assert first.requests_per_minute == 50
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after("-1") == 0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
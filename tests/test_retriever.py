@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from knowledge_storm.interface import Retriever
+
+
+def _result(query):
+    return {
+        "url": f"https://example.com/{query}",
+        "title": query,
+        "description": "",
+        "snippets": [f"About {query} [1]."],
+    }
+
+
+class SyncRM:
+    def __init__(self):
+        self.threads = set()
+
+    def __call__(self, query_or_queries, exclude_urls=[]):
+        self.threads.add(threading.current_thread().name)
+        return [_result(q) for q in query_or_queries]
+
+
+class AsyncRM(SyncRM):
+    async def aforward(self, query_or_queries, exclude_urls=[]):
+        await asyncio.sleep(0)
+        return [_result(q) for q in query_or_queries]
+
+
+def test_aretrieve_uses_aforward():
+    rm = AsyncRM()
+    retriever = Retriever(rm=rm, max_thread=2)
+    infos = asyncio.run(retriever.aretrieve(["a", "b", "c"]))
+    assert sorted(info.meta["query"] for info in infos) == ["a", "b", "c"]
+    assert infos[0].snippets == [f"About {infos[0].meta['query']} ."]
+    assert rm.threads == set()
+
+
+def test_aretrieve_runs_sync_rm_in_threads():
+    rm = SyncRM()
+    retriever = Retriever(rm=rm, max_thread=2)
+    infos = asyncio.run(
+        retriever.aretrieve(["a", "b"], exclude_urls=["https://example.com/c"])
+    )
+    assert sorted(info.url for info in infos) == [
+        "https://example.com/a",
+        "https://example.com/b",
+    ]
+    assert threading.current_thread().name not in rm.threads
@@ -0,0 +1,207 @@
+import dspy
+import pytest
+
+from knowledge_storm.lm import get_token_stream_callback
+from knowledge_storm.storm_wiki.modules import callback
+from knowledge_storm.storm_wiki.modules.article_generation import (
+    StormArticleGenerationModule,
+)
+from knowledge_storm.storm_wiki.modules.callback import (
+    BaseCallbackHandler,
+    SectionTokenStreamer,
+    stream_section,
+)
+from knowledge_storm.storm_wiki.modules.storm_dataclass import StormArticle
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(callback, "time", clock)
+    return clock
+
+
+class RecordingHandler(BaseCallbackHandler):
+    stream_section_tokens = True
+
+    def __init__(self):
+        self.tokens = []
+        self.partials = []
+        self.drafts = []
+
+    def on_section_token(self, section_name, token, **kwargs):
+        self.tokens.append((section_name, token))
+
+    def on_section_partial(self, section_name, partial_content, **kwargs):
+        self.partials.append((section_name, partial_content))
+        if "article" in kwargs:
+            node = kwargs["article"].find_section(kwargs["article"].root, section_name)
+            self.drafts.append((section_name, node.content))
+
+
+def stream(tokens, clock, times=None):
+    """Send `tokens` to the token callback of the current context, at `times` if given."""
+    send = get_token_stream_callback()
+    for i, token in enumerate(tokens):
+        if times is not None:
+            clock.now = times[i]
+        send(token)
+
+
+def test_partials_are_throttled_and_flushed_at_the_end(clock):
+    handler = RecordingHandler()
+    with stream_section(handler, "History") as streamer:
+        assert isinstance(streamer, SectionTokenStreamer)
+        stream(
+            ["a", "b", "c", "d", "e"],
+            clock,
+            times=[1000.0, 1000.1, 1000.2, 1000.6, 1000.7],
+        )
+    assert get_token_stream_callback() is None
+
+    assert handler.tokens == [("History", token) for token in "abcde"]
+    # At most one partial every 0.5 seconds, then the final content.
+    assert handler.partials == [
+        ("History", "a"),
+        ("History", "abcd"),
+        ("History", "abcde"),
+    ]
+
+
+def test_flush_does_not_repeat_a_reported_partial(clock):
+    handler = RecordingHandler()
+    streamer = SectionTokenStreamer(handler, "History", min_interval=0)
+    streamer("a")
+    streamer("b")
+    streamer.flush()
+    assert handler.partials == [("History", "a"), ("History", "ab")]
+
+
+def test_nothing_is_streamed_unless_the_handler_asks_for_it():
+    handler = RecordingHandler()
+    handler.stream_section_tokens = False
+    with stream_section(handler, "History") as streamer:
+        assert streamer is None
+        assert get_token_stream_callback() is None
+    with stream_section(None, "History") as streamer:
+        assert streamer is None
+    assert handler.partials == []
+
+
+def make_article():
+    return StormArticle.from_outline_str(
+        "Test topic", "# History\n## Early years\n# Legacy"
+    )
+
+
+def test_section_draft_drops_the_repeated_heading():
+    article = make_article()
+    node = article.set_section_draft("History", "# history \nThe town was founded [1].")
+    assert node is article.find_section(article.root, "History")
+    # The citations are kept as generated until `update_section()`.
+    assert node.content == "The town was founded [1]."
+    # A heading of another name is part of the content.
+    article.set_section_draft("Legacy", "## Influence\nIt is still visited.")
+    assert article.find_section(article.root, "Legacy").content == (
+        "## Influence\nIt is still visited."
+    )
+    assert article.set_section_draft("Missing", "Text") is None
+    # The outline is left unchanged.
+    assert article.get_outline_as_list(include_root=False) == [
+        "History",
+        "Early years",
+        "Legacy",
+    ]
+
+
+def test_assembled_article_replaces_the_drafts():
+    article = make_article()
+    article.set_section_draft("History", "# History\nThe town was")
+    article.set_section_draft("Legacy", "# Legacy\nIt is")
+    # The LM wrote the History section under another heading.
+    article = StormArticleGenerationModule._assemble_article(
+        "Test topic",
+        article,
+        [
+            {
+                "section_name": "History",
+                "section_content": "# Early history\nThe town was founded in 1900.",
+                "collected_info": [],
+            },
+            {
+                "section_name": "Legacy",
+                "section_content": "# Legacy\nIt is still visited.",
+                "collected_info": [],
+            },
+        ],
+    )
+
+    assert article.get_outline_as_list(include_root=False) == [
+        "Legacy",
+        "Early history",
+    ]
+    assert "The town was\n" not in article.to_string()
+    assert article.find_section(article.root, "Legacy").content == (
+        "It is still visited."
+    )
+
+
+class FakeInformationTable:
+    def prepare_table_for_retrieval(self):
+        pass
+
+    def retrieve_information(self, queries, search_top_k):
+        return []
+
+
+class StreamingSectionWriter:
+    """Stand-in for `ConvToSection` that streams the section word by word."""
+
+    def __call__(self, topic, outline, section, collected_info, graph_mindmap):
+        tokens = [f"# {section}\n", "About ", f"{section.lower()} ", "of the town."]
+        send = get_token_stream_callback()
+        for token in tokens:
+            send(token)
+        return dspy.Prediction(section="".join(tokens))
+
+
+def test_generated_article_is_filled_with_the_streamed_drafts(clock):
+    module = StormArticleGenerationModule(article_gen_lm=None)
+    module.section_gen = StreamingSectionWriter()
+    handler = RecordingHandler()
+
+    article = module.generate_article(
+        topic="Test topic",
+        information_table=FakeInformationTable(),
+        article_with_outline=make_article(),
+        graph_mindmap="",
+        callback_handler=handler,
+    )
+
+    # The clock does not move: the first token and the final content are reported.
+    assert handler.partials == [
+        ("History", "# History\n"),
+        ("History", "# History\nAbout history of the town."),
+        ("Legacy", "# Legacy\n"),
+        ("Legacy", "# Legacy\nAbout legacy of the town."),
+    ]
+    assert handler.drafts == [
+        ("History", ""),
+        ("History", "About history of the town."),
+        ("Legacy", ""),
+        ("Legacy", "About legacy of the town."),
+    ]
+    assert article.find_section(article.root, "History").content == (
+        "About history of the town."
+    )
+    assert "".join(token for name, token in handler.tokens if name == "Legacy") == (
+        "# Legacy\nAbout legacy of the town."
+    )
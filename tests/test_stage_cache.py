@@ -0,0 +1,39 @@
+from knowledge_storm.lm import FairConcurrencyBudget
+from knowledge_storm.rm import BudgetedRM, YouRM
+from knowledge_storm.storm_wiki.engine import (
+    STORMWikiLMConfigs,
+    STORMWikiRunner,
+    STORMWikiRunnerArguments,
+)
+from knowledge_storm.storm_wiki.stage_cache import StageCache
+
+
+def test_rm_fingerprint_keeps_the_configuration_only():
+    rm = YouRM(ydc_api_key="secret", k=5)
+    rm.usage = 7
+    fingerprint = StageCache.rm_fingerprint(rm)
+    assert fingerprint == {
+        "class": "knowledge_storm.rm.YouRM",
+        "params": {"k": 5},
+    }
+    assert StageCache.rm_fingerprint(BudgetedRM(rm, FairConcurrencyBudget(1), 0)) == (
+        fingerprint
+    )
+
+
+def research_key(tmp_path, rm, **args):
+    runner = STORMWikiRunner(
+        STORMWikiRunnerArguments(output_dir=str(tmp_path), **args),
+        STORMWikiLMConfigs(),
+        rm=rm,
+    )
+    runner._prepare_run("Test topic", True, None, None, None)
+    return runner._stage_key("research", ground_truth_url="")
+
+
+def test_research_key_depends_on_the_rm_and_search_top_k(tmp_path):
+    key = research_key(tmp_path, YouRM(ydc_api_key="a", k=3))
+    # Another API key or usage counter is the same search.
+    assert research_key(tmp_path, YouRM(ydc_api_key="b", k=3)) == key
+    assert research_key(tmp_path, YouRM(ydc_api_key="a", k=5)) != key
+    assert research_key(tmp_path, YouRM(ydc_api_key="a", k=3), search_top_k=5) != key
@@ -0,0 +1,150 @@
+import asyncio
+import os
+
+import pytest
+
+from knowledge_storm.storm_wiki.engine import (
+    STORMWikiLMConfigs,
+    STORMWikiRunner,
+    STORMWikiRunnerArguments,
+)
+from knowledge_storm.storm_wiki.modules.graph import MindmapGraph
+from knowledge_storm.storm_wiki.modules.storm_dataclass import StormInformationTable
+
+
+class RecordingRunner:
+    """Replace the stage methods and loaders of a runner with stubs recording the calls."""
+
+    SYNC_METHODS = [
+        "run_knowledge_curation_module",
+        "run_outline_generation_module",
+        "run_article_generation_module",
+        "run_article_polishing_module",
+        "_load_information_table_from_local_fs",
+        "_load_outline_from_local_fs",
+        "_load_draft_article_from_local_fs",
+    ]
+    ASYNC_METHODS = [
+        "arun_knowledge_curation_module",
+        "arun_article_generation_module",
+    ]
+
+    def __init__(self, runner):
+        self.calls = []
+        for name in self.SYNC_METHODS:
+            setattr(runner, name, self._sync_stub(name))
+        for name in self.ASYNC_METHODS:
+            setattr(runner, name, self._async_stub(name))
+        runner._load_graph_mindmap_from_local_fs = lambda: self.calls.append(
+            "_load_graph_mindmap_from_local_fs"
+        )
+
+    def _sync_stub(self, name):
+        def stub(**kwargs):
+            self.calls.append(name)
+            return name
+
+        return stub
+
+    def _async_stub(self, name):
+        async def stub(**kwargs):
+            self.calls.append(name)
+            return name
+
+        return stub
+
+
+@pytest.fixture
+def runner(tmp_path):
+    args = STORMWikiRunnerArguments(output_dir=str(tmp_path))
+    return STORMWikiRunner(args, STORMWikiLMConfigs(), rm=None)
+
+
+@pytest.mark.parametrize(
+    "flags, expected",
+    [
+        (
+            dict(
+                do_research=True,
+                do_generate_outline=True,
+                do_generate_article=True,
+                do_polish_article=True,
+            ),
+            [
+                "run_knowledge_curation_module",
+                "run_outline_generation_module",
+                "run_article_generation_module",
+                "run_article_polishing_module",
+            ],
+        ),
+        (
+            dict(
+                do_research=False,
+                do_generate_outline=False,
+                do_generate_article=True,
+                do_polish_article=False,
+            ),
+            [
+                "_load_graph_mindmap_from_local_fs",
+                "_load_information_table_from_local_fs",
+                "_load_outline_from_local_fs",
+                "run_article_generation_module",
+            ],
+        ),
+    ],
+)
+def test_run_and_arun_share_the_stage_order(runner, flags, expected):
+    recorder = RecordingRunner(runner)
+    runner.run(topic="Test topic", **flags)
+    assert recorder.calls == expected
+
+    recorder = RecordingRunner(runner)
+    asyncio.run(runner.arun(topic="Test topic", **flags))
+    # arun uses the asyncio counterpart of a stage method where there is one.
+    assert recorder.calls == [
+        f"a{name}" if f"a{name}" in RecordingRunner.ASYNC_METHODS else name
+        for name in expected
+    ]
+
+
+def test_stage_results_are_passed_to_the_next_stage(runner):
+    recorder = RecordingRunner(runner)
+    outline_inputs = []
+    runner.run_outline_generation_module = lambda **kwargs: outline_inputs.append(
+        kwargs["information_table"]
+    )
+    runner.run(
+        topic="Test topic",
+        do_research=True,
+        do_generate_outline=True,
+        do_generate_article=False,
+        do_polish_article=False,
+    )
+    assert recorder.calls == ["run_knowledge_curation_module"]
+    assert outline_inputs == ["run_knowledge_curation_module"]
+
+
+def test_research_mindmap_is_saved_and_rendered(runner):
+    mindmap = MindmapGraph(method="tfidf")
+    mindmap.add_to_graph(mindmap.G, "topic", [], full_passage="passage")
+    mindmap.add_to_graph(mindmap.G_summaries, "topic", [])
+    runner.storm_knowledge_curation_module.research = lambda **kwargs: (
+        StormInformationTable([]),
+        [],
+        mindmap,
+    )
+    runner.run(
+        topic="Test topic",
+        do_research=True,
+        do_generate_outline=False,
+        do_generate_article=False,
+        do_polish_article=False,
+    )
+    assert runner.graph_mindmap == mindmap.to_prompt()
+
+    # A run for the same topic that skips the research renders the saved mindmap.
+    runner.mindmap = None
+    path = runner.render_mindmap()
+    assert path == os.path.join(runner.article_output_dir, "graph_mindmap.png")
+    assert os.path.exists(path)
+    assert runner.mindmap.topics_list == ["topic"]
@@ -0,0 +1,82 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from knowledge_storm.lm import VLLMClient
+
+
+class FakeTokenizer:
+    def apply_chat_template(self, messages, tokenize=True, add_generation_prompt=False):
+        text = "<s>" + "".join(
+            f"[{m['role']}] {m['content']} [/{m['role']}]" for m in messages
+        )
+        return text + ("[assistant]" if add_generation_prompt else "")
+
+
+class FakeEndpoint:
+    def __init__(self, make_response):
+        self.requests = []
+        self.make_response = make_response
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.make_response(kwargs)
+
+
+@pytest.fixture
+def fake_transformers(monkeypatch):
+    auto_tokenizer = SimpleNamespace(
+        from_pretrained=lambda *args, **kwargs: FakeTokenizer()
+    )
+    monkeypatch.setitem(
+        sys.modules, "transformers", SimpleNamespace(AutoTokenizer=auto_tokenizer)
+    )
+
+
+def make_client(**kwargs):
+    client = VLLMClient(model="test-model", port=8000, **kwargs)
+    usage = SimpleNamespace(prompt_tokens=1, completion_tokens=1)
+    client.chat_endpoint = FakeEndpoint(
+        lambda request: SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="answer"))],
+            usage=usage,
+        )
+    )
+    client.completions_endpoint = FakeEndpoint(
+        lambda request: SimpleNamespace(
+            choices=[
+                SimpleNamespace(index=i, text="answer")
+                for i in range(len(request["prompt"]))
+            ],
+            usage=usage,
+        )
+    )
+    client.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=client.chat_endpoint), api_key="null"
+    )
+    client.completions_client = SimpleNamespace(completions=client.completions_endpoint)
+    return client
+
+
+def test_batched_and_unbatched_requests_send_the_same_prompt(fake_transformers):
+    unbatched = make_client()
+    assert unbatched("What is STORM?") == ["answer"]
+    (chat_request,) = unbatched.chat_endpoint.requests
+
+    batched = make_client(batch_window=0.001)
+    assert batched("What is STORM?") == ["answer"]
+    (completions_request,) = batched.completions_endpoint.requests
+
+    # The prompt of the batched request is what the server renders from the chat request.
+    assert completions_request["prompt"] == [
+        FakeTokenizer().apply_chat_template(
+            chat_request["messages"], tokenize=False, add_generation_prompt=True
+        )
+    ]
+    assert completions_request["extra_body"] == {"add_special_tokens": False}
+
+
+def test_batch_request_returns_the_completions_of_each_prompt(fake_transformers):
+    client = make_client(batch_window=0.001)
+    assert client.batch_request(["a", "b"]) == [["answer"], ["answer"]]